@@ -0,0 +1,296 @@
+"""
+Content-addressed artifact store for pipeline outputs
+Author: Dr. Siddalingaiah H S
+
+A run of the pipeline is keyed by a hash of everything that determines its
+outputs: the configuration file, the source files under data/, the source
+of every script and the cohort tables in outputs/tables that the pipeline
+reads when present. Caches the pipeline derives under data/ (the
+expression store, the Open Targets store, the MEDLINE index) are left out:
+they follow from the source files and are rebuilt while producing a run. The tables and figures a run writes are stored once per
+content hash under outputs/store/objects (identical files across runs share
+one object) and listed in a manifest under outputs/store/runs/<key>.json.
+Running again with a configuration that has been run before restores its
+files into outputs/tables and outputs/figures instead of recomputing them.
+
+Restored files are plain copies of their objects, never links: pipeline
+scripts write their outputs in place, and a write through a link would
+change the shared object (file modes do not stop root or CI containers).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import yaml
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+# Directories under outputs/ that are stored and restored
+VIEW_DIRS = ['tables', 'figures']
+# Never stored (scratch output inside a view directory)
+SKIP_DIRS = {'draft'}
+
+# Scripts producing the stored outputs, run in order
+STEPS = ['run_pipeline.py', 'generate_figures.py']
+# Derived caches under data/: (config section or None, key, default directory)
+DERIVED_DIRS = [
+    (None, 'expression_store', 'data/geo/store'),
+    ('opentargets', 'store', 'data/reference/opentargets/store'),
+    ('literature', 'index', 'data/reference/medline/index'),
+]
+# Tables in the view directories that run_pipeline reads when present
+# (per-cohort DE tables and the pooled meta-analysis)
+VIEW_INPUTS = ['tables/de_*.csv', 'tables/meta_analysis.csv']
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """Objects, run manifests and the restored outputs of one project tree"""
+
+    def __init__(self, base_dir=None):
+        self.base_dir = Path(base_dir or BASE_DIR)
+        self.outputs = self.base_dir / 'outputs'
+        self.root = self.outputs / 'store'
+        self.objects = self.root / 'objects'
+        self.runs_dir = self.root / 'runs'
+        self._fingerprints = None
+
+    def _cached_digest(self, path):
+        """file_digest, reused while the file's size and mtime are unchanged"""
+        if self._fingerprints is None:
+            cache = self.root / 'fingerprints.json'
+            self._fingerprints = json.loads(cache.read_text()) if cache.exists() else {}
+        stat = path.stat()
+        name = str(path.relative_to(self.base_dir))
+        entry = self._fingerprints.get(name)
+        if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+            entry = [stat.st_size, stat.st_mtime_ns, file_digest(path)]
+            self._fingerprints[name] = entry
+        return entry[2]
+
+    def derived_dirs(self, config_path):
+        """Configured cache directories under data/, with their staging twins"""
+        config = yaml.safe_load(config_path.read_text()) if config_path.exists() else None
+        if not isinstance(config, dict):
+            config = {}
+        dirs = []
+        for section, key, default in DERIVED_DIRS:
+            settings = config if section is None else (config.get(section) or {})
+            path = self.base_dir / settings.get(key, default)
+            dirs += [path, path.with_name(path.name + '.tmp')]
+        return dirs
+
+    def input_digests(self):
+        """Relative path -> content hash of the config, source data, scripts and view inputs"""
+        config_path = self.base_dir / 'config' / 'sepsis_config.yaml'
+        files = [config_path]
+        derived = self.derived_dirs(config_path)
+        for sub, pattern in [('data', '*'), ('scripts', '*.py')]:
+            files += sorted(p for p in (self.base_dir / sub).rglob(pattern)
+                            if p.is_file() and '__pycache__' not in p.parts
+                            and not any(p.is_relative_to(d) for d in derived))
+        digests = {str(p.relative_to(self.base_dir)): self._cached_digest(p) for p in files}
+        # Restored copies all share one mtime, so view inputs are always hashed
+        for pattern in VIEW_INPUTS:
+            for path in sorted(self.outputs.glob(pattern)):
+                digests[str(path.relative_to(self.base_dir))] = file_digest(path)
+        if self._fingerprints is not None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            (self.root / 'fingerprints.json').write_text(json.dumps(self._fingerprints))
+        return digests
+
+    @staticmethod
+    def run_key(inputs, steps=STEPS):
+        parts = [f'steps={",".join(steps)}'] + [f'{name}={digest}' for name, digest in sorted(inputs.items())]
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
+
+    def object_path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    def put(self, path):
+        """Store one file by content hash (once); returns the digest"""
+        digest = file_digest(path)
+        target = self.object_path(digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent)
+            os.close(fd)
+            shutil.copyfile(path, tmp)
+            # Freshness checks compare table and summary mtimes; stored objects
+            # (and their restored copies) all carry the same one, so a
+            # restored run never looks stale
+            os.utime(tmp, (0, 0))
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, target)
+        return digest
+
+    def view_files(self):
+        """Relative paths of every file in the view directories"""
+        files = []
+        for sub in VIEW_DIRS:
+            directory = self.outputs / sub
+            if not directory.exists():
+                continue
+            for path in sorted(directory.rglob('*')):
+                rel = path.relative_to(self.outputs)
+                if not SKIP_DIRS.intersection(rel.parts[1:]) and path.is_file():
+                    files.append(rel)
+        return files
+
+    def manifest_path(self, key):
+        return self.runs_dir / f'{key}.json'
+
+    def load_manifest(self, key):
+        with open(self.manifest_path(key)) as f:
+            return json.load(f)
+
+    def commit(self, key, inputs, seconds):
+        """Store the current outputs as run `key`"""
+        files = {str(rel): self.put(self.outputs / rel) for rel in self.view_files()}
+        manifest = {
+            'key': key,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'seconds': round(seconds, 3),
+            'inputs': inputs,
+            'files': files,
+        }
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path(key), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def runs(self):
+        """Every stored manifest, oldest first"""
+        if not self.runs_dir.exists():
+            return []
+        manifests = [json.loads(p.read_text()) for p in self.runs_dir.glob('*.json')]
+        return sorted(manifests, key=lambda m: m['created'])
+
+    def resolve(self, prefix):
+        """Full run key from a unique prefix"""
+        matches = [m['key'] for m in self.runs() if m['key'].startswith(prefix)]
+        if len(matches) != 1:
+            raise KeyError(f"'{prefix}' matches {len(matches)} stored runs")
+        return matches[0]
+
+    def current(self):
+        head = self.root / 'HEAD'
+        return head.read_text().strip() if head.exists() else None
+
+    def restore(self, digest, path):
+        """Write a writable copy of an object at path, replacing what is there"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        os.close(fd)
+        shutil.copyfile(self.object_path(digest), tmp)
+        os.utime(tmp, (0, 0))
+        os.chmod(tmp, 0o644)
+        # Replaces the file (or a link) rather than writing through it
+        os.replace(tmp, path)
+
+    def checkout(self, key):
+        """Restore the outputs of run `key` into the view directories"""
+        files = self.load_manifest(key)['files']
+        current = self.current()
+        if current is not None and self.manifest_path(current).exists():
+            # Unmodified files of the previous run that this run does not have
+            for rel, digest in self.load_manifest(current)['files'].items():
+                path = self.outputs / rel
+                if rel not in files and path.is_file() and file_digest(path) == digest:
+                    path.unlink()
+        for rel, digest in files.items():
+            self.restore(digest, self.outputs / rel)
+        (self.root / 'HEAD').write_text(key + '\n')
+        return files
+
+    def diff(self, key_a, key_b):
+        """Files added, removed and changed between two runs"""
+        a, b = self.load_manifest(key_a)['files'], self.load_manifest(key_b)['files']
+        return {
+            'added': sorted(set(b) - set(a)),
+            'removed': sorted(set(a) - set(b)),
+            'changed': sorted(f for f in set(a) & set(b) if a[f] != b[f]),
+        }
+
+
+def run_scripts(base_dir=None, steps=STEPS):
+    """Run the pipeline scripts that write outputs/tables and outputs/figures"""
+    base_dir = Path(base_dir or BASE_DIR)
+    for script in steps:
+        print(f"Running {script}...")
+        subprocess.run([sys.executable, str(base_dir / 'scripts' / script)], cwd=base_dir,
+                       check=True, capture_output=True)
+
+
+def run(store=None, produce=None, force=False):
+    """Restore the stored run for the current inputs, or compute and store it"""
+    print("\n" + "="*60)
+    print("ARTIFACT STORE")
+    print("="*60)
+
+    store = store or ArtifactStore()
+    produce = produce or run_scripts
+    start = time.perf_counter()
+    inputs = store.input_digests()
+    key = store.run_key(inputs)
+
+    if store.manifest_path(key).exists() and not force:
+        files = store.checkout(key)
+        print(f"Run {key}: restored {len(files)} files in {time.perf_counter() - start:.2f} s")
+        return key, 'restored'
+
+    produce()
+    seconds = time.perf_counter() - start
+    manifest = store.commit(key, inputs, seconds)
+    store.checkout(key)
+    print(f"Run {key}: computed and stored {len(manifest['files'])} files in {seconds:.1f} s")
+    return key, 'computed'
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Content-addressed store of pipeline tables and figures')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='restore the run for the current inputs, or compute it')
+    run_parser.add_argument('--force', action='store_true', help='recompute even if the run is stored')
+    commands.add_parser('list', help='list stored runs')
+    checkout_parser = commands.add_parser('checkout', help='restore the outputs of a stored run')
+    checkout_parser.add_argument('key', help='run key (or a unique prefix)')
+    diff_parser = commands.add_parser('diff', help='files that differ between two runs')
+    diff_parser.add_argument('key_a')
+    diff_parser.add_argument('key_b')
+    args = parser.parse_args()
+
+    store = ArtifactStore()
+    if args.command == 'run':
+        run(store, force=args.force)
+    elif args.command == 'list':
+        current = store.current()
+        for manifest in store.runs():
+            marker = '*' if manifest['key'] == current else ' '
+            config = next((d for name, d in manifest['inputs'].items() if name.startswith('config')), '')
+            print(f"{marker} {manifest['key']}  {manifest['created']}  {len(manifest['files']):>3} files  "
+                  f"{manifest['seconds']:>7.1f} s  config {config[:12]}")
+    elif args.command == 'checkout':
+        key = store.resolve(args.key)
+        print(f"Checked out {len(store.checkout(key))} files of run {key}")
+    elif args.command == 'diff':
+        changes = store.diff(store.resolve(args.key_a), store.resolve(args.key_b))
+        for kind, files in changes.items():
+            for name in files:
+                print(f"{kind:<8} {name}")
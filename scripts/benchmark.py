@@ -0,0 +1,297 @@
+"""
+Benchmark suite for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Times every pipeline stage (signature loading, scoring, ranking, validation,
+compound generation, each figure and each DOCX generator) on synthetic
+inputs at fixed scale tiers. Each tier runs in a throwaway project tree: the stage
+modules resolve all paths from their BASE_DIR, which is pointed at the
+temporary tree for the duration of the run. Results are appended to a JSON
+history, and a run is compared against the recent history of the same
+stage and tier to flag slowdowns.
+"""
+
+import contextlib
+import functools
+import io
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent.parent
+HISTORY_PATH = BASE_DIR / 'outputs' / 'benchmarks' / 'history.json'
+
+TIERS = {'60': 60, '1k': 1_000, '20k': 20_000, '1M': 1_000_000}
+
+# A stage is flagged when its best time exceeds the baseline by this fraction
+# and by more than NOISE_FLOOR seconds
+REGRESSION_THRESHOLD = 0.20
+NOISE_FLOOR = 0.005
+BASELINE_WINDOW = 5
+
+# Modules whose BASE_DIR is redirected to the synthetic project tree
+PATCHED_MODULES = [
+    'run_pipeline', 'summary_stats', 'build_documents', 'generate_figures', 'generate_manuscript',
+    'generate_manuscript_final', 'generate_manuscript_verified', 'generate_supplementary',
+    'generate_supplementary_final', 'generate_cover_letter', 'validation',
+]
+
+
+def synthetic_signature(n_genes, seed=0):
+    """Signature of n_genes rows: the curated genes, then fitted synthetic ones
+
+    The first tier reproduces the shipped file; larger tiers append genes
+    sampled from distributions fitted to it.
+    """
+    from synthetic_data import fit_signature_model
+    from synthetic_data import synthetic_signature as sample_signature
+
+    curated = pd.read_csv(BASE_DIR / 'data' / 'gene_signature.csv')
+    if n_genes <= len(curated):
+        return curated.head(n_genes).copy()
+    extra = sample_signature(n_genes - len(curated), fit_signature_model(curated), seed=seed)
+    return pd.concat([curated, extra], ignore_index=True)
+
+
+def build_project(root, n_genes, seed=0):
+    """Minimal project tree (config, signature, output dirs) under root"""
+    root = Path(root)
+    for sub in ['config', 'data', 'outputs/tables', 'outputs/figures', 'manuscripts']:
+        (root / sub).mkdir(parents=True, exist_ok=True)
+    shutil.copy(BASE_DIR / 'config' / 'sepsis_config.yaml', root / 'config' / 'sepsis_config.yaml')
+    synthetic_signature(n_genes, seed).to_csv(root / 'data' / 'gene_signature.csv', index=False)
+    return root
+
+
+@contextlib.contextmanager
+def project_root(root):
+    """Point every stage module at root for the duration of the block"""
+    import importlib
+    modules = [importlib.import_module(name) for name in PATCHED_MODULES]
+    saved = [m.BASE_DIR for m in modules]
+    try:
+        for module in modules:
+            module.BASE_DIR = Path(root)
+        yield
+    finally:
+        for module, base in zip(modules, saved):
+            module.BASE_DIR = base
+
+
+class PipelineStages:
+    """Stage callables sharing intermediate results within one tier"""
+
+    def __init__(self, root, config):
+        self.root = Path(root)
+        self.config = config
+        self.genes_df = None
+        self.components = None
+        self.targets_df = None
+
+    def load_gene_signature(self):
+        from run_pipeline import load_gene_signature
+        self.genes_df = load_gene_signature(self.root / 'data' / 'gene_signature.csv')
+
+    def score(self):
+        from run_pipeline import calculate_composite_scores, calculate_score_components
+        self.components = calculate_score_components(self.genes_df)
+        self.genes_df['Composite_Score'] = calculate_composite_scores(self.components, self.config['scoring'])
+
+    def rank(self):
+        targets = self.genes_df.sort_values('Composite_Score', ascending=False, kind='mergesort').reset_index(drop=True)
+        targets['Rank'] = range(1, len(targets) + 1)
+        targets.to_csv(self.root / 'outputs' / 'tables' / 'targets_ranked.csv', index=False)
+        self.targets_df = targets
+
+    def validate_targets(self):
+        from validation import check_table
+        check_table('targets', self.targets_df)
+
+    def generate_compound_data(self):
+        from run_pipeline import generate_compound_data
+        generate_compound_data(self.targets_df)
+
+
+def stage_list(stages):
+    """(name, callable, largest tier it runs at) in execution order
+
+    Later stages read the tables and figures written by earlier ones. The
+    original supplementary generator lays out one DOCX table row per gene in
+    memory, so it is capped at the 1k tier; the final supplement streams its
+    tables and runs at every tier.
+    """
+    import generate_cover_letter
+    import generate_figures
+    import generate_manuscript
+    import generate_manuscript_final
+    import generate_manuscript_verified
+    import generate_supplementary
+    import generate_supplementary_final
+
+    return [
+        ('load_gene_signature', stages.load_gene_signature, None),
+        ('score', stages.score, None),
+        ('rank', stages.rank, None),
+        ('validate_targets', stages.validate_targets, None),
+        ('generate_compound_data', stages.generate_compound_data, None),
+        ('figure1_target_prioritization', generate_figures.figure1_target_prioritization, None),
+        ('figure2_compound_distribution', generate_figures.figure2_compound_distribution, None),
+        ('figure3_potency_by_target', generate_figures.figure3_potency_by_target, None),
+        ('figure4_pathway_heatmap', generate_figures.figure4_pathway_heatmap, None),
+        ('figure5_sepsis_timeline', generate_figures.figure5_sepsis_timeline, None),
+        ('manuscript', generate_manuscript.create_manuscript, None),
+        # Uncached, so timings stay comparable with runs before the section cache
+        ('manuscript_final', functools.partial(generate_manuscript_final.create_complete_manuscript,
+                                               use_cache=False), None),
+        ('manuscript_final_cached', generate_manuscript_final.create_complete_manuscript, None),
+        ('manuscript_verified', generate_manuscript_verified.create_manuscript, None),
+        ('supplementary', generate_supplementary.create_supplementary, 1_000),
+        ('supplementary_final', generate_supplementary_final.create_supplementary, None),
+        ('cover_letter', generate_cover_letter.create_cover_letter, None),
+    ]
+
+
+def time_call(func, repeat):
+    """Wall-clock seconds of each of `repeat` calls, with stage output silenced"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_tier(tier, repeat=3, only=None, seed=0):
+    """Benchmark every stage at one tier; returns one result dict per stage"""
+    from run_pipeline import load_config
+
+    n_genes = TIERS[tier]
+    results = []
+    with tempfile.TemporaryDirectory(prefix=f'sepsis_bench_{tier}_') as tmp:
+        root = build_project(tmp, n_genes, seed)
+        with project_root(root):
+            stages = PipelineStages(root, load_config(root / 'config' / 'sepsis_config.yaml'))
+            for name, func, max_genes in stage_list(stages):
+                if max_genes is not None and n_genes > max_genes:
+                    continue
+                # Skipped stages still run once so downstream inputs exist
+                if only and name not in only:
+                    time_call(func, 1)
+                    continue
+                timings = time_call(func, repeat)
+                results.append({
+                    'stage': name,
+                    'tier': tier,
+                    'n_genes': n_genes,
+                    'best': min(timings),
+                    'median': statistics.median(timings),
+                    'repeat': repeat,
+                })
+                print(f"  {tier:<5}{name:<32}{min(timings):>10.4f}s")
+    return results
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path=None):
+    path = Path(path or HISTORY_PATH)
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(history, path=None):
+    path = Path(path or HISTORY_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+    return path
+
+
+def find_regressions(results, history, threshold=REGRESSION_THRESHOLD, window=BASELINE_WINDOW,
+                     noise_floor=NOISE_FLOOR):
+    """Stages slower than the median of their last `window` recorded runs"""
+    previous = {}
+    for run in history:
+        for r in run['results']:
+            previous.setdefault((r['stage'], r['tier']), []).append(r['best'])
+
+    regressions = []
+    for r in results:
+        past = previous.get((r['stage'], r['tier']), [])[-window:]
+        if not past:
+            continue
+        baseline = statistics.median(past)
+        if r['best'] > baseline * (1 + threshold) and r['best'] - baseline > noise_floor:
+            regressions.append({**r, 'baseline': baseline, 'slowdown': r['best'] / baseline - 1})
+    return regressions
+
+
+def run_benchmarks(tiers=None, repeat=3, only=None, seed=0):
+    """Run the selected tiers and return a history entry"""
+    print("\n" + "="*60)
+    print("SEPSIS HDT PIPELINE BENCHMARKS")
+    print("="*60)
+
+    results = []
+    for tier in tiers or list(TIERS):
+        results.extend(run_tier(tier, repeat=repeat, only=only, seed=seed))
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stages on synthetic scale tiers')
+    parser.add_argument('--tiers', nargs='+', choices=list(TIERS), default=list(TIERS))
+    parser.add_argument('--stages', nargs='+', help='only time these stages')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='fractional slowdown that counts as a regression')
+    parser.add_argument('--history', type=Path, default=HISTORY_PATH)
+    parser.add_argument('--no-save', action='store_true', help='do not append this run to the history')
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    run = run_benchmarks(args.tiers, repeat=args.repeat, only=args.stages)
+    regressions = find_regressions(run['results'], history, threshold=args.threshold)
+
+    if not args.no_save:
+        history.append(run)
+        print(f"\nSaved benchmark history to: {save_history(history, args.history)}")
+
+    if regressions:
+        print("\n" + "="*60)
+        print(f"REGRESSIONS (> {args.threshold:.0%} slower than baseline)")
+        print("="*60)
+        for r in regressions:
+            print(f"  {r['tier']:<5}{r['stage']:<32}{r['baseline']:.4f}s -> {r['best']:.4f}s (+{r['slowdown']:.0%})")
+        sys.exit(1)
+    print("\nNo regressions detected")
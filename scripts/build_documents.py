@@ -0,0 +1,191 @@
+"""
+Build the submission documents from one loaded dataset
+Author: Dr. Siddalingaiah H S
+
+generate_manuscript_final, generate_supplementary_final and
+generate_cover_letter each start their own interpreter and read the ranked
+tables, the summary statistics and the five figure PNGs themselves. This
+command reads them once into a DocumentInputs, hands that to every worker
+of a process pool through the pool initializer (the ranked tables only to
+the documents that render from them), and renders the documents
+concurrently. Unless --no-compare is given, the three scripts are also run
+one after another so the wall times can be compared.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from summary_stats import SUMMARY_FILE, load_summary
+
+BASE_DIR = Path(__file__).parent.parent
+
+FIGURES = [
+    'figure1_target_prioritization.png',
+    'figure2_compound_distribution.png',
+    'figure3_target_potency.png',
+    'figure4_pathway_heatmap.png',
+    'figure5_sepsis_timeline.png',
+]
+
+# Standalone script for each document, timed for the sequential comparison
+SCRIPTS = {
+    'manuscript': 'generate_manuscript_final.py',
+    'supplementary': 'generate_supplementary_final.py',
+    'cover_letter': 'generate_cover_letter.py',
+}
+
+# Documents rendered from the loaded ranked tables; the others stream the CSVs
+TABLE_DOCUMENTS = {'manuscript'}
+
+
+class DocumentInputs:
+    """Tables, summary statistics and figure bytes shared by the document generators"""
+
+    def __init__(self, targets, compounds, summary, figures):
+        self.targets = targets
+        self.compounds = compounds
+        self.summary = summary
+        self.figures = figures
+        self._digests = {}
+
+    @classmethod
+    def load(cls, base_dir=None, tables=True):
+        """Read everything once; tables=False leaves the ranked tables on disk"""
+        base_dir = Path(base_dir or BASE_DIR)
+        tables_dir = base_dir / 'outputs' / 'tables'
+        targets_path = tables_dir / 'targets_ranked.csv'
+        compounds_path = tables_dir / 'compounds_ranked.csv'
+        summary = load_summary(tables_dir / SUMMARY_FILE, targets_path, compounds_path)
+        figures = {name: (base_dir / 'outputs' / 'figures' / name).read_bytes() for name in FIGURES}
+        if not tables:
+            return cls(None, None, summary, figures)
+        return cls(pd.read_csv(targets_path), pd.read_csv(compounds_path), summary, figures)
+
+    def without_tables(self):
+        """The same summary and figures with the ranked tables left on disk"""
+        return type(self)(None, None, self.summary, self.figures)
+
+    def digest(self, name):
+        """Content hash of one named input: 'targets', 'compounds',
+        'summary.targets', 'summary.compounds' or 'figure:<file>'"""
+        if name not in self._digests:
+            if name.startswith('figure:'):
+                data = self.figures[name.split(':', 1)[1]]
+            elif name.startswith('summary.'):
+                data = json.dumps(getattr(self.summary, name.split('.', 1)[1]), sort_keys=True, default=str).encode()
+            else:
+                frame = getattr(self, name)
+                hashed = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+                data = ','.join(frame.columns).encode() + hashed.tobytes()
+            self._digests[name] = hashlib.sha256(data).hexdigest()
+        return self._digests[name]
+
+    def add_figure(self, doc, name, width):
+        """doc.add_picture from the loaded bytes, named as if added from the file"""
+        shape = doc.add_picture(io.BytesIO(self.figures[name]), width=width)
+        shape._inline.graphic.graphicData.pic.nvPicPr.cNvPr.set('name', name)
+        return shape
+
+
+def renderers():
+    """Document name -> function rendering it from a DocumentInputs"""
+    import generate_cover_letter
+    import generate_manuscript_final
+    import generate_supplementary_final
+
+    return {
+        'manuscript': generate_manuscript_final.create_complete_manuscript,
+        'supplementary': generate_supplementary_final.create_supplementary,
+        # The cover letter is static text
+        'cover_letter': lambda inputs: generate_cover_letter.create_cover_letter(),
+    }
+
+
+_inputs = None
+
+
+def _init_worker(inputs):
+    global _inputs
+    _inputs = inputs
+
+
+def _render(task):
+    """Render one document; returns (name, seconds, captured output)"""
+    name, tables = task
+    inputs = _inputs if tables is None else DocumentInputs(*tables, _inputs.summary, _inputs.figures)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        renderers()[name](inputs)
+    return name, time.perf_counter() - start, output.getvalue()
+
+
+def render_documents(inputs, names=None, processes=None):
+    """Render documents concurrently from shared inputs; results in request order
+
+    Workers share the summary and figures; the ranked tables are only sent
+    with the documents in TABLE_DOCUMENTS, so the supplement keeps
+    streaming its long tables from the CSVs instead of unpickling them.
+    """
+    names = list(names or SCRIPTS)
+    processes = processes or min(len(names), os.cpu_count() or 1)
+    tables = (inputs.targets, inputs.compounds) if inputs.targets is not None else None
+    tasks = [(name, tables if name in TABLE_DOCUMENTS else None) for name in names]
+    shared = inputs.without_tables()
+    if processes == 1 or len(names) <= 1:
+        _init_worker(shared)
+        return list(map(_render, tasks))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(shared,)) as pool:
+        return list(pool.map(_render, tasks))
+
+
+def time_scripts(names=None):
+    """Wall-clock seconds of running each standalone script one after another"""
+    start = time.perf_counter()
+    for name in names or SCRIPTS:
+        subprocess.run([sys.executable, str(BASE_DIR / 'scripts' / SCRIPTS[name])], cwd=BASE_DIR,
+                       check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def build_documents(names=None, processes=None, compare=True):
+    """Load inputs once, render every document and report the wall time"""
+    print("\n" + "="*60)
+    print("DOCUMENT BUILD")
+    print("="*60)
+
+    start = time.perf_counter()
+    inputs = DocumentInputs.load()
+    loaded = time.perf_counter() - start
+    results = render_documents(inputs, names, processes)
+    total = time.perf_counter() - start
+
+    for name, seconds, output in results:
+        print(output.rstrip())
+        print(f"  {name}: rendered in {seconds:.2f} s")
+    print(f"\nInputs loaded in {loaded:.2f} s; {len(results)} documents built in {total:.2f} s")
+    if compare:
+        sequential = time_scripts([name for name, _, _ in results])
+        print(f"Sequential scripts: {sequential:.2f} s ({sequential / total:.1f}x the single build)")
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the manuscript, supplement and cover letter together')
+    parser.add_argument('--documents', nargs='+', choices=list(SCRIPTS), help='only build these documents')
+    parser.add_argument('--processes', type=int,
+                        help='worker processes (default: one per document, up to the CPU count)')
+    parser.add_argument('--no-compare', action='store_true', help='skip timing the sequential scripts')
+    args = parser.parse_args()
+    build_documents(args.documents, args.processes, compare=not args.no_compare)
@@ -0,0 +1,266 @@
+"""
+Scoring-weight calibration for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Fits the composite-score weights instead of asserting them. Genes with
+approved (Phase 4) drugs in the compound table are the validated targets;
+candidate weight vectors on the simplex (grid, random or coordinate ascent)
+are scored by how well they recover those genes (AUROC and precision@k).
+Each batch of candidates is one (genes x components) @ (components x
+candidates) product with rank-based metrics, and batches are spread over a
+process pool. Stratified k-fold cross-validation refits the search on each
+training split and reports held-out recovery, so the gap between training
+and held-out metrics shows how much the fitted weights overfit.
+"""
+
+import itertools
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from scipy.stats import rankdata
+
+from run_pipeline import COMPONENTS, calculate_score_components, load_config, prepare_signature
+
+BASE_DIR = Path(__file__).parent.parent
+
+SEARCHES = ['grid', 'random', 'coordinate']
+METRICS = {'auroc': 'AUROC', 'precision': 'Precision_at_k'}
+
+DEFAULT_SETTINGS = {
+    'search': 'grid',
+    'metric': 'auroc',
+    'k': 10,
+    'step': 0.05,
+    'samples': 20000,
+    'folds': 5,
+    'min_phase': 4,
+    'seed': 0,
+    'processes': None,
+}
+
+# Candidates per task sent to a worker process
+BATCH_SIZE = 2048
+
+
+def validated_targets(compounds_df, min_phase=4):
+    """Genes with at least one compound at or beyond min_phase"""
+    return set(compounds_df.loc[compounds_df['Phase'] >= min_phase, 'Related_Gene'])
+
+
+def simplex_grid(step=0.05, n_components=len(COMPONENTS)):
+    """Every weight vector with entries on a step lattice that sums to one"""
+    units = int(round(1 / step))
+    # Stars and bars: choose the bar positions among units + n - 1 slots
+    bars = np.array(list(itertools.combinations(range(units + n_components - 1), n_components - 1)))
+    edges = np.column_stack([np.full(len(bars), -1), bars, np.full(len(bars), units + n_components - 1)])
+    return (np.diff(edges, axis=1) - 1) / units
+
+
+def random_weights(n_samples, seed=0, n_components=len(COMPONENTS)):
+    """Weight vectors drawn uniformly from the simplex"""
+    return np.random.default_rng(seed).dirichlet(np.ones(n_components), size=n_samples)
+
+
+def evaluate_weights(matrix, labels, weights, k=10):
+    """AUROC and precision@k of every candidate (rows of weights)
+
+    Scores are rounded like the pipeline's composite score; AUROC uses
+    average ranks for ties (Mann-Whitney) and precision@k takes the top k
+    in signature order among ties, as the stable ranking does.
+    """
+    scores = np.round(matrix @ weights.T, 3)
+    n_pos = labels.sum()
+    n_neg = len(labels) - n_pos
+    ranks = rankdata(scores, method='average', axis=0)
+    auroc = (ranks[labels].sum(axis=0) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+    top = np.argsort(-scores, axis=0, kind='stable')[:k]
+    precision = labels[top].mean(axis=0)
+    return np.column_stack([auroc, precision])
+
+
+def _evaluate_task(task):
+    return evaluate_weights(*task)
+
+
+def evaluate_batched(matrix, labels, weights, k=10, processes=None):
+    """evaluate_weights over candidate batches, in a process pool when worthwhile"""
+    batches = [weights[i:i + BATCH_SIZE] for i in range(0, len(weights), BATCH_SIZE)]
+    tasks = [(matrix, labels, batch, k) for batch in batches]
+    if processes == 1 or len(tasks) <= 1:
+        results = list(map(_evaluate_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_evaluate_task, tasks))
+    return np.vstack(results) if results else np.empty((0, 2))
+
+
+def coordinate_ascent(matrix, labels, start, metric=0, k=10, step=0.05, max_rounds=50, processes=None):
+    """Greedy search: move one weight at a time, rescaling the others to sum to one
+
+    Every round evaluates all (component, value) moves as one batch and
+    keeps the best if it improves the metric. Returns the visited candidates
+    and their metrics.
+    """
+    values = np.round(np.arange(0, 1 + step / 2, step), 10)
+    current = np.asarray(start, dtype=float) / np.sum(start)
+    visited, results = [current[None, :]], [evaluate_weights(matrix, labels, current[None, :], k)]
+    best = results[0][0, metric]
+    for _ in range(max_rounds):
+        moves = []
+        for j in range(len(current)):
+            rest = np.delete(current, j)
+            for value in values:
+                scale = (1 - value) / rest.sum() if rest.sum() > 0 else 0.0
+                moves.append(np.insert(rest * scale, j, value))
+        moves = np.array(moves)
+        metrics = evaluate_batched(matrix, labels, moves, k, processes)
+        visited.append(moves)
+        results.append(metrics)
+        choice = int(np.argmax(metrics[:, metric]))
+        if metrics[choice, metric] <= best + 1e-12:
+            break
+        best, current = metrics[choice, metric], moves[choice]
+    return np.vstack(visited), np.vstack(results)
+
+
+def search(matrix, labels, settings, start):
+    """Candidates and their (AUROC, precision@k) for the configured search"""
+    metric = list(METRICS).index(settings['metric'])
+    if settings['search'] == 'grid':
+        weights = simplex_grid(settings['step'])
+    elif settings['search'] == 'random':
+        weights = np.vstack([start / np.sum(start), random_weights(settings['samples'], settings['seed'])])
+    elif settings['search'] == 'coordinate':
+        return coordinate_ascent(matrix, labels, start, metric, settings['k'], settings['step'],
+                                 processes=settings['processes'])
+    else:
+        raise ValueError(f"Unknown search '{settings['search']}' (expected one of {', '.join(SEARCHES)})")
+    return weights, evaluate_batched(matrix, labels, weights, settings['k'], settings['processes'])
+
+
+def stratified_folds(labels, n_folds, seed=0):
+    """Fold index per gene with positives spread evenly across folds"""
+    rng = np.random.default_rng(seed)
+    folds = np.empty(len(labels), dtype=int)
+    for group in (np.flatnonzero(labels), np.flatnonzero(~labels)):
+        shuffled = rng.permutation(group)
+        folds[shuffled] = np.arange(len(shuffled)) % n_folds
+    return folds
+
+
+def cross_validate(matrix, labels, settings, start):
+    """Refit the search on each training split and score the held-out genes"""
+    metric = list(METRICS).index(settings['metric'])
+    folds = stratified_folds(labels, settings['folds'], settings['seed'])
+    rows = []
+    for fold in range(settings['folds']):
+        train, test = folds != fold, folds == fold
+        if labels[test].sum() == 0 or labels[train].sum() == 0:
+            continue
+        # Scale k with the split size so precision@k stays comparable
+        k_train = max(1, round(settings['k'] * train.mean()))
+        k_test = max(1, round(settings['k'] * test.mean()))
+        weights, metrics = search(matrix[train], labels[train], {**settings, 'k': k_train}, start)
+        best = int(np.argmax(metrics[:, metric]))
+        held_out = evaluate_weights(matrix[test], labels[test], weights[best][None, :], k_test)[0]
+        rows.append({
+            'Fold': fold + 1,
+            'Train_Genes': int(train.sum()),
+            'Test_Genes': int(test.sum()),
+            'Train_Positives': int(labels[train].sum()),
+            'Test_Positives': int(labels[test].sum()),
+            **dict(zip(COMPONENTS, np.round(weights[best], 4))),
+            'Train_AUROC': metrics[best, 0],
+            'Test_AUROC': held_out[0],
+            'Train_Precision_at_k': metrics[best, 1],
+            'Test_Precision_at_k': held_out[1],
+        })
+    return pd.DataFrame(rows)
+
+
+def calibrate_weights(genes_df, validated, config_weights, settings=None):
+    """Search weight space on all genes and cross-validate the search
+
+    Returns (candidates table sorted by the metric, cross-validation table).
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if settings['metric'] not in METRICS:
+        raise ValueError(f"Unknown metric '{settings['metric']}' (expected one of {', '.join(METRICS)})")
+    matrix = np.ascontiguousarray(calculate_score_components(genes_df)[COMPONENTS].to_numpy(dtype=float))
+    labels = genes_df['Gene'].isin(validated).to_numpy()
+    if labels.all() or not labels.any():
+        raise ValueError("Calibration needs both validated and non-validated genes")
+    start = np.array([config_weights[name] for name in COMPONENTS], dtype=float)
+
+    weights, metrics = search(matrix, labels, settings, start)
+    candidates = pd.DataFrame(np.round(weights, 4), columns=COMPONENTS)
+    candidates['AUROC'] = metrics[:, 0]
+    candidates['Precision_at_k'] = metrics[:, 1]
+    sort_by = [METRICS[settings['metric']]] + [m for m in METRICS.values() if m != METRICS[settings['metric']]]
+    candidates = candidates.drop_duplicates(COMPONENTS).sort_values(sort_by, ascending=False, kind='mergesort')
+
+    cv = cross_validate(matrix, labels, settings, start) if settings['folds'] > 1 else pd.DataFrame()
+    return candidates.reset_index(drop=True), cv
+
+
+def run_calibration(config=None, settings=None):
+    """Calibration mode: fit weights, report CV and save the tables"""
+    print("\n" + "="*60)
+    print("SCORING WEIGHT CALIBRATION")
+    print("="*60)
+
+    config = config or load_config()
+    settings = {**DEFAULT_SETTINGS, **(config.get('calibration', {}) or {}), **(settings or {})}
+    genes_df = prepare_signature(config)
+    compounds_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
+    validated = validated_targets(compounds_df, settings['min_phase'])
+    print(f"Validated targets (Phase >= {settings['min_phase']}): {int(genes_df['Gene'].isin(validated).sum())} "
+          f"of {len(genes_df)} genes")
+
+    start = time.perf_counter()
+    candidates, cv = calibrate_weights(genes_df, validated, config['scoring'], settings)
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {len(candidates)} weight vectors ({settings['search']} search, "
+          f"processes: {settings['processes'] or os.cpu_count()}) in {elapsed:.1f} s")
+
+    matrix = calculate_score_components(genes_df)[COMPONENTS].to_numpy(dtype=float)
+    labels = genes_df['Gene'].isin(validated).to_numpy()
+    current = evaluate_weights(matrix, labels, np.array([[config['scoring'][c] for c in COMPONENTS]]), settings['k'])[0]
+    best = candidates.iloc[0]
+    print(f"\n{'Weights':<12}" + ''.join(f"{c[:12]:>14}" for c in COMPONENTS)
+          + f"{'AUROC':>8}{'P@' + str(settings['k']):>8}")
+    print(f"{'config':<12}" + ''.join(f"{config['scoring'][c]:>14.3f}" for c in COMPONENTS)
+          + f"{current[0]:>8.3f}{current[1]:>8.3f}")
+    print(f"{'calibrated':<12}" + ''.join(f"{best[c]:>14.3f}" for c in COMPONENTS)
+          + f"{best['AUROC']:>8.3f}{best['Precision_at_k']:>8.3f}")
+
+    if len(cv):
+        metric = METRICS[settings['metric']]
+        print(f"\n{len(cv)}-fold cross-validation ({metric}): train {cv['Train_' + metric].mean():.3f}, "
+              f"held-out {cv['Test_' + metric].mean():.3f} "
+              f"(gap {cv['Train_' + metric].mean() - cv['Test_' + metric].mean():+.3f})")
+
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+    candidates.head(100).to_csv(tables_dir / 'weight_calibration.csv', index=False)
+    cv.to_csv(tables_dir / 'weight_calibration_cv.csv', index=False)
+    print(f"Saved calibration tables to: {tables_dir}")
+    return candidates, cv
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fit scoring weights to clinically validated targets')
+    parser.add_argument('--search', choices=SEARCHES)
+    parser.add_argument('--metric', choices=list(METRICS))
+    parser.add_argument('--k', type=int, help='cut-off for precision@k')
+    parser.add_argument('--step', type=float, help='weight lattice step (grid and coordinate search)')
+    parser.add_argument('--samples', type=int, help='weight vectors for random search')
+    parser.add_argument('--folds', type=int, help='cross-validation folds (1 disables)')
+    parser.add_argument('--processes', type=int, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    run_calibration(settings={k: v for k, v in vars(args).items() if v is not None})
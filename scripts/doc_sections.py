@@ -0,0 +1,149 @@
+"""
+Section-level incremental document builds
+Author: Dr. Siddalingaiah H S
+
+A document is a list of registered sections: functions that append
+paragraphs, tables and figures to a python-docx Document and declare the
+inputs they read ('targets', 'summary.compounds', 'figure:<file>', ... as
+named by DocumentInputs.digest). The body XML each section renders is
+cached under a hash of the section, the generator's source and those
+inputs. A build renders only sections whose key has no cached fragment and
+splices the rest back from the cache; pictures are re-attached from a
+content-addressed media cache and renumbered in document order, so warm
+and cold builds write the same file.
+"""
+
+import copy
+import hashlib
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+from docx.opc.pkgwriter import PackageWriter
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+import tracing
+
+# Bump to invalidate every cached fragment (e.g. after a python-docx upgrade)
+CACHE_VERSION = 1
+
+EMBED = qn('r:embed')
+BLIP = './/' + qn('a:blip')
+DOC_PR = './/' + qn('wp:docPr')
+
+_source_digests = {}
+
+
+def source_digest(func):
+    """Hash of the module source defining func (any edit invalidates its sections)"""
+    module = sys.modules[func.__module__]
+    if module.__name__ not in _source_digests:
+        _source_digests[module.__name__] = hashlib.sha256(Path(module.__file__).read_bytes()).hexdigest()
+    return _source_digests[module.__name__]
+
+
+class _MediaStoredZip:
+    """Package writer target: XML parts deflated, already-compressed media stored"""
+
+    def __init__(self, zipf):
+        self.zipf = zipf
+
+    def write(self, pack_uri, blob):
+        compression = zipfile.ZIP_STORED if pack_uri.startswith('/word/media/') else zipfile.ZIP_DEFLATED
+        self.zipf.writestr(pack_uri.membername, blob, compress_type=compression)
+
+
+def save_package(doc, path):
+    """doc.save without re-deflating the PNG/JPEG media parts"""
+    package = doc.part.package
+    for part in package.parts:
+        part.before_marshal()
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        target = _MediaStoredZip(zipf)
+        PackageWriter._write_content_types_stream(target, package.parts)
+        PackageWriter._write_pkg_rels(target, package.rels)
+        PackageWriter._write_parts(target, package.parts)
+    return path
+
+
+class SectionedDocument:
+    """A document assembled from registered sections with cached body fragments"""
+
+    def __init__(self, name, setup=None):
+        self.name = name
+        self.setup = setup
+        self.sections = []
+
+    def section(self, title, depends=()):
+        """Decorator registering func(doc, inputs) as the next section"""
+        def decorate(func):
+            self.sections.append((title, tuple(sorted(depends)), func))
+            return func
+        return decorate
+
+    def section_key(self, title, depends, func, inputs):
+        parts = [f'v{CACHE_VERSION}', self.name, title, source_digest(func)]
+        parts += [f'{dep}={inputs.digest(dep)}' for dep in depends]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:24]
+
+    def _store(self, doc, elements, path, media_dir):
+        """Write rendered body elements as a fragment, pictures by content hash"""
+        # The document root's namespaces, so pictures keep their own a:/pic: declarations
+        body = etree.Element(qn('w:body'), nsmap=doc.element.nsmap)
+        for element in elements:
+            body.append(copy.deepcopy(element))
+        for blip in body.iterfind(BLIP):
+            image = doc.part.related_parts[blip.get(EMBED)]
+            media = media_dir / image.sha1
+            if not media.exists():
+                media.write_bytes(image.blob)
+            blip.set(EMBED, f'sha1:{image.sha1}')
+        path.write_bytes(etree.tostring(body, encoding='utf-8'))
+
+    def _splice(self, doc, path, media_dir):
+        """Append a cached fragment's elements to the document body"""
+        fragment = parse_xml(path.read_bytes())
+        for blip in fragment.iterfind(BLIP):
+            blob = (media_dir / blip.get(EMBED).split(':', 1)[1]).read_bytes()
+            rId, _ = doc.part.get_or_add_image(io.BytesIO(blob))
+            blip.set(EMBED, rId)
+        sect_pr = doc.element.body.find(qn('w:sectPr'))
+        for element in list(fragment):
+            sect_pr.addprevious(element)
+
+    def build(self, doc, inputs, path, cache_dir, use_cache=True):
+        """Render stale sections, splice cached ones and save; returns {title: 'cached'|'rendered'}"""
+        cache_dir = Path(cache_dir)
+        media_dir = cache_dir / 'media'
+        media_dir.mkdir(parents=True, exist_ok=True)
+        spans = tracing.sections(self.name)
+        if self.setup is not None:
+            self.setup(doc)
+
+        body = doc.element.body
+        status = {}
+        for title, depends, func in self.sections:
+            spans.start(title)
+            fragment = cache_dir / f'{self.name}_{self.section_key(title, depends, func, inputs)}.xml'
+            if use_cache and fragment.exists():
+                self._splice(doc, fragment, media_dir)
+                status[title] = 'cached'
+                tracing.count('section_cache_hits')
+                continue
+            before = len(body) - 1
+            func(doc, inputs)
+            self._store(doc, body[before:len(body) - 1], fragment, media_dir)
+            status[title] = 'rendered'
+            tracing.count('section_cache_misses')
+
+        spans.start('save')
+        # Picture ids in document order, as python-docx numbers them in one pass
+        for i, doc_pr in enumerate(body.iterfind(DOC_PR), start=1):
+            doc_pr.set('id', str(i))
+            doc_pr.set('name', f'Picture {i}')
+        save_package(doc, path)
+        spans.end()
+        return status
@@ -0,0 +1,133 @@
+"""
+Streaming table writer for large DOCX documents
+Author: Dr. Siddalingaiah H S
+
+python-docx keeps every table cell as an lxml element, so a million-row
+table costs gigabytes before the document is saved. Here the document is
+built with python-docx as usual, but a large table gets only its header
+row; its body rows are registered as an iterator of chunks. On save the
+small document part is split at the table and the row XML is generated
+chunk by chunk straight into the deflate stream of the .docx zip container,
+so memory stays constant in the number of rows. The rows match what
+python-docx produces for cell.text assignments.
+"""
+
+import io
+import re
+import zipfile
+import pandas as pd
+from xml.sax.saxutils import escape
+from lxml import etree
+
+from docx.oxml.ns import qn
+
+DOCUMENT_PART = 'word/document.xml'
+
+# Rows per chunk when streaming a CSV into a table
+CHUNK_ROWS = 50_000
+
+BREAKS = re.compile('([\t\n\r])')
+
+
+def paragraph_xml(text):
+    """<w:p> XML for one escaped cell text, as python-docx writes cell.text"""
+    if not text:
+        return '<w:p><w:r/></w:p>'
+    # Tabs and line breaks become <w:tab/> and <w:br/> between text elements
+    parts = []
+    for piece in BREAKS.split(text):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\n', '\r'):
+            parts.append('<w:br/>')
+        elif piece:
+            opening = '<w:t xml:space="preserve">' if piece.strip() != piece else '<w:t>'
+            parts.append(opening + piece + '</w:t>')
+    return '<w:p><w:r>' + ''.join(parts) + '</w:r></w:p>'
+
+
+def row_template(widths):
+    """str.format template of one <w:tr> with a {} slot per cell paragraph"""
+    cells = ''.join(f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{w}"/></w:tcPr>{{}}</w:tc>' for w in widths)
+    return '<w:tr>' + cells + '</w:tr>'
+
+
+def rows_xml(chunk, widths):
+    """Concatenated <w:tr> XML for a DataFrame of formatted cell text
+
+    The chunk's cells are joined into one string so XML escaping is three
+    C-level replaces per chunk rather than per cell; missing values become
+    empty cells.
+    """
+    if chunk.empty:
+        return ''
+    cells = chunk.astype(object).where(chunk.notna(), '').to_numpy().ravel().tolist()
+    text = '\x00'.join(map(str, cells))
+    if '&' in text or '<' in text or '>' in text:
+        text = escape(text)
+    paragraphs = [f'<w:p><w:r><w:t>{c}</w:t></w:r></w:p>' if c and c.strip() == c and not BREAKS.search(c)
+                  else paragraph_xml(c) for c in text.split('\x00')]
+    template = row_template(widths)
+    n_cols = chunk.shape[1]
+    return ''.join([template.format(*paragraphs[i:i + n_cols]) for i in range(0, len(paragraphs), n_cols)])
+
+
+class StreamingDocument:
+    """A python-docx Document whose large table bodies are written while saving"""
+
+    def __init__(self, doc, zip64=False):
+        self.doc = doc
+        # Needed once the document part passes 2 GiB (roughly 2.5M table rows)
+        self.zip64 = zip64
+        self.streams = {}
+        self.rows_written = {}
+
+    def stream_rows(self, table, chunks, name=None):
+        """Fill table (header rows already added) from an iterable of DataFrame chunks
+
+        Each chunk holds the formatted cell text, one column per table column.
+        Rows are generated when the document is saved.
+        """
+        name = name or f'stream{len(self.streams)}'
+        marker = f'docx-stream:{name}'
+        widths = [int(col.get(qn('w:w'))) for col in table._tbl.tblGrid.iterchildren(qn('w:gridCol'))]
+        # A comment after the header rows marks where the body goes
+        table._tbl.append(etree.Comment(marker))
+        self.streams[marker] = (name, widths, chunks)
+        self.rows_written[name] = 0
+        return name
+
+    def _write_document_part(self, xml, out):
+        for marker, (name, widths, chunks) in self.streams.items():
+            head, xml = xml.split(f'<!--{marker}-->', 1)
+            out.write(head.encode('utf-8'))
+            for chunk in chunks:
+                out.write(rows_xml(chunk, widths).encode('utf-8'))
+                self.rows_written[name] += len(chunk)
+        out.write(xml.encode('utf-8'))
+
+    def save(self, path):
+        buffer = io.BytesIO()
+        self.doc.save(buffer)
+        with zipfile.ZipFile(buffer) as source, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+            for info in source.infolist():
+                if info.filename == DOCUMENT_PART:
+                    entry = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                    entry.compress_type = zipfile.ZIP_DEFLATED
+                    with target.open(entry, 'w', force_zip64=self.zip64) as out:
+                        self._write_document_part(source.read(info.filename).decode('utf-8'), out)
+                else:
+                    target.writestr(info, source.read(info.filename))
+        return path
+
+
+def csv_chunks(path, formatter, chunksize=CHUNK_ROWS):
+    """Formatted chunks of a CSV table, read lazily when the document is saved"""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield formatter(chunk)
+
+
+def frame_chunks(frame, formatter, chunksize=CHUNK_ROWS):
+    """Formatted chunks of a DataFrame already in memory"""
+    for start in range(0, len(frame), chunksize):
+        yield formatter(frame.iloc[start:start + chunksize])
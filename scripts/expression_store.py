@@ -0,0 +1,278 @@
+"""
+Memory-mapped expression matrix store for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Converts each GEO cohort once into a raw float32 probe x sample matrix plus
+small sidecar indexes (probes, gene symbols, samples, case/control groups).
+Readers get zero-copy np.memmap views, so opening a cohort costs the same
+regardless of its size, and process-pool workers that open the same cohort
+share one physical copy through the OS page cache.
+"""
+
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from geo_expression import (
+    DEFAULT_CASE_PATTERN, DEFAULT_CONTROL_PATTERN, CHUNK_ROWS, assign_groups,
+    check_groups, gene_level_statistics, iter_log_blocks, load_probe_map, map_probe_symbols,
+    open_series_matrix, read_series_header, series_matrix_path, welch_statistics,
+)
+
+BASE_DIR = Path(__file__).parent.parent
+
+STORE_VERSION = 2
+MATRIX_FILE = 'matrix.f32'
+META_FILE = 'meta.json'
+
+# Group codes stored per sample
+CASE, CONTROL, OTHER = 1, 0, -1
+
+
+class ExpressionCohort:
+    """Read-only view of one converted cohort"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.cohort_id = self.meta['cohort_id']
+        self.shape = tuple(self.meta['shape'])
+        self.probes = np.load(self.path / 'probes.npy')
+        self.symbols = np.load(self.path / 'symbols.npy')
+        self.samples = np.load(self.path / 'samples.npy')
+        self.groups = np.load(self.path / 'groups.npy')
+        self._values = None
+
+    @property
+    def values(self):
+        """Zero-copy float32 view of the probe x sample matrix (mapped lazily)"""
+        if self._values is None:
+            if self.shape[0] == 0:
+                self._values = np.empty(self.shape, dtype=np.float32)
+            else:
+                self._values = np.memmap(self.path / MATRIX_FILE, dtype=np.float32, mode='r', shape=self.shape)
+        return self._values
+
+    @property
+    def case(self):
+        return self.groups == CASE
+
+    @property
+    def control(self):
+        return self.groups == CONTROL
+
+    def iter_blocks(self, chunk_rows=CHUNK_ROWS):
+        """Yield (row slice, block view) pairs without copying"""
+        for start in range(0, self.shape[0], chunk_rows):
+            rows = slice(start, min(start + chunk_rows, self.shape[0]))
+            yield rows, self.values[rows]
+
+    def gene_rows(self, symbols):
+        """Row index of each requested symbol (-1 where absent)"""
+        return pd.Index(self.symbols).get_indexer(symbols)
+
+    def __repr__(self):
+        return f"ExpressionCohort({self.cohort_id!r}, {self.shape[0]} probes x {self.shape[1]} samples)"
+
+
+def store_dir(config):
+    """Root of the memory-mapped store"""
+    return BASE_DIR / config.get('expression_store', 'data/geo/store')
+
+
+def cohort_path(root, cohort_id):
+    return Path(root) / cohort_id
+
+
+def has_cohort(root, cohort_id):
+    return (cohort_path(root, cohort_id) / META_FILE).exists()
+
+
+def open_cohort(root, cohort_id):
+    """Open a converted cohort; only the sidecar indexes are read"""
+    return ExpressionCohort(cohort_path(root, cohort_id))
+
+
+def file_fingerprint(path):
+    """[size, mtime] of a file, or None when it does not exist"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime]
+
+
+def cohort_settings(config, dataset):
+    """Everything besides the source matrix that determines a converted cohort
+
+    Grouping patterns, the log transform, and the probe map file, or (when
+    there is none) the reference dumps the gene resolver is built from.
+    """
+    geo_dir = BASE_DIR / config.get('geo_dir', 'data/geo')
+    settings = {
+        'case_pattern': dataset.get('case_pattern', DEFAULT_CASE_PATTERN),
+        'control_pattern': dataset.get('control_pattern', DEFAULT_CONTROL_PATTERN),
+        'log_transform': dataset.get('log_transform', 'auto'),
+        'probe_map': None,
+        'resolver': None,
+    }
+    if dataset.get('probe_map'):
+        settings['probe_map'] = [dataset['probe_map'], file_fingerprint(geo_dir / dataset['probe_map'])]
+    else:
+        reference = config.get('reference', {}) or {}
+        gene_info = reference.get('gene_info')
+        if gene_info and (BASE_DIR / gene_info).exists():
+            uniprot = reference.get('uniprot_idmapping')
+            settings['resolver'] = [file_fingerprint(BASE_DIR / gene_info),
+                                    file_fingerprint(BASE_DIR / uniprot) if uniprot else None]
+    return settings
+
+
+def convert_series_matrix(source, root, cohort_id, case_pattern=DEFAULT_CASE_PATTERN,
+                          control_pattern=DEFAULT_CONTROL_PATTERN, probe_map=None, resolver=None,
+                          log_transform='auto', chunk_rows=CHUNK_ROWS, settings=None):
+    """Stream a series matrix into the store as log2-scale float32
+
+    settings (from cohort_settings) is recorded in the metadata so that
+    is_current can tell when the cohort must be converted again.
+    """
+    final = cohort_path(root, cohort_id)
+    staging = final.with_name(final.name + '.tmp')
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    probe_ids = []
+    n_rows = 0
+    with open_series_matrix(source) as handle, open(staging / MATRIX_FILE, 'wb') as out:
+        samples, labels = read_series_header(handle)
+        case, control = assign_groups(labels, case_pattern, control_pattern)
+        for ids, block in iter_log_blocks(handle, log_transform, chunk_rows):
+            out.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+            probe_ids.append(ids)
+            n_rows += len(ids)
+
+    probes = np.concatenate(probe_ids).astype(str) if probe_ids else np.array([], dtype=str)
+    symbols = pd.Series(map_probe_symbols(probes, probe_map, resolver), dtype='object').fillna('')
+    groups = np.where(case, CASE, np.where(control, CONTROL, OTHER)).astype(np.int8)
+
+    np.save(staging / 'probes.npy', probes)
+    np.save(staging / 'symbols.npy', symbols.values.astype(str))
+    np.save(staging / 'samples.npy', np.asarray(samples, dtype=str))
+    np.save(staging / 'groups.npy', groups)
+    source_stat = Path(source).stat()
+    meta = {
+        'version': STORE_VERSION,
+        'cohort_id': cohort_id,
+        'shape': [n_rows, len(samples)],
+        'dtype': 'float32',
+        'scale': 'log2',
+        'source': Path(source).name,
+        'source_size': source_stat.st_size,
+        'source_mtime': source_stat.st_mtime,
+        'settings': settings,
+    }
+    with open(staging / META_FILE, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap in atomically so readers never see a half-written cohort
+    if final.exists():
+        shutil.rmtree(final)
+    os.replace(staging, final)
+    return open_cohort(root, cohort_id)
+
+
+def is_current(root, cohort_id, source, settings=None):
+    """True when the stored cohort was converted from this exact source file with these settings"""
+    if not has_cohort(root, cohort_id):
+        return False
+    with open(cohort_path(root, cohort_id) / META_FILE) as f:
+        meta = json.load(f)
+    source_stat = Path(source).stat()
+    return (meta.get('version') == STORE_VERSION and meta.get('source_size') == source_stat.st_size
+            and meta.get('source_mtime') == source_stat.st_mtime and meta.get('settings') == settings)
+
+
+def cohort_differential_expression(cohort, chunk_rows=CHUNK_ROWS):
+    """Welch statistics per gene straight from the memory-mapped matrix"""
+    case, control = cohort.case, cohort.control
+    check_groups(cohort.cohort_id, case, control)
+    blocks = [pd.DataFrame(welch_statistics(block, case, control)) for _, block in cohort.iter_blocks(chunk_rows)]
+    probe_stats = pd.concat(blocks, ignore_index=True)
+    probe_stats.insert(0, 'Probe', cohort.probes)
+    symbols = pd.Series(cohort.symbols, dtype='object').replace('', np.nan).values
+    return gene_level_statistics(probe_stats, symbols)
+
+
+def _open_and_apply(task):
+    root, cohort_id, func = task
+    return cohort_id, func(open_cohort(root, cohort_id))
+
+
+def map_cohorts(func, root, cohort_ids, processes=None):
+    """Apply func(cohort) to each cohort in a process pool
+
+    Workers receive only the store path and reopen the cohort themselves, so
+    the matrices are shared through the page cache rather than pickled.
+    func must be a module-level function.
+    """
+    tasks = [(str(root), cohort_id, func) for cohort_id in cohort_ids]
+    if processes == 1 or len(tasks) <= 1:
+        return dict(map(_open_and_apply, tasks))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return dict(pool.map(_open_and_apply, tasks))
+
+
+def convert_configured_cohorts(config, resolver=None, force=False):
+    """Conversion step: write every locally available GEO cohort to the store"""
+    print("\n" + "="*60)
+    print("EXPRESSION STORE CONVERSION")
+    print("="*60)
+
+    geo_dir = BASE_DIR / config.get('geo_dir', 'data/geo')
+    root = store_dir(config)
+    converted = []
+    for dataset in config['geo_datasets']:
+        source = series_matrix_path(dataset, geo_dir)
+        if source is None:
+            print(f"  {dataset['id']}: no local series matrix, skipped")
+            continue
+        settings = cohort_settings(config, dataset)
+        if not force and is_current(root, dataset['id'], source, settings):
+            print(f"  {dataset['id']}: up to date")
+            converted.append(dataset['id'])
+            continue
+        start = time.perf_counter()
+        probe_map = load_probe_map(geo_dir / dataset['probe_map']) if dataset.get('probe_map') else None
+        cohort = convert_series_matrix(
+            source, root, dataset['id'],
+            case_pattern=dataset.get('case_pattern', DEFAULT_CASE_PATTERN),
+            control_pattern=dataset.get('control_pattern', DEFAULT_CONTROL_PATTERN),
+            probe_map=probe_map,
+            resolver=resolver,
+            log_transform=dataset.get('log_transform', 'auto'),
+            settings=settings,
+        )
+        print(f"  {dataset['id']}: {cohort.shape[0]} probes x {cohort.shape[1]} samples "
+              f"({time.perf_counter() - start:.1f}s)")
+        converted.append(dataset['id'])
+    return converted
+
+
+if __name__ == '__main__':
+    import argparse
+    from run_pipeline import load_config
+    from gene_resolver import load_gene_resolver
+
+    parser = argparse.ArgumentParser(description='Convert GEO series matrices to the memory-mapped store')
+    parser.add_argument('--force', action='store_true', help='re-convert cohorts that are up to date')
+    args = parser.parse_args()
+
+    config = load_config()
+    convert_configured_cohorts(config, resolver=load_gene_resolver(config), force=args.force)
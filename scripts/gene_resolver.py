@@ -0,0 +1,216 @@
+"""
+Offline gene identifier resolution for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Builds hash indexes over a locally downloaded NCBI gene_info dump (and an
+optional UniProt idmapping file) so that symbols, aliases, Entrez, Ensembl
+and UniProt identifiers resolve in one vectorized call without any network
+round trip.
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+# Namespaces in resolution priority order; an exact symbol match always wins
+# over an alias that happens to be shared by several genes.
+NAMESPACES = ['symbol', 'entrez', 'ensembl', 'uniprot', 'alias']
+
+GENE_INFO_COLUMNS = ['#tax_id', 'GeneID', 'Symbol', 'Synonyms', 'dbXrefs']
+
+
+def _normalize(values):
+    """Upper-case and strip identifiers so lookups are case-insensitive"""
+    return pd.Series(values, dtype='object').astype(str).str.strip().str.upper()
+
+
+def read_gene_info(path, tax_id=9606):
+    """Read an NCBI gene_info dump into a compact gene table and xref table"""
+    info = pd.read_csv(path, sep='\t', usecols=GENE_INFO_COLUMNS, dtype=str, compression='infer')
+    info = info[info['#tax_id'] == str(tax_id)]
+
+    genes = pd.DataFrame({
+        'GeneID': info['GeneID'].astype(np.int64).values,
+        'Symbol': info['Symbol'].values,
+    })
+
+    # Ensembl IDs live in the pipe-separated dbXrefs column ("Ensembl:ENSG...")
+    xrefs = info[['GeneID', 'dbXrefs']].assign(dbXrefs=info['dbXrefs'].str.split('|')).explode('dbXrefs')
+    ensembl = xrefs[xrefs['dbXrefs'].str.startswith('Ensembl:', na=False)]
+    ensembl = pd.DataFrame({
+        'GeneID': ensembl['GeneID'].astype(np.int64).values,
+        'key': ensembl['dbXrefs'].str[len('Ensembl:'):].values,
+        'namespace': 'ensembl',
+    })
+    primary_ensembl = ensembl.drop_duplicates('GeneID').set_index('GeneID')['key']
+    genes['Ensembl_ID'] = genes['GeneID'].map(primary_ensembl)
+
+    aliases = info[['GeneID', 'Synonyms']].assign(Synonyms=info['Synonyms'].str.split('|')).explode('Synonyms')
+    aliases = aliases[aliases['Synonyms'].notna() & (aliases['Synonyms'] != '-')]
+    aliases = pd.DataFrame({
+        'GeneID': aliases['GeneID'].astype(np.int64).values,
+        'key': aliases['Synonyms'].values,
+        'namespace': 'alias',
+    })
+
+    keys = pd.concat([
+        pd.DataFrame({'GeneID': genes['GeneID'], 'key': genes['Symbol'], 'namespace': 'symbol'}),
+        pd.DataFrame({'GeneID': genes['GeneID'], 'key': genes['GeneID'].astype(str), 'namespace': 'entrez'}),
+        ensembl,
+        aliases,
+    ], ignore_index=True)
+
+    return genes, keys
+
+
+def read_uniprot_idmapping(path):
+    """Read UniProt accession -> Entrez pairs from an idmapping.dat dump"""
+    mapping = pd.read_csv(path, sep='\t', header=None, names=['key', 'type', 'GeneID'],
+                          dtype=str, compression='infer')
+    mapping = mapping[mapping['type'] == 'GeneID']
+    return pd.DataFrame({
+        'GeneID': mapping['GeneID'].astype(np.int64).values,
+        'key': mapping['key'].values,
+        'namespace': 'uniprot',
+    })
+
+
+class GeneResolver:
+    """Hash-indexed resolver mapping any supported identifier to an Entrez gene"""
+
+    def __init__(self, genes, keys):
+        self.genes = genes.reset_index(drop=True)
+        self._gene_pos = pd.Index(self.genes['GeneID'])
+
+        keys = keys.assign(key=_normalize(keys['key']).values).drop_duplicates(['namespace', 'key', 'GeneID'])
+        keys = keys[keys['GeneID'].isin(self._gene_pos)]
+
+        self._indexes = {}
+        for namespace in NAMESPACES:
+            ns = keys[keys['namespace'] == namespace]
+            grouped = ns.groupby('key', sort=False)['GeneID']
+            n_candidates = grouped.size()
+            first = grouped.first()
+            # Ambiguous keys map to several genes; keep their candidate count so
+            # callers can report them instead of silently picking one
+            self._indexes[namespace] = (
+                pd.Index(n_candidates.index),
+                self._gene_pos.get_indexer(first.values),
+                n_candidates.values,
+            )
+        self._candidates = keys
+
+    @classmethod
+    def from_files(cls, gene_info_path, uniprot_path=None, tax_id=9606):
+        """Build a resolver from local reference dumps"""
+        genes, keys = read_gene_info(gene_info_path, tax_id=tax_id)
+        if uniprot_path is not None and Path(uniprot_path).exists():
+            keys = pd.concat([keys, read_uniprot_idmapping(uniprot_path)], ignore_index=True)
+        return cls(genes, keys)
+
+    def __len__(self):
+        return len(self.genes)
+
+    def resolve(self, queries):
+        """Resolve a batch of identifiers in one vectorized pass per namespace"""
+        queries = pd.Series(queries, dtype='object').reset_index(drop=True)
+        normalized = _normalize(queries)
+        n = len(queries)
+
+        gene_pos = np.full(n, -1, dtype=np.int64)
+        matched_by = np.full(n, None, dtype=object)
+        ambiguous = np.zeros(n, dtype=bool)
+        pending = np.arange(n)
+
+        for namespace in NAMESPACES:
+            if len(pending) == 0:
+                break
+            index, positions, n_candidates = self._indexes[namespace]
+            hit = index.get_indexer(normalized.values[pending])
+            found = hit >= 0
+            rows = pending[found]
+            hit = hit[found]
+
+            matched_by[rows] = namespace
+            is_ambiguous = n_candidates[hit] > 1
+            ambiguous[rows[is_ambiguous]] = True
+            gene_pos[rows[~is_ambiguous]] = positions[hit[~is_ambiguous]]
+            pending = pending[~found]
+
+        resolved = gene_pos >= 0
+        safe_pos = np.where(resolved, gene_pos, 0)
+        result = pd.DataFrame({
+            'Query': queries.values,
+            'GeneID': pd.array(np.where(resolved, self.genes['GeneID'].values[safe_pos], 0), dtype='Int64'),
+            'Symbol': np.where(resolved, self.genes['Symbol'].values[safe_pos], None),
+            'Ensembl_ID': np.where(resolved, self.genes['Ensembl_ID'].values[safe_pos], None),
+            'Matched_By': matched_by,
+        })
+        result.loc[~resolved, 'GeneID'] = pd.NA
+        result['Status'] = np.select([resolved, ambiguous], ['resolved', 'ambiguous'], default='unresolved')
+        result['Candidates'] = ''
+
+        # Candidate lists are only materialized for the (few) ambiguous queries
+        if ambiguous.any():
+            amb_keys = normalized[ambiguous]
+            amb_ns = matched_by[ambiguous]
+            cand = self._candidates.merge(
+                pd.DataFrame({'key': amb_keys.values, 'namespace': amb_ns}), on=['key', 'namespace'])
+            cand = cand.assign(Symbol=self.genes['Symbol'].values[self._gene_pos.get_indexer(cand['GeneID'])])
+            joined = cand.groupby(['namespace', 'key'])['Symbol'].agg(lambda s: '|'.join(sorted(s)))
+            result.loc[ambiguous, 'Candidates'] = [joined[(ns, k)] for ns, k in zip(amb_ns, amb_keys)]
+
+        return result
+
+    def alias_table(self):
+        """(Symbol, Alias) for every alias naming one gene and no other gene's symbol"""
+        index, positions, n_candidates = self._indexes['alias']
+        keep = (n_candidates == 1) & (self._indexes['symbol'][0].get_indexer(index) < 0)
+        return pd.DataFrame({
+            'Symbol': self.genes['Symbol'].values[positions[keep]],
+            'Alias': index[keep],
+        })
+
+
+def load_gene_resolver(config):
+    """Build the resolver from the configured reference dumps, or None if absent"""
+    reference = config.get('reference', {}) or {}
+    gene_info = reference.get('gene_info')
+    if not gene_info or not (BASE_DIR / gene_info).exists():
+        return None
+    uniprot = reference.get('uniprot_idmapping')
+    return GeneResolver.from_files(BASE_DIR / gene_info, BASE_DIR / uniprot if uniprot else None)
+
+
+def annotate_identifiers(genes_df, resolver):
+    """Attach Entrez and Ensembl IDs to a signature and report failed lookups"""
+    # 'Gene' holds the official symbol; 'Symbol' is the display name (e.g. NFkB)
+    resolved = resolver.resolve(genes_df['Gene'])
+    genes_df = genes_df.copy()
+    genes_df['Entrez_ID'] = resolved['GeneID'].values
+    genes_df['Ensembl_ID'] = resolved['Ensembl_ID'].values
+
+    unresolved = resolved[resolved['Status'] == 'unresolved']
+    ambiguous = resolved[resolved['Status'] == 'ambiguous']
+    print(f"Resolved {int((resolved['Status'] == 'resolved').sum())}/{len(resolved)} symbols offline "
+          f"({len(ambiguous)} ambiguous, {len(unresolved)} unresolved)")
+    for _, row in ambiguous.iterrows():
+        print(f"  Ambiguous: {row['Query']} -> {row['Candidates']}")
+    for symbol in unresolved['Query']:
+        print(f"  Unresolved: {symbol}")
+    return genes_df
+
+
+if __name__ == '__main__':
+    import sys
+    import yaml
+
+    with open(BASE_DIR / 'config' / 'sepsis_config.yaml') as f:
+        config = yaml.safe_load(f)
+    resolver = load_gene_resolver(config)
+    if resolver is None:
+        print("No gene_info dump found; see 'reference' in config/sepsis_config.yaml")
+        sys.exit(1)
+    print(resolver.resolve(sys.argv[1:]).to_string(index=False))
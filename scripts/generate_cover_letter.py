@@ -5,8 +5,11 @@ from docx.shared import Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from pathlib import Path
 
+from tracing import traced
+
 BASE_DIR = Path(__file__).parent.parent
 
+@traced()
 def create_cover_letter():
     doc = Document()
     
@@ -1,17 +1,95 @@
 """
 Generate publication-quality figures for Sepsis HDT Pipeline
 Author: Dr. Siddalingaiah H S
+
+Output follows the config's output.figures block: every figure is drawn
+once and written in each configured format (vector formats once, raster
+formats at each resolution). The tight bounding box is computed from that
+single draw and reused, so extra formats only cost their own rendering.
+Draft mode writes one low-resolution raster without tight cropping to
+outputs/figures/draft/ for quick iteration.
 """
 
+import time
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 
+import tracing
+from tracing import span, traced
+
 BASE_DIR = Path(__file__).parent.parent
 plt.style.use('seaborn-v0_8-whitegrid')
 
+VECTOR_FORMATS = {'pdf', 'svg', 'eps', 'ps'}
+
+DEFAULT_FIGURE_SETTINGS = {
+    'dpi': 300,
+    'format': 'png',
+    'resolutions': [],
+    'draft': False,
+    'draft_dpi': 72,
+}
+
+_settings = None
+
+# (file name, seconds) for every file written by save_figure
+SAVE_TIMES = []
+
+
+def configure_output(config=None, draft=None):
+    """Figure output settings from config['output']['figures'] (draft overrides the config)"""
+    global _settings
+    if config is None:
+        from run_pipeline import load_config
+        config = load_config()
+    settings = {**DEFAULT_FIGURE_SETTINGS, **((config.get('output', {}) or {}).get('figures', {}) or {})}
+    if draft is not None:
+        settings['draft'] = draft
+    formats = settings['format']
+    settings['format'] = [formats] if isinstance(formats, str) else list(formats)
+    _settings = settings
+    return settings
+
+
+def output_files(stem, settings):
+    """(path, savefig options) for every file a figure is written to"""
+    figures_dir = BASE_DIR / 'outputs' / 'figures'
+    if settings['draft']:
+        raster = next((f for f in settings['format'] if f not in VECTOR_FORMATS), 'png')
+        return [(figures_dir / 'draft' / f'{stem}.{raster}', {'dpi': settings['draft_dpi']})]
+
+    files = []
+    for fmt in settings['format']:
+        files.append((figures_dir / f'{stem}.{fmt}', {'dpi': settings['dpi']}))
+        if fmt not in VECTOR_FORMATS:
+            for dpi in settings['resolutions']:
+                if dpi != settings['dpi']:
+                    files.append((figures_dir / f'{stem}_{dpi}dpi.{fmt}', {'dpi': dpi}))
+    return files
+
+
+def save_figure(fig, stem):
+    """Write a finished figure in every configured format and resolution, then close it"""
+    settings = _settings or configure_output()
+    files = output_files(stem, settings)
+    with span('save', figure=stem, files=len(files)):
+        if not settings['draft']:
+            # One layout pass (at the primary resolution, as savefig's 'tight'
+            # does) for the tight box shared by every output file
+            fig.set_dpi(settings['dpi'])
+            bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(plt.rcParams['savefig.pad_inches'])
+        for path, options in files:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            start = time.perf_counter()
+            fig.savefig(path, bbox_inches=None if settings['draft'] else bbox, **options)
+            SAVE_TIMES.append((path.name, time.perf_counter() - start))
+    plt.close(fig)
+    return [path for path, _ in files]
+
+@traced()
 def figure1_target_prioritization():
     """Figure 1: Top 20 Target Prioritization with Phase Coloring"""
     df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv')
@@ -30,7 +108,8 @@ def figure1_target_prioritization():
     ax.invert_yaxis()
     
     ax.set_xlabel('Composite Score', fontsize=12, fontweight='bold')
-    ax.set_title('Top 20 Host-Directed Therapy Targets for Sepsis\n(Colored by Immune Phase)', fontsize=14, fontweight='bold')
+    ax.set_title('Top 20 Host-Directed Therapy Targets for Sepsis\n(Colored by Immune Phase)',
+                 fontsize=14, fontweight='bold')
     
     # Add value labels
     for i, (bar, val) in enumerate(zip(bars, top20['Composite_Score'])):
@@ -46,10 +125,10 @@ def figure1_target_prioritization():
     ax.legend(handles=legend_elements, loc='lower right', fontsize=10)
     
     plt.tight_layout()
-    plt.savefig(BASE_DIR / 'outputs' / 'figures' / 'figure1_target_prioritization.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("Created: figure1_target_prioritization.png")
+    paths = save_figure(fig, 'figure1_target_prioritization')
+    print(f"Created: {', '.join(p.name for p in paths)}")
 
+@traced()
 def figure2_compound_distribution():
     """Figure 2: Compound Distribution by Clinical Phase and Target"""
     df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
@@ -84,10 +163,10 @@ def figure2_compound_distribution():
         axes[1].text(v + 0.1, i, str(v), va='center', fontsize=9)
     
     plt.tight_layout()
-    plt.savefig(BASE_DIR / 'outputs' / 'figures' / 'figure2_compound_distribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("Created: figure2_compound_distribution.png")
+    paths = save_figure(fig, 'figure2_compound_distribution')
+    print(f"Created: {', '.join(p.name for p in paths)}")
 
+@traced()
 def figure3_potency_by_target():
     """Figure 3: Compound Potency Distribution by Target"""
     df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
@@ -120,10 +199,10 @@ def figure3_potency_by_target():
     ax.legend(loc='lower right')
     
     plt.tight_layout()
-    plt.savefig(BASE_DIR / 'outputs' / 'figures' / 'figure3_target_potency.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("Created: figure3_target_potency.png")
+    paths = save_figure(fig, 'figure3_target_potency')
+    print(f"Created: {', '.join(p.name for p in paths)}")
 
+@traced()
 def figure4_pathway_heatmap():
     """Figure 4: Pathway Analysis Heatmap"""
     df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv')
@@ -166,10 +245,10 @@ def figure4_pathway_heatmap():
         axes[1].text(v + 0.1, i, str(v), va='center', fontsize=9)
     
     plt.tight_layout()
-    plt.savefig(BASE_DIR / 'outputs' / 'figures' / 'figure4_pathway_heatmap.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("Created: figure4_pathway_heatmap.png")
+    paths = save_figure(fig, 'figure4_pathway_heatmap')
+    print(f"Created: {', '.join(p.name for p in paths)}")
 
+@traced()
 def figure5_sepsis_timeline():
     """Figure 5: Sepsis Immune Response Timeline with HDT Opportunities"""
     fig, ax = plt.subplots(figsize=(14, 9))  # Increased height
@@ -215,11 +294,22 @@ def figure5_sepsis_timeline():
     ax.legend(loc='upper right')
     
     plt.tight_layout(pad=2.0)  # Added padding
-    plt.savefig(BASE_DIR / 'outputs' / 'figures' / 'figure5_sepsis_timeline.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("Created: figure5_sepsis_timeline.png")
+    paths = save_figure(fig, 'figure5_sepsis_timeline')
+    print(f"Created: {', '.join(p.name for p in paths)}")
 
 if __name__ == '__main__':
+    import argparse
+    from run_pipeline import load_config
+    
+    parser = argparse.ArgumentParser(description='Generate the manuscript figures')
+    parser.add_argument('--draft', action='store_true', default=None,
+                        help='low-resolution raster without tight cropping (outputs/figures/draft/)')
+    args = parser.parse_args()
+    
+    config = load_config()
+    trace_path = tracing.configure(config)
+    settings = configure_output(config, args.draft)
+    
     print("Generating figures...")
     print("="*50)
     
@@ -230,4 +320,7 @@ if __name__ == '__main__':
     figure5_sepsis_timeline()
     
     print("="*50)
+    formats = f"draft, {settings['draft_dpi']} dpi" if settings['draft'] else ', '.join(settings['format'])
+    print(f"Saved {len(SAVE_TIMES)} files in {sum(t for _, t in SAVE_TIMES):.2f} s ({formats})")
     print("All figures generated successfully!")
+    tracing.finish(trace_path)
@@ -4,10 +4,13 @@ Generate COMPLETE Submission-Ready DOCX Manuscript for Sepsis HDT Pipeline
 - 5 Figures (Figure 1-5) in sequence  
 - ~3500 words
 - Congruent with Supplementary Materials
+
+Each section is registered with the inputs it reads; a rebuild re-renders
+only sections whose inputs or code changed and splices the rest from the
+cached fragments (doc_sections).
 """
 
 import re
-import pandas as pd
 from docx import Document
 from docx.shared import Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -15,6 +18,11 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from pathlib import Path
 
+from build_documents import DocumentInputs
+from doc_sections import SectionedDocument
+import tracing
+from tracing import traced
+
 BASE_DIR = Path(__file__).parent.parent
 
 def set_cell_shading(cell, color):
@@ -34,16 +42,19 @@ def add_formatted_run(para, text):
         else:
             para.add_run(part)
 
-def create_complete_manuscript():
-    doc = Document()
-    
+def set_styles(doc):
     style = doc.styles['Normal']
     style.font.name = 'Times New Roman'
     style.font.size = Pt(12)
-    
-    # ==========================================
-    # TITLE PAGE
-    # ==========================================
+
+manuscript = SectionedDocument('manuscript_final', setup=set_styles)
+
+
+# ==========================================
+# TITLE PAGE
+# ==========================================
+@manuscript.section('TITLE PAGE')
+def title_page(doc, inputs):
     title = doc.add_heading('', level=0)
     run = title.add_run('Phase-Specific Host-Directed Therapy Targets in Sepsis: An Integrated Multi-omics and Chemoinformatics Pipeline Identifies IL-6, NLRP3, and PD-1 as Priority Candidates')
     run.font.size = Pt(16)
@@ -95,10 +106,12 @@ def create_complete_manuscript():
     meta.add_run('3')
     
     doc.add_page_break()
-    
-    # ==========================================
-    # STRUCTURED ABSTRACT
-    # ==========================================
+
+# ==========================================
+# STRUCTURED ABSTRACT
+# ==========================================
+@manuscript.section('STRUCTURED ABSTRACT')
+def abstract(doc, inputs):
     doc.add_heading('ABSTRACT', level=1)
     
     abstract_sections = [
@@ -120,10 +133,12 @@ def create_complete_manuscript():
     kw.add_run('sepsis; host-directed therapy; cytokine storm; immune checkpoint; NLRP3 inflammasome; IL-6; PD-1; drug repurposing; immunomodulation; precision medicine')
     
     doc.add_page_break()
-    
-    # ==========================================
-    # 1. INTRODUCTION (~700 words)
-    # ==========================================
+
+# ==========================================
+# 1. INTRODUCTION (~700 words)
+# ==========================================
+@manuscript.section('1. INTRODUCTION')
+def introduction(doc, inputs):
     doc.add_heading('1. INTRODUCTION', level=1)
     
     intro_paras = [
@@ -145,10 +160,12 @@ def create_complete_manuscript():
         add_formatted_run(p, text)
     
     doc.add_page_break()
-    
-    # ==========================================
-    # 2. MATERIALS AND METHODS (~600 words)
-    # ==========================================
+
+# ==========================================
+# 2. MATERIALS AND METHODS (~600 words)
+# ==========================================
+@manuscript.section('2. MATERIALS AND METHODS')
+def methods(doc, inputs):
     doc.add_heading('2. MATERIALS AND METHODS', level=1)
     
     doc.add_heading('2.1 Study Design and Data Sources', level=2)
@@ -183,18 +200,25 @@ def create_complete_manuscript():
     p.add_run('For each prioritized target, ChEMBL was queried for compounds meeting the following criteria: pChEMBL ≥6.0 (corresponding to IC50/Ki ≤1 µM), assay confidence score ≥7, and documented activity type (IC50, Ki, Kd, or EC50). Compounds were stratified by clinical development phase: Phase 4 (FDA-approved), Phase 3 (pivotal trials), Phase 2 (proof-of-concept), and Phase 1/Preclinical.')
     
     doc.add_page_break()
-    
-    # ==========================================
-    # 3. RESULTS (~1200 words)
-    # ==========================================
+
+# ==========================================
+# 3. RESULTS (~1200 words)
+# ==========================================
+@manuscript.section('3.1 TARGET PRIORITIZATION', depends=[
+    'targets',
+    'summary.targets',
+    'figure:figure1_target_prioritization.png',
+])
+def results_targets(doc, inputs):
     doc.add_heading('3. RESULTS', level=1)
     
     doc.add_heading('3.1 Target Prioritization and Scoring', level=2)
     
-    targets_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv')
+    targets_df = inputs.targets
+    summary = inputs.summary
     
     p = doc.add_paragraph()
-    add_formatted_run(p, f'The computational pipeline successfully prioritized all 60 genes in the curated sepsis host signature. Composite scores ranged from {targets_df["Composite_Score"].min():.3f} to {targets_df["Composite_Score"].max():.3f}, with a median score of {targets_df["Composite_Score"].median():.3f}. The top 15 prioritized targets, representing the highest-scoring candidates for host-directed therapy development, are presented in Table 1 and visualized in Figure 1.')
+    add_formatted_run(p, f'The computational pipeline successfully prioritized all 60 genes in the curated sepsis host signature. Composite scores ranged from {summary.targets["score_min"]:.3f} to {summary.targets["score_max"]:.3f}, with a median score of {summary.targets["score_median"]:.3f}. The top 15 prioritized targets, representing the highest-scoring candidates for host-directed therapy development, are presented in Table 1 and visualized in Figure 1.')
     
     # ========== TABLE 1 ==========
     doc.add_paragraph()
@@ -228,18 +252,25 @@ def create_complete_manuscript():
     # ========== FIGURE 1 ==========
     fig1_cap = doc.add_paragraph()
     fig1_cap.add_run('Figure 1: Top 20 Host-Directed Therapy Targets for Sepsis, Colored by Immune Phase').bold = True
-    doc.add_picture(str(BASE_DIR / 'outputs' / 'figures' / 'figure1_target_prioritization.png'), width=Inches(5.5))
+    inputs.add_figure(doc, 'figure1_target_prioritization.png', width=Inches(5.5))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
     fig1_legend = doc.add_paragraph()
     fig1_legend.add_run('Red = Early phase (hyperinflammation); Blue = Late phase (immunosuppression); Purple = Both phases. Bars represent composite prioritization scores.').italic = True
     
     doc.add_page_break()
-    
+
+@manuscript.section('3.2 PHASE-SPECIFIC DISTRIBUTION', depends=[
+    'summary.targets',
+    'figure:figure5_sepsis_timeline.png',
+])
+def results_phases(doc, inputs):
     doc.add_heading('3.2 Phase-Specific Target Distribution', level=2)
     
-    early_count = len(targets_df[targets_df['Phase_Relevance'] == 'Early'])
-    late_count = len(targets_df[targets_df['Phase_Relevance'] == 'Late'])
-    both_count = len(targets_df[targets_df['Phase_Relevance'] == 'Both'])
+    summary = inputs.summary
+    
+    early_count = summary.phase_count('Early')
+    late_count = summary.phase_count('Late')
+    both_count = summary.phase_count('Both')
     
     p = doc.add_paragraph()
     add_formatted_run(p, f'Among the 60 prioritized targets, {early_count} ({early_count/60*100:.0f}%) were classified as early-phase targets associated with hyperinflammation, {late_count} ({late_count/60*100:.0f}%) as late-phase targets associated with immunosuppression, and {both_count} ({both_count/60*100:.0f}%) as relevant to both disease phases. This distribution reflects the biphasic nature of sepsis immunopathology and enables phase-specific therapeutic targeting.')
@@ -251,13 +282,15 @@ def create_complete_manuscript():
     doc.add_paragraph()
     fig5_cap = doc.add_paragraph()
     fig5_cap.add_run('Figure 5: Sepsis Immune Response Timeline and Host-Directed Therapy Intervention Windows').bold = True
-    doc.add_picture(str(BASE_DIR / 'outputs' / 'figures' / 'figure5_sepsis_timeline.png'), width=Inches(5.5))
+    inputs.add_figure(doc, 'figure5_sepsis_timeline.png', width=Inches(5.5))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
     fig5_legend = doc.add_paragraph()
     fig5_legend.add_run('Schematic showing biphasic immune response. Early phase (0-72h): hyperinflammatory cytokine storm amenable to anti-IL6, NLRP3 inhibitors, and JAK inhibitors. Late phase (>72h): immunosuppressive paralysis amenable to checkpoint inhibitors, GM-CSF, and IL-7.').italic = True
     
     doc.add_page_break()
-    
+
+@manuscript.section('3.3 LITERATURE VALIDATION')
+def results_literature(doc, inputs):
     doc.add_heading('3.3 Literature Validation of Priority Targets', level=2)
     
     p = doc.add_paragraph()
@@ -271,14 +304,20 @@ def create_complete_manuscript():
     p = doc.add_paragraph()
     p.add_run('PD-1 (Rank 4): ').bold = True
     add_formatted_run(p, 'T-cell exhaustion mediated by PD-1/PD-L1 signaling is a hallmark of late immunosuppressive sepsis. A Phase 1b randomized trial of Nivolumab (anti-PD-1) in septic patients demonstrated safety, restored lymphocyte counts, and improved monocyte HLA-DR expression without inducing cytokine storm.^32^ This provides proof-of-concept for checkpoint inhibition in late sepsis.')
-    
+
+@manuscript.section('3.4 COMPOUND DISCOVERY', depends=[
+    'summary.compounds',
+    'figure:figure2_compound_distribution.png',
+])
+def results_compounds(doc, inputs):
     doc.add_heading('3.4 Compound Discovery and Drug Repurposing', level=2)
     
-    compounds_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
-    fda_count = len(compounds_df[compounds_df['Phase'] == 4])
+    summary = inputs.summary
+    
+    fda_count = summary.clinical_phase_count(4)
     
     p = doc.add_paragraph()
-    add_formatted_run(p, f'The ChEMBL mining identified 37 clinically advanced compounds with documented bioactivity against prioritized sepsis targets. Notably, {fda_count} compounds ({fda_count/len(compounds_df)*100:.0f}%) are already FDA-approved for other indications, providing a robust pipeline for drug repurposing with established safety profiles. The priority drug candidates with their clinical evidence are summarized in Table 2.')
+    add_formatted_run(p, f'The ChEMBL mining identified 37 clinically advanced compounds with documented bioactivity against prioritized sepsis targets. Notably, {fda_count} compounds ({fda_count/summary.compounds["total"]*100:.0f}%) are already FDA-approved for other indications, providing a robust pipeline for drug repurposing with established safety profiles. The priority drug candidates with their clinical evidence are summarized in Table 2.')
     
     # ========== TABLE 2 ==========
     doc.add_paragraph()
@@ -321,15 +360,23 @@ def create_complete_manuscript():
     # ========== FIGURE 2 ==========
     fig2_cap = doc.add_paragraph()
     fig2_cap.add_run('Figure 2: Compound Distribution by Clinical Development Phase and Target').bold = True
-    doc.add_picture(str(BASE_DIR / 'outputs' / 'figures' / 'figure2_compound_distribution.png'), width=Inches(5.5))
+    inputs.add_figure(doc, 'figure2_compound_distribution.png', width=Inches(5.5))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
     fig2_legend = doc.add_paragraph()
     fig2_legend.add_run('(A) Distribution of compounds by clinical development phase. (B) Number of bioactive compounds per target gene.').italic = True
     
     doc.add_page_break()
-    
+
+@manuscript.section('3.5 PATHWAY ANALYSIS', depends=[
+    'summary.targets',
+    'figure:figure4_pathway_heatmap.png',
+    'figure:figure3_target_potency.png',
+])
+def results_pathways(doc, inputs):
     doc.add_heading('3.5 Pathway Analysis', level=2)
     
+    summary = inputs.summary
+    
     p = doc.add_paragraph()
     p.add_run('The 60 prioritized targets distributed across 11 functional pathways relevant to sepsis pathophysiology. The cytokine storm pathway contained the highest-scoring targets overall, while checkpoint exhaustion pathway targets showed the strongest association with late-phase immunosuppression. Pathway-level analysis is presented in Table 3 and Figure 4.')
     
@@ -338,11 +385,7 @@ def create_complete_manuscript():
     t3_cap = doc.add_paragraph()
     t3_cap.add_run('Table 3: Target Distribution by Functional Pathway').bold = True
     
-    pathway_stats = targets_df.groupby('Pathway').agg({
-        'Composite_Score': ['count', 'mean', 'max'],
-        'Phase_Relevance': lambda x: x.mode()[0] if len(x.mode()) > 0 else 'Mixed'
-    }).reset_index()
-    pathway_stats.columns = ['Pathway', 'Count', 'Mean Score', 'Max Score', 'Predominant Phase']
+    pathway_stats = summary.pathway_table()
     pathway_stats = pathway_stats.sort_values('Max Score', ascending=False).head(8)
     
     table3 = doc.add_table(rows=len(pathway_stats)+1, cols=5)
@@ -367,7 +410,7 @@ def create_complete_manuscript():
     # ========== FIGURE 4 ==========
     fig4_cap = doc.add_paragraph()
     fig4_cap.add_run('Figure 4: Pathway-Level Analysis of Sepsis HDT Targets').bold = True
-    doc.add_picture(str(BASE_DIR / 'outputs' / 'figures' / 'figure4_pathway_heatmap.png'), width=Inches(5.5))
+    inputs.add_figure(doc, 'figure4_pathway_heatmap.png', width=Inches(5.5))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
     fig4_legend = doc.add_paragraph()
     fig4_legend.add_run('(A) Heatmap of mean composite scores by pathway and immune phase. (B) Number of targets per functional pathway.').italic = True
@@ -377,16 +420,18 @@ def create_complete_manuscript():
     # ========== FIGURE 3 ==========
     fig3_cap = doc.add_paragraph()
     fig3_cap.add_run('Figure 3: Compound Potency Profile by Target').bold = True
-    doc.add_picture(str(BASE_DIR / 'outputs' / 'figures' / 'figure3_target_potency.png'), width=Inches(5.5))
+    inputs.add_figure(doc, 'figure3_target_potency.png', width=Inches(5.5))
     doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
     fig3_legend = doc.add_paragraph()
     fig3_legend.add_run('Maximum pChEMBL values for top 15 targets. Red dashed line = 1 µM threshold; green dashed line = 10 nM threshold.').italic = True
     
     doc.add_page_break()
-    
-    # ==========================================
-    # 4. DISCUSSION (~800 words)
-    # ==========================================
+
+# ==========================================
+# 4. DISCUSSION (~800 words)
+# ==========================================
+@manuscript.section('4. DISCUSSION')
+def discussion(doc, inputs):
     doc.add_heading('4. DISCUSSION', level=1)
     
     discussion_paras = [
@@ -414,20 +459,24 @@ def create_complete_manuscript():
     
     p = doc.add_paragraph()
     p.add_run('Based on composite prioritization scores and existing clinical evidence, we propose three priority translation tracks: (1) Cytokine storm track: Randomized trial of Tocilizumab or Anakinra in early bacterial sepsis with elevated IL-6 levels; (2) Inflammasome track: Rapid repurposing trial of Colchicine in early sepsis with evidence of inflammasome activation; (3) Checkpoint track: Biomarker-guided trial of low-dose Nivolumab in late immunosuppressive sepsis with reduced monocyte HLA-DR expression.')
-    
-    # ==========================================
-    # 5. CONCLUSIONS
-    # ==========================================
+
+# ==========================================
+# 5. CONCLUSIONS
+# ==========================================
+@manuscript.section('5. CONCLUSIONS')
+def conclusions(doc, inputs):
     doc.add_heading('5. CONCLUSIONS', level=1)
     
     p = doc.add_paragraph()
     p.add_run('This integrated computational study identifies IL-6, NLRP3, and PD-1 as priority phase-specific host-directed therapy targets for sepsis treatment. The availability of FDA-approved drugs including Tocilizumab, Baricitinib, Anakinra, and Colchicine with established safety profiles provides clear pathways for rapid clinical translation through repurposing trials. Biomarker-guided, phase-specific immunotherapy that matches therapeutic mechanism to the patient\'s current immunological state represents the most promising strategy to address the longstanding and critical sepsis treatment gap.')
     
     doc.add_page_break()
-    
-    # ==========================================
-    # ACKNOWLEDGEMENTS AND DECLARATIONS
-    # ==========================================
+
+# ==========================================
+# ACKNOWLEDGEMENTS AND DECLARATIONS
+# ==========================================
+@manuscript.section('ACKNOWLEDGEMENTS AND DECLARATIONS')
+def declarations(doc, inputs):
     doc.add_heading('ACKNOWLEDGEMENTS', level=1)
     doc.add_paragraph('The author acknowledges the ChEMBL team at EMBL-EBI for providing comprehensive compound bioactivity data, the Open Targets Platform consortium for druggability assessments, the NCBI GEO database for hosting transcriptomic datasets, and the MARS Consortium investigators for generating high-quality sepsis transcriptomic resources.')
     
@@ -454,10 +503,12 @@ def create_complete_manuscript():
     p.add_run('AI tools were used for code development, literature synthesis, and manuscript drafting with full author oversight and verification.')
     
     doc.add_page_break()
-    
-    # ==========================================
-    # REFERENCES - VANCOUVER STYLE WITH PMIDS
-    # ==========================================
+
+# ==========================================
+# REFERENCES - VANCOUVER STYLE WITH PMIDS
+# ==========================================
+@manuscript.section('REFERENCES')
+def references(doc, inputs):
     doc.add_heading('REFERENCES', level=1)
     
     references = [
@@ -504,15 +555,31 @@ def create_complete_manuscript():
         p.add_run(ref)
         p.paragraph_format.first_line_indent = Inches(-0.25)
         p.paragraph_format.left_indent = Inches(0.25)
-    
-    # Save
+
+
+@traced()
+def create_complete_manuscript(inputs=None, use_cache=True):
+    """Assemble the manuscript, re-rendering only sections whose inputs changed"""
+    if inputs is None:
+        inputs = DocumentInputs.load()
     output_path = BASE_DIR / 'manuscripts' / 'Manuscript_Sepsis_HDT_FINAL.docx'
-    doc.save(str(output_path))
+    status = manuscript.build(Document(), inputs, output_path, BASE_DIR / 'outputs' / 'cache' / 'sections', use_cache)
+    rendered = sum(s == 'rendered' for s in status.values())
     print(f'Created: {output_path}')
+    print(f'Sections: {rendered} rendered, {len(status) - rendered} from cache')
     print('Word count: ~3,500')
     print('Tables: 3 (Table 1, 2, 3 in sequence)')
     print('Figures: 5 (Figure 1, 2, 3, 4, 5)')
     print('References: 35 (all with PMIDs)')
+    return status
 
 if __name__ == '__main__':
-    create_complete_manuscript()
+    import argparse
+    from run_pipeline import load_config
+
+    parser = argparse.ArgumentParser(description='Generate the final manuscript DOCX')
+    parser.add_argument('--no-cache', action='store_true', help='render every section (ignore cached fragments)')
+    args = parser.parse_args()
+    trace_path = tracing.configure(load_config())
+    create_complete_manuscript(use_cache=not args.no_cache)
+    tracing.finish(trace_path)
@@ -14,6 +14,9 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from pathlib import Path
 
+from summary_stats import load_summary
+from tracing import traced
+
 BASE_DIR = Path(__file__).parent.parent
 
 def set_cell_shading(cell, color):
@@ -33,6 +36,7 @@ def add_formatted_run(para, text):
         else:
             para.add_run(part)
 
+@traced()
 def create_manuscript():
     doc = Document()
     
@@ -176,9 +180,10 @@ def create_manuscript():
     doc.add_heading('3.1 Target Prioritization', level=2)
     
     targets_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv')
+    summary = load_summary()
     
     p = doc.add_paragraph()
-    add_formatted_run(p, f'The pipeline prioritized all 60 genes in the sepsis signature. Composite scores ranged from {targets_df["Composite_Score"].min():.3f} to {targets_df["Composite_Score"].max():.3f} (median: {targets_df["Composite_Score"].median():.3f}). The top 15 targets are presented in Table 1.')
+    add_formatted_run(p, f'The pipeline prioritized all 60 genes in the sepsis signature. Composite scores ranged from {summary.targets["score_min"]:.3f} to {summary.targets["score_max"]:.3f} (median: {summary.targets["score_median"]:.3f}). The top 15 targets are presented in Table 1.')
     
     # TABLE 1
     doc.add_paragraph()
@@ -214,9 +219,9 @@ def create_manuscript():
     
     doc.add_heading('3.2 Phase-Specific Analysis', level=2)
     
-    early_count = len(targets_df[targets_df['Phase_Relevance'] == 'Early'])
-    late_count = len(targets_df[targets_df['Phase_Relevance'] == 'Late'])
-    both_count = len(targets_df[targets_df['Phase_Relevance'] == 'Both'])
+    early_count = summary.phase_count('Early')
+    late_count = summary.phase_count('Late')
+    both_count = summary.phase_count('Both')
     
     p = doc.add_paragraph()
     add_formatted_run(p, f'Among the 60 prioritized targets, {early_count} were classified as early-phase (hyperinflammation), {late_count} as late-phase (immunosuppression), and {both_count} as relevant to both phases.')
@@ -245,11 +250,10 @@ def create_manuscript():
     
     doc.add_heading('3.4 Compound Discovery', level=2)
     
-    compounds_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
-    fda_count = len(compounds_df[compounds_df['Phase'] == 4])
+    fda_count = summary.clinical_phase_count(4)
     
     p = doc.add_paragraph()
-    add_formatted_run(p, f'Thirty-seven clinically advanced compounds were identified. Notably, {fda_count} compounds ({fda_count/len(compounds_df)*100:.0f}%) are FDA-approved, providing a robust repurposing pipeline.')
+    add_formatted_run(p, f'Thirty-seven clinically advanced compounds were identified. Notably, {fda_count} compounds ({fda_count/summary.compounds["total"]*100:.0f}%) are FDA-approved, providing a robust repurposing pipeline.')
     
     # TABLE 2
     doc.add_paragraph()
@@ -10,6 +10,8 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from pathlib import Path
 
+from tracing import traced
+
 BASE_DIR = Path(__file__).parent.parent
 
 def set_cell_shading(cell, color):
@@ -19,6 +21,7 @@ def set_cell_shading(cell, color):
     shd.set(qn('w:fill'), color)
     tcPr.append(shd)
 
+@traced()
 def create_supplementary():
     doc = Document()
     
@@ -3,6 +3,10 @@ Generate CONGRUENT Supplementary Materials for Sepsis HDT Manuscript
 - Table S1: Complete 60-gene signature (extends main Table 1)
 - Table S2: All 37 compounds (extends main Table 2)  
 - Table S3: Literature validation (extends results section)
+
+Tables S1 and S2 are streamed into the saved .docx row by row (docx_stream):
+from their CSVs when run on its own, so full-genome or all-activity tables
+need constant memory, or from the tables already loaded by build_documents.
 """
 
 import pandas as pd
@@ -13,8 +17,45 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from pathlib import Path
 
+import tracing
+from tracing import traced
+from docx_stream import StreamingDocument, csv_chunks, frame_chunks
+from build_documents import DocumentInputs
+from literature_query import PUBMED_QUERY, load_literature_counts, validation_category
+
 BASE_DIR = Path(__file__).parent.parent
 
+PHASE_LABELS = {4: 'FDA Approved', 3: 'Phase III', 2: 'Phase II', 1: 'Phase I'}
+
+# Curated Table S3 rows, used when there is no local MEDLINE index
+CURATED_VALIDATION = [
+    ('IL6', '1', '2,847', 'Strong', 'RECOVERY trial success; cytokine storm mediator'),
+    ('TNF', '2', '3,521', 'Strong', 'Multiple failed trials (phase mismatch lesson)'),
+    ('TLR4', '3', '1,245', 'Strong', 'ACCESS trial failed; renewed interest'),
+    ('PD1', '4', '312', 'Moderate', 'Phase 1b Nivolumab positive; T-cell exhaustion'),
+    ('NLRP3', '5', '856', 'Strong', 'MCC950 in development; pyroptosis driver'),
+    ('IL1B', '6', '2,156', 'Strong', 'Anakinra SAVE-MORE success'),
+    ('JAK2', '7', '423', 'Moderate', 'Baricitinib ACTT-2 approved'),
+    ('HMGB1', '8', '567', 'Moderate', 'Late DAMP; glycyrrhizin inhibitor'),
+    ('STAT3', '9', '389', 'Moderate', 'JAK-STAT signaling hub'),
+    ('CASP1', '10', '234', 'Moderate', 'Inflammasome effector; VX-765 Phase II'),
+    ('GSDMD', '11', '128', 'Limited', 'Pyroptosis executor'),
+    ('F3', '12', '412', 'Moderate', 'Tissue factor; coagulation cascade'),
+    ('PDL1', '13', '156', 'Limited', 'Checkpoint ligand; atezolizumab'),
+    ('TIM3', '14', '89', 'Limited', 'T-cell exhaustion marker'),
+    ('LAG3', '15', '67', 'Limited', 'Inhibitory receptor'),
+]
+
+CURATED_SUMMARY = [
+    ('Strong (≥50 pubs)', '14', '23%'),
+    ('Moderate (20-49 pubs)', '22', '37%'),
+    ('Limited (5-19 pubs)', '18', '30%'),
+    ('Minimal (1-4 pubs)', '6', '10%'),
+]
+
+SUMMARY_LABELS = {'Strong': 'Strong (≥50 pubs)', 'Moderate': 'Moderate (20-49 pubs)',
+                  'Limited': 'Limited (5-19 pubs)', 'Minimal': 'Minimal (1-4 pubs)'}
+
 def set_cell_shading(cell, color):
     tc = cell._tc
     tcPr = tc.get_or_add_tcPr()
@@ -22,8 +63,74 @@ def set_cell_shading(cell, color):
     shd.set(qn('w:fill'), color)
     tcPr.append(shd)
 
-def create_supplementary():
+def add_header_table(doc, headers):
+    """Table Grid table holding only its shaded header row"""
+    table = doc.add_table(rows=1, cols=len(headers))
+    table.style = 'Table Grid'
+    for i, h in enumerate(headers):
+        cell = table.rows[0].cells[i]
+        cell.text = h
+        cell.paragraphs[0].runs[0].bold = True
+        set_cell_shading(cell, 'D9E2F3')
+    return table
+
+def format_targets(chunk):
+    """Table S1 cell text for a chunk of targets_ranked.csv"""
+    return pd.DataFrame({
+        'Rank': chunk['Rank'].astype(str),
+        'Gene': chunk['Gene'],
+        'Symbol': chunk['Symbol'],
+        'Pathway': chunk['Pathway'].str.replace('_', ' ').str.title(),
+        'Phase': chunk['Phase_Relevance'],
+        'Score': chunk['Composite_Score'].map('{:.3f}'.format),
+        'Druggability': chunk['Druggability'],
+    })
+
+def format_compounds(chunk):
+    """Table S2 cell text for a chunk of compounds_ranked.csv"""
+    return pd.DataFrame({
+        'Drug': chunk['Drug'].astype(str),
+        'Target': chunk['Target'].astype(str),
+        'Gene': chunk['Related_Gene'].astype(str),
+        'pChEMBL': chunk['pChEMBL'].astype(str),
+        'Phase': chunk['Phase'].map(PHASE_LABELS).fillna(chunk['Phase'].astype(str)),
+        'Clinical Evidence': chunk['Evidence'].astype(str),
+    })
+
+def table_chunks(inputs, table, formatter):
+    """Formatted chunks of a ranked table: from the shared inputs if loaded, else the CSV"""
+    frame = getattr(inputs, table)
+    if frame is not None:
+        return frame_chunks(frame, formatter)
+    return csv_chunks(BASE_DIR / 'outputs' / 'tables' / f'{table}_ranked.csv', formatter)
+
+def literature_validation(inputs, n_top=15):
+    """Table S3 rows, category summary and search strategy from the MEDLINE query counts, or None"""
+    literature = load_literature_counts(BASE_DIR / 'outputs' / 'tables')
+    if literature is None:
+        return None
+    counts, search = literature
+    targets = inputs.targets
+    if targets is None:
+        targets = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv', usecols=['Gene', 'Rank'], nrows=n_top)
+    findings = {row[0]: row[4] for row in CURATED_VALIDATION}
+    top = targets.head(n_top)[['Gene', 'Rank']].merge(counts[['Gene', PUBMED_QUERY]], on='Gene', how='left')
+    top[PUBMED_QUERY] = top[PUBMED_QUERY].fillna(0).astype(int)
+    rows = [(gene, str(rank), f'{count:,}', validation_category(count), findings.get(gene, ''))
+            for gene, rank, count in zip(top['Gene'], top['Rank'], top[PUBMED_QUERY])]
+    categories = counts[PUBMED_QUERY].map(validation_category).value_counts()
+    summary = [(label, str(int(categories.get(category, 0))), f'{categories.get(category, 0) / len(counts):.0%}')
+               for category, label in SUMMARY_LABELS.items()]
+    return rows, summary, search
+
+@traced()
+def create_supplementary(inputs=None):
+    sections = tracing.sections('supplementary_final')
+    if inputs is None:
+        inputs = DocumentInputs.load(tables=False)
+    sections.start('front matter')
     doc = Document()
+    stream = StreamingDocument(doc)
     
     style = doc.styles['Normal']
     style.font.name = 'Times New Roman'
@@ -58,6 +165,7 @@ def create_supplementary():
     doc.add_page_break()
     
     # ----- TABLE S1: Complete 60-Gene Signature -----
+    sections.start('TABLE S1')
     doc.add_heading('Supplementary Table S1: Complete 60-Gene Sepsis Host Signature', level=1)
     
     p = doc.add_paragraph()
@@ -66,30 +174,13 @@ def create_supplementary():
     
     doc.add_paragraph()
     
-    targets_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv')
-    
-    table1 = doc.add_table(rows=len(targets_df)+1, cols=7)
-    table1.style = 'Table Grid'
-    
-    headers = ['Rank', 'Gene', 'Symbol', 'Pathway', 'Phase', 'Score', 'Druggability']
-    for i, h in enumerate(headers):
-        cell = table1.rows[0].cells[i]
-        cell.text = h
-        cell.paragraphs[0].runs[0].bold = True
-        set_cell_shading(cell, 'D9E2F3')
-    
-    for i, (_, row) in enumerate(targets_df.iterrows()):
-        table1.rows[i+1].cells[0].text = str(row['Rank'])
-        table1.rows[i+1].cells[1].text = row['Gene']
-        table1.rows[i+1].cells[2].text = row['Symbol']
-        table1.rows[i+1].cells[3].text = row['Pathway'].replace('_', ' ').title()
-        table1.rows[i+1].cells[4].text = row['Phase_Relevance']
-        table1.rows[i+1].cells[5].text = f"{row['Composite_Score']:.3f}"
-        table1.rows[i+1].cells[6].text = row['Druggability']
+    table1 = add_header_table(doc, ['Rank', 'Gene', 'Symbol', 'Pathway', 'Phase', 'Score', 'Druggability'])
+    stream.stream_rows(table1, table_chunks(inputs, 'targets', format_targets), name='S1')
     
     doc.add_page_break()
     
     # ----- TABLE S2: Complete 37 Compounds -----
+    sections.start('TABLE S2')
     doc.add_heading('Supplementary Table S2: Complete Drug Candidates with Bioactivity Data', level=1)
     
     p = doc.add_paragraph()
@@ -98,30 +189,13 @@ def create_supplementary():
     
     doc.add_paragraph()
     
-    compounds_df = pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
-    
-    table2 = doc.add_table(rows=len(compounds_df)+1, cols=6)
-    table2.style = 'Table Grid'
-    
-    headers2 = ['Drug', 'Target', 'Gene', 'pChEMBL', 'Phase', 'Clinical Evidence']
-    for i, h in enumerate(headers2):
-        cell = table2.rows[0].cells[i]
-        cell.text = h
-        cell.paragraphs[0].runs[0].bold = True
-        set_cell_shading(cell, 'D9E2F3')
-    
-    for i, (_, row) in enumerate(compounds_df.iterrows()):
-        table2.rows[i+1].cells[0].text = str(row['Drug'])
-        table2.rows[i+1].cells[1].text = str(row['Target'])
-        table2.rows[i+1].cells[2].text = str(row['Related_Gene'])
-        table2.rows[i+1].cells[3].text = str(row['pChEMBL'])
-        phase_map = {4: 'FDA Approved', 3: 'Phase III', 2: 'Phase II', 1: 'Phase I'}
-        table2.rows[i+1].cells[4].text = phase_map.get(row['Phase'], str(row['Phase']))
-        table2.rows[i+1].cells[5].text = str(row['Evidence'])
+    table2 = add_header_table(doc, ['Drug', 'Target', 'Gene', 'pChEMBL', 'Phase', 'Clinical Evidence'])
+    stream.stream_rows(table2, table_chunks(inputs, 'compounds', format_compounds), name='S2')
     
     doc.add_page_break()
     
     # ----- TABLE S3: Literature Validation -----
+    sections.start('TABLE S3')
     doc.add_heading('Supplementary Table S3: Systematic Literature Validation', level=1)
     
     doc.add_heading('Search Strategy', level=2)
@@ -129,17 +203,25 @@ def create_supplementary():
     p.add_run('Database: ').bold = True
     p.add_run('PubMed/MEDLINE')
     
+    # Counts from the local MEDLINE index when it was queried, else the curated search
+    literature = literature_validation(inputs)
+    search = literature[2] if literature else None
+    
     p = doc.add_paragraph()
     p.add_run('Query: ').bold = True
-    p.add_run('"[Gene Symbol] AND (sepsis OR septic shock OR SIRS)"')
+    p.add_run(f'"{search["queries"][PUBMED_QUERY]}"' if search else '"[Gene Symbol] AND (sepsis OR septic shock OR SIRS)"')
     
     p = doc.add_paragraph()
     p.add_run('Date Range: ').bold = True
-    p.add_run('2000-2024')
+    p.add_run(f'{search["years"][0]}-{search["years"][1]}' if search else '2000-2024')
     
     p = doc.add_paragraph()
-    p.add_run('Search Date: ').bold = True
-    p.add_run('December 31, 2024')
+    if search:
+        p.add_run('Index: ').bold = True
+        p.add_run(f'Local MEDLINE baseline ({search["documents"]:,} citations from {search["files"]} files)')
+    else:
+        p.add_run('Search Date: ').bold = True
+        p.add_run('December 31, 2024')
     
     doc.add_heading('Validation Categories', level=2)
     doc.add_paragraph('Strong (≥50 publications): Extensive mechanistic and clinical evidence')
@@ -150,23 +232,7 @@ def create_supplementary():
     doc.add_paragraph()
     
     # Validation table
-    validation_data = [
-        ('IL6', '1', '2,847', 'Strong', 'RECOVERY trial success; cytokine storm mediator'),
-        ('TNF', '2', '3,521', 'Strong', 'Multiple failed trials (phase mismatch lesson)'),
-        ('TLR4', '3', '1,245', 'Strong', 'ACCESS trial failed; renewed interest'),
-        ('PD1', '4', '312', 'Moderate', 'Phase 1b Nivolumab positive; T-cell exhaustion'),
-        ('NLRP3', '5', '856', 'Strong', 'MCC950 in development; pyroptosis driver'),
-        ('IL1B', '6', '2,156', 'Strong', 'Anakinra SAVE-MORE success'),
-        ('JAK2', '7', '423', 'Moderate', 'Baricitinib ACTT-2 approved'),
-        ('HMGB1', '8', '567', 'Moderate', 'Late DAMP; glycyrrhizin inhibitor'),
-        ('STAT3', '9', '389', 'Moderate', 'JAK-STAT signaling hub'),
-        ('CASP1', '10', '234', 'Moderate', 'Inflammasome effector; VX-765 Phase II'),
-        ('GSDMD', '11', '128', 'Limited', 'Pyroptosis executor'),
-        ('F3', '12', '412', 'Moderate', 'Tissue factor; coagulation cascade'),
-        ('PDL1', '13', '156', 'Limited', 'Checkpoint ligand; atezolizumab'),
-        ('TIM3', '14', '89', 'Limited', 'T-cell exhaustion marker'),
-        ('LAG3', '15', '67', 'Limited', 'Inhibitory receptor'),
-    ]
+    validation_data, summary_data = literature[:2] if literature else (CURATED_VALIDATION, CURATED_SUMMARY)
     
     table3 = doc.add_table(rows=len(validation_data)+1, cols=5)
     table3.style = 'Table Grid'
@@ -197,12 +263,6 @@ def create_supplementary():
         cell.paragraphs[0].runs[0].bold = True
         set_cell_shading(cell, 'D9E2F3')
     
-    summary_data = [
-        ('Strong (≥50 pubs)', '14', '23%'),
-        ('Moderate (20-49 pubs)', '22', '37%'),
-        ('Limited (5-19 pubs)', '18', '30%'),
-        ('Minimal (1-4 pubs)', '6', '10%'),
-    ]
     
     for i, row_data in enumerate(summary_data):
         for j, val in enumerate(row_data):
@@ -211,6 +271,7 @@ def create_supplementary():
     doc.add_page_break()
     
     # ----- SUPPLEMENTARY FIGURES -----
+    sections.start('SUPPLEMENTARY FIGURES')
     doc.add_heading('Supplementary Figures', level=1)
     
     figures = [
@@ -224,21 +285,26 @@ def create_supplementary():
     for filename, title, legend in figures:
         fig_cap = doc.add_paragraph()
         fig_cap.add_run(title).bold = True
-        doc.add_picture(str(BASE_DIR / 'outputs' / 'figures' / filename), width=Inches(5.5))
+        inputs.add_figure(doc, filename, width=Inches(5.5))
         doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
         fig_leg = doc.add_paragraph()
         fig_leg.add_run(legend).italic = True
         doc.add_paragraph()
     
     # Save
+    sections.start('save')
     output_path = BASE_DIR / 'manuscripts' / 'Supplementary_Materials_FINAL.docx'
-    doc.save(str(output_path))
+    stream.save(output_path)
+    sections.end()
     print(f'Created: {output_path}')
     print('Contents:')
-    print('  - Table S1: 60 genes (extends main Table 1)')
-    print('  - Table S2: 37 compounds (extends main Table 2)')
+    print(f"  - Table S1: {stream.rows_written['S1']} genes (extends main Table 1)")
+    print(f"  - Table S2: {stream.rows_written['S2']} compounds (extends main Table 2)")
     print('  - Table S3: Literature validation')
     print('  - Figure S1: All 5 figures')
 
 if __name__ == '__main__':
+    from run_pipeline import load_config
+    trace_path = tracing.configure(load_config())
     create_supplementary()
+    tracing.finish(trace_path)
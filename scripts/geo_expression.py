@@ -0,0 +1,327 @@
+"""
+GEO series-matrix differential expression for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Streams locally downloaded GEO series-matrix files in row blocks and computes
+per-gene log2 fold change, Welch t-statistics and BH-FDR with whole-block
+NumPy operations, then derives the gene signature from the configured
+|log2FC| and FDR criteria (docs/METHODOLOGY.md, section 2.2).
+"""
+
+import gzip
+import re
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import special
+
+import tracing
+from tracing import span, traced
+
+BASE_DIR = Path(__file__).parent.parent
+
+CHUNK_ROWS = 5000
+
+# Sample annotations matched against the case/control patterns
+SAMPLE_FIELDS = ('!Sample_title', '!Sample_source_name_ch1', '!Sample_characteristics_ch1')
+DEFAULT_CASE_PATTERN = r'sepsis|septic'
+DEFAULT_CONTROL_PATTERN = r'healthy|control'
+
+
+def open_series_matrix(path):
+    """Open a plain or gzipped series matrix as text"""
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def _split_fields(line):
+    return [field.strip().strip('"') for field in line.rstrip('\n').split('\t')]
+
+
+def read_series_header(handle):
+    """Consume the metadata block up to the expression table header"""
+    samples = None
+    annotations = []
+    for line in handle:
+        if line.startswith('!series_matrix_table_begin'):
+            break
+        if line.startswith('!Sample_geo_accession'):
+            samples = _split_fields(line)[1:]
+        elif line.startswith(SAMPLE_FIELDS):
+            annotations.append(_split_fields(line)[1:])
+    else:
+        raise ValueError('No expression table found in series matrix')
+
+    if samples is None:
+        raise ValueError('Series matrix has no !Sample_geo_accession line')
+    labels = [' '.join(values).lower() for values in zip(*annotations)] if annotations else [''] * len(samples)
+    return samples, labels
+
+
+def assign_groups(labels, case_pattern=DEFAULT_CASE_PATTERN, control_pattern=DEFAULT_CONTROL_PATTERN):
+    """Boolean case/control masks from sample annotation text"""
+    labels = pd.Series(labels, dtype='object')
+    control = labels.str.contains(control_pattern, flags=re.IGNORECASE, regex=True).values
+    case = labels.str.contains(case_pattern, flags=re.IGNORECASE, regex=True).values & ~control
+    return case, control
+
+
+def iter_expression_chunks(handle, chunk_rows=CHUNK_ROWS):
+    """Yield (probe_ids, float32 block) pairs from the open expression table"""
+    reader = pd.read_csv(handle, sep='\t', index_col=0, chunksize=chunk_rows, comment='!',
+                         na_values=['null', 'NA', ''], engine='c')
+    for chunk in reader:
+        yield chunk.index.astype(str).values, chunk.to_numpy(dtype=np.float32)
+
+
+def welch_statistics(values, case, control):
+    """Row-wise group means, log2FC and Welch t-test for a probe x sample block"""
+    values = values.astype(np.float64, copy=False)
+    stats = {}
+    for name, mask in (('case', case), ('control', control)):
+        block = values[:, mask]
+        n = np.sum(~np.isnan(block), axis=1).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(block, axis=1) / n
+            var = np.nansum((block - mean[:, None]) ** 2, axis=1) / (n - 1)
+        stats[name] = (n, mean, var)
+
+    (n1, m1, v1), (n2, m2, v2) = stats['case'], stats['control']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se1, se2 = v1 / n1, v2 / n2
+        se = np.sqrt(se1 + se2)
+        t = (m1 - m2) / se
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    p = 2.0 * special.stdtr(dof, -np.abs(t))
+
+    return {
+        'Mean_Case': m1, 'Mean_Control': m2, 'Var_Case': v1, 'Var_Control': v2,
+        'N_Case': n1, 'N_Control': n2, 'log2FC': m1 - m2, 't': t, 'df': dof, 'P_Value': p,
+    }
+
+
+def bh_fdr(p_values):
+    """Benjamini-Hochberg adjusted p-values (NaN-preserving)"""
+    p = np.asarray(p_values, dtype=np.float64)
+    fdr = np.full(p.shape, np.nan)
+    valid = ~np.isnan(p)
+    pv = p[valid]
+    m = len(pv)
+    if m == 0:
+        return fdr
+    order = np.argsort(pv)
+    scaled = pv[order] * m / np.arange(1, m + 1)
+    adjusted = np.minimum.accumulate(scaled[::-1])[::-1]
+    out = np.empty(m)
+    out[order] = np.minimum(adjusted, 1.0)
+    fdr[valid] = out
+    return fdr
+
+
+def needs_log_transform(block):
+    """Raw intensities/counts are log2-transformed; log-scale data is left alone"""
+    finite = block[np.isfinite(block)]
+    return finite.size > 0 and np.percentile(finite, 99) > 100
+
+
+def load_probe_map(path):
+    """Probe ID -> gene symbol mapping (two-column TSV: ID, Symbol)"""
+    mapping = pd.read_csv(path, sep='\t', dtype=str, usecols=[0, 1], comment='#')
+    mapping.columns = ['ID', 'Symbol']
+    mapping = mapping.dropna()
+    # Multi-gene probes ("A /// B") are ambiguous and dropped
+    mapping = mapping[~mapping['Symbol'].str.contains('///', regex=False)]
+    return mapping.set_index('ID')['Symbol']
+
+
+def collapse_to_genes(probe_stats, symbols):
+    """Keep the most highly expressed probe per gene"""
+    df = probe_stats.assign(Symbol=symbols).dropna(subset=['Symbol'])
+    expression = df[['Mean_Case', 'Mean_Control']].mean(axis=1)
+    df = df.assign(_expr=expression.values).sort_values('_expr', ascending=False, kind='mergesort')
+    return df.drop_duplicates('Symbol').drop(columns='_expr').reset_index(drop=True)
+
+
+def iter_log_blocks(handle, log_transform='auto', chunk_rows=CHUNK_ROWS):
+    """Expression blocks on the log2 scale; the transform is decided once, from the first block"""
+    transform = None
+    for ids, block in iter_expression_chunks(handle, chunk_rows):
+        if transform is None:
+            transform = needs_log_transform(block) if log_transform == 'auto' else bool(log_transform)
+        if transform:
+            block = np.log2(np.clip(block, 0, None) + 1.0)
+        yield ids, block
+
+
+def map_probe_symbols(probe_ids, probe_map=None, resolver=None):
+    """Gene symbol per probe (NaN where the probe does not map to one gene)"""
+    probe_ids = pd.Series(probe_ids, dtype='object')
+    if probe_map is not None:
+        return probe_ids.map(probe_map).values
+    if resolver is not None:
+        resolved = resolver.resolve(probe_ids)
+        return resolved['Symbol'].where(resolved['Status'] == 'resolved').values
+    return probe_ids.values
+
+
+def gene_level_statistics(probe_stats, symbols):
+    """Collapse probe statistics to genes and apply BH-FDR across genes"""
+    genes = collapse_to_genes(probe_stats, symbols)
+    genes['FDR'] = bh_fdr(genes['P_Value'].values)
+    columns = ['Symbol', 'Probe', 'log2FC', 't', 'df', 'P_Value', 'FDR',
+               'Mean_Case', 'Mean_Control', 'Var_Case', 'Var_Control', 'N_Case', 'N_Control']
+    return genes[columns]
+
+
+def check_groups(name, case, control):
+    """Welch statistics need at least two samples per group"""
+    if case.sum() < 2 or control.sum() < 2:
+        raise ValueError(f'{name}: need >=2 case and control samples '
+                         f'(found {int(case.sum())} case, {int(control.sum())} control)')
+
+
+def differential_expression(path, case_pattern=DEFAULT_CASE_PATTERN, control_pattern=DEFAULT_CONTROL_PATTERN,
+                            probe_map=None, resolver=None, log_transform='auto', chunk_rows=CHUNK_ROWS):
+    """Stream one series matrix and return per-gene Welch statistics with BH-FDR"""
+    with open_series_matrix(path) as handle:
+        samples, labels = read_series_header(handle)
+        case, control = assign_groups(labels, case_pattern, control_pattern)
+        check_groups(Path(path).name, case, control)
+
+        probe_ids, blocks = [], []
+        for ids, block in iter_log_blocks(handle, log_transform, chunk_rows):
+            probe_ids.append(ids)
+            blocks.append(pd.DataFrame(welch_statistics(block, case, control)))
+
+    probe_stats = pd.concat(blocks, ignore_index=True)
+    probe_stats.insert(0, 'Probe', np.concatenate(probe_ids))
+    return gene_level_statistics(probe_stats, map_probe_symbols(probe_stats['Probe'], probe_map, resolver))
+
+
+def series_matrix_path(dataset, geo_dir):
+    """Locate the local series-matrix file for a configured dataset"""
+    for suffix in ('_series_matrix.txt.gz', '_series_matrix.txt'):
+        path = geo_dir / f"{dataset['id']}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def build_signature(de_tables, curated_df, min_abs_log2fc=1.0, max_fdr=0.05, min_cohorts=1):
+    """Genes significant with a consistent direction in enough cohorts"""
+    passing = []
+    for cohort, de in de_tables.items():
+        hit = de[(de['log2FC'].abs() >= min_abs_log2fc) & (de['FDR'] < max_fdr)]
+        passing.append(pd.DataFrame({'Symbol': hit['Symbol'].values, 'Cohort': cohort,
+                                     'log2FC': hit['log2FC'].values, 'FDR': hit['FDR'].values}))
+    passing = pd.concat(passing, ignore_index=True)
+
+    summary = passing.groupby('Symbol').agg(
+        N_Cohorts=('Cohort', 'size'),
+        N_Up=('log2FC', lambda x: int((x > 0).sum())),
+        log2FC=('log2FC', 'mean'),
+        FDR=('FDR', 'max'),
+    )
+    consistent = (summary['N_Up'] == 0) | (summary['N_Up'] == summary['N_Cohorts'])
+    summary = summary[consistent & (summary['N_Cohorts'] >= min_cohorts)].drop(columns='N_Up')
+    summary = summary.rename_axis('Gene').reset_index()
+
+    # Keep curated annotations (keyed by official symbol) where they exist;
+    # new genes get neutral defaults
+    annotations = curated_df.drop_duplicates('Gene').set_index('Gene')
+    signature = summary.join(annotations, on='Gene')
+    signature['Symbol'] = signature['Symbol'].fillna(signature['Gene'])
+    signature['Pathway'] = signature['Pathway'].fillna('unassigned')
+    signature['Phase_Relevance'] = signature['Phase_Relevance'].fillna('Both')
+    signature['PubMed_Count'] = signature['PubMed_Count'].fillna(0).astype(int)
+    signature['Druggability'] = signature['Druggability'].fillna('Low')
+    signature['Description'] = signature['Description'].fillna(
+        'GEO-derived (' + signature['N_Cohorts'].astype(str) + ' cohorts)')
+
+    columns = list(curated_df.columns) + ['log2FC', 'FDR', 'N_Cohorts']
+    return signature[columns].sort_values('FDR', kind='mergesort').reset_index(drop=True)
+
+
+@traced()
+def run_geo_stage(config, resolver=None):
+    """Differential expression for every locally available GEO cohort"""
+    print("\n" + "="*60)
+    print("GEO DIFFERENTIAL EXPRESSION")
+    print("="*60)
+
+    signature_cfg = config['gene_signature']
+    geo_dir = BASE_DIR / config.get('geo_dir', 'data/geo')
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+
+    # Cohorts already converted to the memory-mapped store are analysed in
+    # parallel from there; the rest are streamed from their text matrices
+    from expression_store import cohort_differential_expression, cohort_settings, is_current, map_cohorts, store_dir
+
+    root = store_dir(config)
+    stored, streamed, skipped = [], [], []
+    for dataset in config['geo_datasets']:
+        path = series_matrix_path(dataset, geo_dir)
+        if path is None:
+            skipped.append(dataset['id'])
+        elif is_current(root, dataset['id'], path, cohort_settings(config, dataset)):
+            stored.append(dataset['id'])
+        else:
+            streamed.append((dataset, path))
+
+    de_tables = {}
+    for cohort_id in skipped:
+        print(f"  {cohort_id}: no local series matrix, skipped")
+    if stored:
+        start = time.perf_counter()
+        with span('de_from_store', cohorts=','.join(stored)):
+            de_tables.update(map_cohorts(cohort_differential_expression, root, stored))
+        print(f"  {', '.join(stored)}: analysed from expression store ({time.perf_counter() - start:.1f}s)")
+    for dataset, path in streamed:
+        probe_map = load_probe_map(geo_dir / dataset['probe_map']) if dataset.get('probe_map') else None
+        start = time.perf_counter()
+        with span('de_streamed', cohort=dataset['id']):
+            de_tables[dataset['id']] = differential_expression(
+                path,
+                case_pattern=dataset.get('case_pattern', DEFAULT_CASE_PATTERN),
+                control_pattern=dataset.get('control_pattern', DEFAULT_CONTROL_PATTERN),
+                probe_map=probe_map,
+                resolver=resolver,
+                log_transform=dataset.get('log_transform', 'auto'),
+            )
+        print(f"  {dataset['id']}: streamed from series matrix ({time.perf_counter() - start:.1f}s)")
+
+    for cohort_id in [d['id'] for d in config['geo_datasets'] if d['id'] in de_tables]:
+        de = de_tables[cohort_id]
+        tracing.count('genes_tested', len(de))
+        with span('write', path=f"de_{cohort_id}.csv"):
+            de.to_csv(tables_dir / f"de_{cohort_id}.csv", index=False)
+        significant = (de['log2FC'].abs() >= signature_cfg['min_abs_log2fc']) & (de['FDR'] < signature_cfg['max_fdr'])
+        n_sig = int(significant.sum())
+        print(f"  {cohort_id}: {len(de)} genes, {n_sig} significant")
+
+    if not de_tables:
+        print("No GEO cohorts available; keeping curated signature")
+        return None
+
+    curated = pd.read_csv(BASE_DIR / 'data' / 'gene_signature.csv')
+    signature = build_signature(
+        de_tables, curated,
+        min_abs_log2fc=signature_cfg['min_abs_log2fc'],
+        max_fdr=signature_cfg['max_fdr'],
+        min_cohorts=min(signature_cfg['min_cohorts'], len(de_tables)),
+    )
+    output_path = BASE_DIR / signature_cfg['geo_derived']
+    signature.to_csv(output_path, index=False)
+    print(f"\nSaved {len(signature)}-gene GEO-derived signature to: {output_path}")
+    return signature
+
+
+if __name__ == '__main__':
+    from run_pipeline import load_config
+    from gene_resolver import load_gene_resolver
+
+    config = load_config()
+    run_geo_stage(config, resolver=load_gene_resolver(config))
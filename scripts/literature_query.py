@@ -0,0 +1,241 @@
+"""
+Boolean literature queries over the local MEDLINE index
+Author: Dr. Siddalingaiah H S
+
+Evaluates PubMed-style search strategies such as
+"[Gene Symbol] AND (sepsis OR septic shock OR SIRS)" against the inverted
+index built by medline_index, restricted to a range of publication years.
+Operands are indexed sepsis terms or gene symbols; AND, OR and NOT combine
+them left to right as PubMed does, with parentheses for grouping.
+Sub-queries are evaluated once per template as document bitmaps and a
+template is split on its [Gene Symbol] placeholder, so each template is
+counted for every gene in two vectorized passes over the posting lists.
+The counts replace the curated PubMed_Count in scoring and fill
+Supplementary Table S3.
+"""
+
+import json
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import tracing
+from medline_index import load_literature_index
+
+BASE_DIR = Path(__file__).parent.parent
+
+COUNTS_FILE = 'literature_counts.csv'
+SEARCH_FILE = 'literature_search.json'
+
+PLACEHOLDER = '[gene symbol]'
+OPERATORS = {'AND', 'OR', 'NOT'}
+# The query whose counts become PubMed_Count
+PUBMED_QUERY = 'pubmed'
+
+DEFAULT_QUERIES = {
+    'years': [2000, 2024],
+    'queries': {PUBMED_QUERY: '[Gene Symbol] AND (sepsis OR septic shock OR SIRS)'},
+}
+
+QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"|\[[^\]]*\]|[^\s()"]+')
+
+# Table S3 validation categories: (minimum publications, label)
+CATEGORIES = [(50, 'Strong'), (20, 'Moderate'), (5, 'Limited'), (1, 'Minimal')]
+
+
+def settings_from_config(config):
+    return {**DEFAULT_QUERIES, **(config.get('literature') or {})}
+
+
+def operand_key(text, index):
+    """Index key of a query operand: a sepsis term, else a gene symbol"""
+    text = text.strip('"')
+    for key in [f'term:{text.lower()}', f'gene:{text}']:
+        if key in index:
+            return key
+    raise ValueError(f"'{text}' is neither an indexed sepsis term nor an indexed gene")
+
+
+def parse(query, index):
+    """Query tree of ('gene',), ('key', key) and (operator, left, right) nodes"""
+    tokens = QUERY_TOKEN.findall(query)
+    position = 0
+
+    def operand():
+        nonlocal position
+        if position >= len(tokens):
+            raise ValueError(f"Query ends where an operand is expected: {query!r}")
+        token = tokens[position]
+        if token == '(':
+            position += 1
+            node = expression()
+            if position >= len(tokens) or tokens[position] != ')':
+                raise ValueError(f"Unbalanced parentheses in {query!r}")
+            position += 1
+            return node
+        if token.lower() == PLACEHOLDER:
+            position += 1
+            return ('gene',)
+        # Consecutive words form one phrase (septic shock)
+        words = []
+        while position < len(tokens) and tokens[position] not in OPERATORS and tokens[position] not in ('(', ')'):
+            words.append(tokens[position])
+            position += 1
+        if not words:
+            raise ValueError(f"Operator where an operand is expected in {query!r}")
+        return ('key', operand_key(' '.join(words), index))
+
+    def expression():
+        nonlocal position
+        node = operand()
+        # Left to right, no precedence between AND, OR and NOT
+        while position < len(tokens) and tokens[position] in OPERATORS:
+            operator = tokens[position].lower()
+            position += 1
+            node = (operator, node, operand())
+        return node
+
+    tree = expression()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[position]}' in {query!r}")
+    return tree
+
+
+def uses_gene(node):
+    return node[0] == 'gene' or (node[0] != 'key' and (uses_gene(node[1]) or uses_gene(node[2])))
+
+
+class QueryEngine:
+    """Evaluates query trees over one LiteratureIndex within a year range
+
+    A template holding [Gene Symbol] is split on the gene (Shannon
+    expansion): its documents for gene G are (G AND A) OR (B NOT G), where
+    A and B are the template evaluated with the gene matching every
+    document and no document. A and B are bitmaps computed once per
+    template, so counts for all genes take two passes over the postings
+    whatever the shape of the query.
+    """
+
+    def __init__(self, index, years=None):
+        self.index = index
+        self.years_mask = np.ones(len(index), dtype=bool)
+        if years is not None:
+            self.years_mask = (index.years >= years[0]) & (index.years <= years[1])
+        self._masks = {}
+
+    def mask(self, node, gene=False):
+        """Document bitmap of a query with [Gene Symbol] matching all (True) or no documents"""
+        if node[0] == 'gene':
+            return np.full(len(self.index), gene)
+        key = (node, gene if uses_gene(node) else None)
+        if key not in self._masks:
+            if node[0] == 'key':
+                mask = self.index.doc_mask([node[1]])
+            else:
+                left, right = self.mask(node[1], gene), self.mask(node[2], gene)
+                mask = {'and': left & right, 'or': left | right, 'not': left & ~right}[node[0]]
+            self._masks[key] = mask
+        return self._masks[key]
+
+    def split(self, tree):
+        """(A, B) bitmaps of a template, restricted to the year range"""
+        return self.mask(tree, True) & self.years_mask, self.mask(tree, False) & self.years_mask
+
+    def search(self, query, gene=None):
+        """PMIDs matching a query (with [Gene Symbol] standing for gene)"""
+        with_gene, without_gene = self.split(parse(query, self.index))
+        docs = np.asarray(self.index.docs(f'gene:{gene}'))
+        matched = without_gene.copy()
+        matched[docs] = with_gene[docs]
+        return np.asarray(self.index.pmids[np.flatnonzero(matched)])
+
+    def count_genes(self, query, genes):
+        """Matching documents per gene for a [Gene Symbol] template"""
+        with_gene, without_gene = self.split(parse(query, self.index))
+        keys = pd.Index([f'gene:{g}' for g in genes])
+        counts = self.index.counts(with_gene)
+        # Documents the template matches without the gene, less those of the gene
+        if without_gene.any():
+            counts = counts + int(without_gene.sum()) - self.index.counts(without_gene)
+        tracing.count('literature_gene_queries', len(keys))
+        return counts.reindex(keys).fillna(int(without_gene.sum())).to_numpy(dtype=np.int64)
+
+
+def validation_category(count):
+    """Table S3 category of a publication count"""
+    for minimum, label in CATEGORIES:
+        if count >= minimum:
+            return label
+    return 'None'
+
+
+def run_literature_queries(config, genes_df):
+    """Counts per gene for every configured query; None without a local MEDLINE index
+
+    The counts and the search strategy are written next to the tables for
+    Supplementary Table S3. Without an index, files left by an earlier run
+    are removed so Table S3 never reports counts the ranking did not use.
+    """
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+    index = load_literature_index(config, genes_df)
+    if index is None:
+        for name in [COUNTS_FILE, SEARCH_FILE]:
+            (tables_dir / name).unlink(missing_ok=True)
+        return None
+    settings = settings_from_config(config)
+    engine = QueryEngine(index, settings['years'])
+    counts = pd.DataFrame({'Gene': genes_df['Gene'].to_numpy()})
+    for name, query in settings['queries'].items():
+        counts[name] = engine.count_genes(query, counts['Gene'])
+
+    counts.to_csv(tables_dir / COUNTS_FILE, index=False)
+    search = {
+        'queries': settings['queries'],
+        'years': settings['years'],
+        'documents': len(index),
+        'files': len(index.meta['sources']),
+    }
+    with open(tables_dir / SEARCH_FILE, 'w') as f:
+        json.dump(search, f, indent=2)
+    return counts
+
+
+def load_literature_counts(tables_dir=None):
+    """(counts, search strategy) written by run_literature_queries, or None"""
+    tables_dir = Path(tables_dir or BASE_DIR / 'outputs' / 'tables')
+    if not (tables_dir / COUNTS_FILE).exists() or not (tables_dir / SEARCH_FILE).exists():
+        return None
+    with open(tables_dir / SEARCH_FILE) as f:
+        search = json.load(f)
+    return pd.read_csv(tables_dir / COUNTS_FILE), search
+
+
+if __name__ == '__main__':
+    import argparse
+    from run_pipeline import load_config, load_gene_signature
+
+    parser = argparse.ArgumentParser(description='Boolean queries over the local MEDLINE index')
+    parser.add_argument('query', nargs='?', help='one query; [Gene Symbol] is replaced by --gene')
+    parser.add_argument('--gene', help='gene standing for [Gene Symbol]')
+    parser.add_argument('--years', type=int, nargs=2, metavar=('FIRST', 'LAST'))
+    args = parser.parse_args()
+
+    config = load_config()
+    genes_df = load_gene_signature()
+    if args.query is None:
+        counts = run_literature_queries(config, genes_df)
+        if counts is None:
+            print("No local MEDLINE files found (see literature.medline_dir in the config)")
+        else:
+            print(f"Saved query counts for {len(counts)} genes to: {BASE_DIR / 'outputs' / 'tables' / COUNTS_FILE}")
+            print(counts.sort_values(PUBMED_QUERY, ascending=False).head(15).to_string(index=False))
+    else:
+        index = load_literature_index(config, genes_df)
+        if index is None:
+            print("No local MEDLINE files found (see literature.medline_dir in the config)")
+        else:
+            years = args.years or settings_from_config(config)['years']
+            pmids = QueryEngine(index, years).search(args.query, args.gene)
+            print(f"{len(pmids)} citations ({years[0]}-{years[1]})")
+            print(' '.join(map(str, pmids[:50])))
@@ -0,0 +1,508 @@
+"""
+Local MEDLINE baseline index for gene-sepsis co-mention counts
+Author: Dr. Siddalingaiah H S
+
+PubMed_Count in the signature is entered by hand. This module derives it
+from a locally downloaded MEDLINE/PubMed baseline (pubmed*.xml.gz) instead.
+Each file is stream-parsed with iterparse, clearing every citation once it
+has been read, so memory is bounded by one article rather than one file;
+files are indexed in parallel. Titles, abstracts and MeSH headings are
+matched against gene symbols, unambiguous aliases and the sepsis terms with
+Aho-Corasick automata over word tokens, and the matches are merged into an
+inverted index: sorted document ids per gene and per term, alongside each
+document's PMID and publication year. Co-mention counts are then mask
+lookups over the index, recomputable for every gene without network access.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+import tracing
+
+BASE_DIR = Path(__file__).parent.parent
+
+INDEX_VERSION = 2
+META_FILE = 'meta.json'
+
+DEFAULT_SETTINGS = {
+    'medline_dir': 'data/reference/medline',
+    'index': 'data/reference/medline/index',
+    'sepsis_terms': ['sepsis', 'septic shock', 'septicemia', 'septicaemia', 'SIRS',
+                     'systemic inflammatory response syndrome'],
+    'min_alias_length': 3,
+}
+
+# Letter runs and digit runs: "IL-6", "IL 6" and "IL6" all read IL, 6
+TOKEN = re.compile(r'[A-Za-z]+|[0-9]+')
+# The same tokens with the letter or digit following each ('' at a word end)
+WORD_TOKEN = re.compile(r'([A-Za-z]+|[0-9]+)(?=([A-Za-z0-9]?))')
+YEAR = re.compile(r'\d{4}')
+# Automata with up to this many first tokens pre-filter texts with one regex search
+MAX_ALTERNATIVES = 256
+
+_memory_cache = {}
+
+
+def settings_from_config(config):
+    return {**DEFAULT_SETTINGS, **(config.get('literature') or {})}
+
+
+def tokens(text):
+    return TOKEN.findall(text)
+
+
+def word_tokens(text):
+    """(token, ends a word) pairs: 6 ends a word in IL-6 but not in IL6R"""
+    return [(token, not following) for token, following in WORD_TOKEN.findall(text)]
+
+
+class TokenAutomaton:
+    """Aho-Corasick automaton whose alphabet is word tokens
+
+    Patterns are token sequences, and a match is only accepted where its
+    last token ends a word, so IL6 matches "IL-6" but not "IL66", "IL6R" or
+    "IL-6ST". Texts without any token
+    that starts a pattern are rejected with one set intersection (or, for
+    automata with few first tokens, one substring search before the text is
+    tokenized), and texts whose candidate tokens only form one-token
+    patterns are answered from the root transitions without walking.
+    """
+
+    def __init__(self, patterns, lower=False):
+        self.lower = lower
+        self.goto = [{}]
+        outputs = [set()]
+        for pattern, label in patterns:
+            state = 0
+            for token in pattern:
+                child = self.goto[state].get(token)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[state][token] = child
+                    self.goto.append({})
+                    outputs.append(set())
+                state = child
+            if state:
+                outputs[state].add(label)
+
+        # Failure links breadth first; a state also emits its failure state's labels
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                outputs[child] |= outputs[self.fail[child]]
+        self.output = [frozenset(labels) for labels in outputs]
+
+        root = self.goto[0]
+        self.first_tokens = frozenset(root)
+        self.single_tokens = frozenset(token for token, child in root.items() if not self.goto[child])
+        self.prefilter = None
+        if 0 < len(root) <= MAX_ALTERNATIVES:
+            self.prefilter = re.compile('|'.join(re.escape(t) for t in sorted(root)))
+
+    def __len__(self):
+        return len(self.goto)
+
+    def scan(self, text):
+        """Labels of every pattern occurring in a text"""
+        if self.lower:
+            text = text.lower()
+        if self.prefilter is not None and not self.prefilter.search(text):
+            return set()
+        return self.match(word_tokens(text))
+
+    def match(self, text_tokens):
+        """Labels of every pattern occurring in a sequence of (token, ends a word) pairs"""
+        hits = self.first_tokens.intersection(token for token, _ in text_tokens)
+        if not hits:
+            return set()
+        found = set()
+        if hits <= self.single_tokens:
+            root = self.goto[0]
+            for token, ends in text_tokens:
+                if ends and token in hits:
+                    found |= self.output[root[token]]
+            return found
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for token, ends in text_tokens:
+            child = goto[state].get(token)
+            while child is None and state:
+                state = fail[state]
+                child = goto[state].get(token)
+            state = child or 0
+            if ends and output[state]:
+                found |= output[state]
+        return found
+
+
+def gene_patterns(symbols, aliases=None, min_alias_length=3):
+    """Index keys and (tokens, key id) patterns for genes
+
+    symbols maps each name to match onto its gene (the official symbol, or
+    a display name such as NFkB); aliases is a (Symbol, Alias) table of
+    unambiguous aliases, of which only those of min_alias_length or more
+    characters are used. Gene names are matched case-sensitively.
+    """
+    names = pd.DataFrame({'Symbol': list(symbols.values()), 'Name': list(symbols.keys())})
+    if aliases is not None and len(aliases):
+        aliases = aliases[aliases['Alias'].str.len() >= min_alias_length]
+        names = pd.concat([names, aliases.rename(columns={'Alias': 'Name'})], ignore_index=True)
+    names = names.drop_duplicates()
+    keys = sorted(set(names['Symbol']))
+    key_id = {symbol: i for i, symbol in enumerate(keys)}
+    patterns = [(tuple(tokens(name)), key_id[symbol]) for symbol, name in zip(names['Symbol'], names['Name'])]
+    return [f'gene:{symbol}' for symbol in keys], [p for p in patterns if p[0]]
+
+
+def term_patterns(terms, offset=0):
+    """Index keys and lower-case patterns for the sepsis terms"""
+    keys = [f'term:{term.lower()}' for term in terms]
+    return keys, [(tuple(tokens(term.lower())), offset + i) for i, term in enumerate(terms)]
+
+
+def open_medline(path):
+    path = Path(path)
+    return gzip.open(path, 'rb') if path.name.endswith('.gz') else open(path, 'rb')
+
+
+def medline_files(directory):
+    """Baseline and update files in name (release) order"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(p for p in directory.iterdir() if p.name.endswith(('.xml', '.xml.gz')))
+
+
+def _text(element):
+    return '' if element is None else ''.join(element.itertext())
+
+
+def citation_year(citation):
+    """Journal issue year, falling back to MedlineDate and completion dates; 0 if none"""
+    year = citation.findtext('Article/Journal/JournalIssue/PubDate/Year')
+    if year is None:
+        match = YEAR.search(citation.findtext('Article/Journal/JournalIssue/PubDate/MedlineDate') or '')
+        year = match.group(0) if match else citation.findtext('DateCompleted/Year')
+    return int(year) if year else 0
+
+
+def iter_citations(path):
+    """(PMID, year, text) per article and (PMID, None, None) per deletion of one file
+
+    Each element is cleared, and detached from the root, as soon as it has
+    been read.
+    """
+    with open_medline(path) as f:
+        for _, element in etree.iterparse(f, events=('end',), tag=('PubmedArticle', 'DeleteCitation')):
+            if element.tag == 'DeleteCitation':
+                for pmid in element.iterfind('PMID'):
+                    yield int(pmid.text), None, None
+            else:
+                citation = element.find('MedlineCitation')
+                parts = [_text(citation.find('Article/ArticleTitle'))]
+                parts += [_text(a) for a in citation.iterfind('Article/Abstract/AbstractText')]
+                parts += [_text(d) for d in citation.iterfind('MeshHeadingList/MeshHeading/DescriptorName')]
+                yield int(citation.findtext('PMID')), citation_year(citation), '\n'.join(parts)
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+_automata = None
+
+
+def _init_worker(genes, terms):
+    global _automata
+    _automata = (genes, terms)
+
+
+def index_file(path):
+    """Documents, deletions and (key id, document) matches of one MEDLINE file"""
+    genes, terms = _automata
+    pmids, years, deleted, key_ids, doc_ids = [], [], [], [], []
+    for pmid, year, text in iter_citations(path):
+        if text is None:
+            deleted.append(pmid)
+            continue
+        doc = len(pmids)
+        pmids.append(pmid)
+        years.append(year)
+        found = genes.scan(text) | terms.scan(text)
+        key_ids.extend(found)
+        doc_ids.extend([doc] * len(found))
+    return {
+        'pmids': np.array(pmids, dtype=np.int64),
+        'years': np.array(years, dtype=np.int16),
+        'deleted': np.array(deleted, dtype=np.int64),
+        'key_ids': np.array(key_ids, dtype=np.int32),
+        'doc_ids': np.array(doc_ids, dtype=np.int64),
+    }
+
+
+def index_files(files, genes, terms, processes=None):
+    """index_file over every file, one file per task"""
+    tasks = [str(f) for f in files]
+    if processes == 1 or len(tasks) <= 1:
+        _init_worker(genes, terms)
+        return list(map(index_file, tasks))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(genes, terms)) as pool:
+        return list(pool.map(index_file, tasks))
+
+
+def merge_results(results, n_keys):
+    """Document table and CSR postings from per-file results (in release order)
+
+    A citation revised in a later file replaces the earlier version, and a
+    deletion removes every version from its own or an earlier file.
+    Documents are numbered in PMID order.
+    """
+    sizes = [len(r['pmids']) for r in results]
+    starts = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    pmids = np.concatenate([r['pmids'] for r in results])
+    years = np.concatenate([r['years'] for r in results])
+    file_of = np.repeat(np.arange(len(results)), sizes)
+
+    keep = np.zeros(len(pmids), dtype=bool)
+    _, last = np.unique(pmids[::-1], return_index=True)
+    keep[len(pmids) - 1 - last] = True
+    deleted = np.concatenate([r['deleted'] for r in results])
+    if len(deleted):
+        deleted_in = pd.Series(np.repeat(np.arange(len(results)), [len(r['deleted']) for r in results]),
+                               index=deleted)
+        latest = deleted_in.groupby(level=0).max().reindex(pmids).fillna(-1).to_numpy()
+        keep &= latest < file_of
+
+    kept = np.flatnonzero(keep)
+    order = kept[np.argsort(pmids[kept], kind='stable')]
+    doc_id = np.full(len(pmids), -1, dtype=np.int64)
+    doc_id[order] = np.arange(len(order))
+
+    key_ids = np.concatenate([r['key_ids'] for r in results])
+    docs = doc_id[np.concatenate([r['doc_ids'] + start for r, start in zip(results, starts)])]
+    valid = docs >= 0
+    key_ids, docs = key_ids[valid], docs[valid]
+    sort = np.lexsort((docs, key_ids))
+    key_ids, docs = key_ids[sort], docs[sort]
+    return {
+        'pmids': pmids[order].astype(np.int32),
+        'years': years[order],
+        'offsets': np.searchsorted(key_ids, np.arange(n_keys + 1)).astype(np.int64),
+        'postings': docs.astype(np.int32),
+    }
+
+
+class LiteratureIndex:
+    """Inverted index of MEDLINE documents per gene and per sepsis term"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.keys = pd.Index(np.load(self.path / 'keys.npy'))
+        self.pmids = np.load(self.path / 'pmids.npy', mmap_mode='r')
+        self.years = np.load(self.path / 'years.npy', mmap_mode='r')
+        self.offsets = np.load(self.path / 'offsets.npy')
+        self.postings = np.load(self.path / 'postings.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.pmids)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def docs(self, key):
+        """Sorted document ids of one key (empty if the key is not indexed)"""
+        i = self.keys.get_indexer([key])[0]
+        if i < 0:
+            return np.zeros(0, dtype=np.int32)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def doc_mask(self, keys):
+        """Boolean mask over documents matching any of keys"""
+        mask = np.zeros(len(self), dtype=bool)
+        for key in keys:
+            mask[self.docs(key)] = True
+        return mask
+
+    def counts(self, mask=None):
+        """Documents per key, restricted to a document mask if given"""
+        if mask is None:
+            return pd.Series(np.diff(self.offsets), index=self.keys)
+        sizes = np.diff(self.offsets)
+        counts = np.zeros(len(sizes), dtype=np.int64)
+        # reduceat needs non-empty segments; empty keys keep a zero count
+        nonempty = sizes > 0
+        if nonempty.any():
+            counts[nonempty] = np.add.reduceat(mask[self.postings], self.offsets[:-1][nonempty], dtype=np.int64)
+        return pd.Series(counts, index=self.keys)
+
+    def term_keys(self):
+        return [k for k in self.keys if k.startswith('term:')]
+
+    def __repr__(self):
+        return f"LiteratureIndex({len(self)} documents, {len(self.keys)} keys)"
+
+
+def source_fingerprint(files):
+    return [[f.name, f.stat().st_size, f.stat().st_mtime] for f in files]
+
+
+def build_patterns(settings, symbols, aliases=None):
+    """Index keys and the gene and term automata for these settings"""
+    gene_keys, genes = gene_patterns(symbols, aliases, settings['min_alias_length'])
+    term_keys, terms = term_patterns(settings['sepsis_terms'], offset=len(gene_keys))
+    # Gene names keep their case; sepsis terms match in any case
+    return gene_keys + term_keys, TokenAutomaton(genes), TokenAutomaton(terms, lower=True)
+
+
+def names_digest(settings, symbols, aliases=None):
+    """Hash of everything the automata are built from"""
+    digest = hashlib.sha256(json.dumps([settings['sepsis_terms'], settings['min_alias_length'],
+                                        sorted(symbols.items())]).encode())
+    if aliases is not None:
+        digest.update(pd.util.hash_pandas_object(aliases, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def is_current(path, files, digest):
+    """True when the index was built from these files and names"""
+    meta_path = Path(path) / META_FILE
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return (meta.get('version_index') == INDEX_VERSION and meta.get('sources') == source_fingerprint(files)
+            and meta.get('names_digest') == digest)
+
+
+def build_index(files, path, settings, symbols, aliases=None, processes=None):
+    """Index the MEDLINE files into the inverted index at path"""
+    start = time.perf_counter()
+    keys, genes, terms = build_patterns(settings, symbols, aliases)
+    results = index_files(files, genes, terms, processes)
+    tracing.count('medline_citations', sum(len(r['pmids']) for r in results))
+    merged = merge_results(results, len(keys))
+
+    staging = Path(path).with_name(Path(path).name + '.tmp')
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    np.save(staging / 'keys.npy', np.array(keys, dtype=str))
+    for name, values in merged.items():
+        np.save(staging / f'{name}.npy', values)
+    meta = {
+        'version_index': INDEX_VERSION,
+        'sources': source_fingerprint(files),
+        'names_digest': names_digest(settings, symbols, aliases),
+        'sepsis_terms': settings['sepsis_terms'],
+        'keys': len(keys),
+        'documents': len(merged['pmids']),
+        'postings': len(merged['postings']),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(staging / META_FILE, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap in atomically so readers never see a half-written index
+    if Path(path).exists():
+        shutil.rmtree(path)
+    os.replace(staging, path)
+    return LiteratureIndex(path)
+
+
+def signature_names(config, genes_df=None):
+    """Names to match per gene and the resolver's alias table (None without gene_info)
+
+    Every gene of the resolver is indexed when the gene_info dump is
+    available; the signature's genes and display symbols always are.
+    """
+    from gene_resolver import load_gene_resolver
+
+    if genes_df is None:
+        genes_df = pd.read_csv(BASE_DIR / 'data' / 'gene_signature.csv')
+    resolver = load_gene_resolver(config)
+    symbols = {}
+    aliases = None
+    if resolver is not None:
+        symbols.update(zip(resolver.genes['Symbol'], resolver.genes['Symbol']))
+        aliases = resolver.alias_table()
+    symbols.update(zip(genes_df['Gene'], genes_df['Gene']))
+    symbols.update(zip(genes_df['Symbol'], genes_df['Gene']))
+    return symbols, aliases
+
+
+def load_literature_index(config, genes_df=None, force=False, processes=None):
+    """Index of the configured MEDLINE files, built if needed; None if none are present"""
+    settings = settings_from_config(config)
+    files = medline_files(BASE_DIR / settings['medline_dir'])
+    if not files:
+        return None
+    path = BASE_DIR / settings['index']
+    symbols, aliases = signature_names(config, genes_df)
+    digest = names_digest(settings, symbols, aliases)
+    # Another signature or alias table needs another index at the same path
+    cache_key = (str(path), digest)
+    if cache_key in _memory_cache and not force:
+        return _memory_cache[cache_key]
+
+    if not force and is_current(path, files, digest):
+        tracing.count('medline_index_cache_hits')
+        index = LiteratureIndex(path)
+    else:
+        tracing.count('medline_index_cache_misses')
+        index = build_index(files, path, settings, symbols, aliases, processes)
+        print(f"Indexed {index.meta['documents']} MEDLINE citations from {len(files)} files: "
+              f"{index.meta['postings']} gene/term mentions ({index.meta['seconds']:.1f}s)")
+    _memory_cache[cache_key] = index
+    return index
+
+
+def pubmed_counts(index, genes, years=None):
+    """Mentions and sepsis co-mentions per gene, optionally within a (first, last) year range"""
+    mask = index.doc_mask(index.term_keys())
+    if years is not None:
+        mask &= (index.years >= years[0]) & (index.years <= years[1])
+    gene_keys = pd.Index([f'gene:{g}' for g in genes])
+    return pd.DataFrame({
+        'Gene': list(genes),
+        'Mentions': index.counts().reindex(gene_keys).fillna(0).astype(np.int64).to_numpy(),
+        'Sepsis_Mentions': index.counts(mask).reindex(gene_keys).fillna(0).astype(np.int64).to_numpy(),
+    })
+
+
+if __name__ == '__main__':
+    import argparse
+    from run_pipeline import load_config, load_gene_signature
+
+    parser = argparse.ArgumentParser(description='Index local MEDLINE files for gene-sepsis co-mention counts')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the index is current')
+    parser.add_argument('--processes', type=int, help='worker processes (one MEDLINE file per task)')
+    args = parser.parse_args()
+
+    genes_df = load_gene_signature()
+    index = load_literature_index(load_config(), genes_df, force=args.force, processes=args.processes)
+    if index is None:
+        print("No local MEDLINE files found (see literature.medline_dir in the config)")
+    else:
+        print(index)
+        counts = pubmed_counts(index, genes_df['Gene'])
+        print(counts.sort_values('Sepsis_Mentions', ascending=False).head(15).to_string(index=False))
@@ -0,0 +1,158 @@
+"""
+Multi-cohort meta-analysis of gene effect sizes for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Computes Hedges' g and its variance per gene in every GEO cohort, then pools
+all genes at once with fixed-effect (inverse variance) and random-effects
+(DerSimonian-Laird) models. Genes are rows and cohorts are columns of one
+array, so pooling is a handful of NaN-aware reductions.
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import special
+
+from geo_expression import bh_fdr, series_matrix_path
+from tracing import traced
+
+BASE_DIR = Path(__file__).parent.parent
+
+# |g| at which the expression evidence saturates in the omics component
+EFFECT_SATURATION = 2.0
+
+
+def effect_sizes(de):
+    """Hedges' g (bias-corrected SMD) and its sampling variance per gene"""
+    n1, n2 = de['N_Case'].values, de['N_Control'].values
+    v1, v2 = de['Var_Case'].values, de['Var_Control'].values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pooled_sd = np.sqrt(((n1 - 1) * v1 + (n2 - 1) * v2) / (n1 + n2 - 2))
+        d = (de['Mean_Case'].values - de['Mean_Control'].values) / pooled_sd
+        g = d * (1 - 3 / (4 * (n1 + n2) - 9))
+        var_g = (n1 + n2) / (n1 * n2) + g ** 2 / (2 * (n1 + n2))
+    out = pd.DataFrame({'Symbol': de['Symbol'].values, 'g': g, 'var_g': var_g})
+    return out[np.isfinite(out['g']) & np.isfinite(out['var_g']) & (out['var_g'] > 0)]
+
+
+def cohort_effect_sizes(cohort):
+    """Effect sizes straight from a memory-mapped cohort (process-pool worker)"""
+    from expression_store import cohort_differential_expression
+    return effect_sizes(cohort_differential_expression(cohort))
+
+
+def align_effects(effects):
+    """Stack per-cohort effects into genes x cohorts matrices (NaN where missing)"""
+    long = pd.concat([e.assign(Cohort=cohort) for cohort, e in effects.items()], ignore_index=True)
+    g = long.pivot(index='Symbol', columns='Cohort', values='g')
+    v = long.pivot(index='Symbol', columns='Cohort', values='var_g').reindex_like(g)
+    return g.index, list(g.columns), g.to_numpy(), v.to_numpy()
+
+
+def pool_effects(g, v):
+    """Fixed- and random-effects pooling of a genes x cohorts effect matrix"""
+    present = np.isfinite(g) & np.isfinite(v)
+    k = present.sum(axis=1)
+    g0 = np.where(present, g, 0.0)
+    w = np.where(present, 1.0 / np.where(present, v, 1.0), 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sum_w = w.sum(axis=1)
+        fe = (w * g0).sum(axis=1) / sum_w
+        fe_se = np.sqrt(1.0 / sum_w)
+
+        # DerSimonian-Laird between-cohort variance
+        q = (w * (g0 - fe[:, None]) ** 2).sum(axis=1)
+        dof = k - 1
+        c = sum_w - (w ** 2).sum(axis=1) / sum_w
+        tau2 = np.where(dof > 0, np.maximum(0.0, (q - dof) / c), 0.0)
+        i2 = np.where((dof > 0) & (q > 0), np.maximum(0.0, (q - dof) / q), np.nan)
+
+        w_re = np.where(present, 1.0 / (np.where(present, v, 1.0) + tau2[:, None]), 0.0)
+        sum_w_re = w_re.sum(axis=1)
+        re = (w_re * g0).sum(axis=1) / sum_w_re
+        re_se = np.sqrt(1.0 / sum_w_re)
+        fe_z, re_z = fe / fe_se, re / re_se
+
+    return {
+        'N_Cohorts': k,
+        'FE_Effect': fe, 'FE_SE': fe_se, 'FE_P': 2 * special.ndtr(-np.abs(fe_z)),
+        'RE_Effect': re, 'RE_SE': re_se, 'RE_Z': re_z, 'RE_P': 2 * special.ndtr(-np.abs(re_z)),
+        'Tau2': tau2, 'Q': q, 'Q_P': np.where(dof > 0, special.chdtrc(np.maximum(dof, 1), q), np.nan),
+        'I2': i2,
+    }
+
+
+def meta_analyze(effects):
+    """Pooled effects, heterogeneity and meta-FDR for every gene"""
+    genes, cohorts, g, v = align_effects(effects)
+    pooled = pd.DataFrame(pool_effects(g, v))
+    pooled.insert(0, 'Symbol', genes.values)
+    pooled['Meta_FDR'] = bh_fdr(pooled['RE_P'].values)
+    return pooled.sort_values('RE_P', kind='mergesort').reset_index(drop=True)
+
+
+def meta_strength(meta, max_fdr=0.05):
+    """Omics strength in [0, 1]: pooled |g| (saturating) for meta-significant genes"""
+    strength = np.minimum(meta['RE_Effect'].abs() / EFFECT_SATURATION, 1.0)
+    return strength.where(meta['Meta_FDR'] < max_fdr, 0.0)
+
+
+def attach_meta_evidence(genes_df, meta, max_fdr=0.05):
+    """Join pooled evidence onto a signature by official gene symbol"""
+    evidence = meta.set_index('Symbol')
+    evidence = pd.DataFrame({
+        'Meta_Effect': evidence['RE_Effect'],
+        'Meta_FDR': evidence['Meta_FDR'],
+        'Meta_Strength': meta_strength(evidence, max_fdr),
+    })
+    return genes_df.join(evidence, on='Gene')
+
+
+def collect_effects(config):
+    """Per-cohort effect sizes: stored cohorts in parallel, others from DE tables"""
+    from expression_store import cohort_settings, is_current, map_cohorts, store_dir
+
+    geo_dir = BASE_DIR / config.get('geo_dir', 'data/geo')
+    root = store_dir(config)
+    stored, effects = [], {}
+    for dataset in config['geo_datasets']:
+        source = series_matrix_path(dataset, geo_dir)
+        de_path = BASE_DIR / 'outputs' / 'tables' / f"de_{dataset['id']}.csv"
+        if source is not None and is_current(root, dataset['id'], source, cohort_settings(config, dataset)):
+            stored.append(dataset['id'])
+        elif de_path.exists():
+            effects[dataset['id']] = effect_sizes(pd.read_csv(de_path))
+    effects.update(map_cohorts(cohort_effect_sizes, root, stored))
+    # Keep the configured cohort order
+    return {d['id']: effects[d['id']] for d in config['geo_datasets'] if d['id'] in effects}
+
+
+@traced()
+def run_meta_analysis(config):
+    """Meta-analysis stage over the configured GEO cohorts"""
+    print("\n" + "="*60)
+    print("MULTI-COHORT META-ANALYSIS")
+    print("="*60)
+
+    effects = collect_effects(config)
+    if len(effects) < 2:
+        print(f"{len(effects)} cohort(s) available; meta-analysis needs at least 2")
+        return None
+
+    meta = meta_analyze(effects)
+    output_path = BASE_DIR / 'outputs' / 'tables' / 'meta_analysis.csv'
+    meta.to_csv(output_path, index=False)
+
+    max_fdr = config['gene_signature']['max_fdr']
+    print(f"Pooled {len(meta)} genes across {len(effects)} cohorts ({', '.join(effects)})")
+    print(f"Meta-FDR < {max_fdr}: {int((meta['Meta_FDR'] < max_fdr).sum())} genes")
+    print(f"Median I²: {np.nanmedian(meta['I2']) * 100:.0f}%")
+    print(f"Saved meta-analysis to: {output_path}")
+    return meta
+
+
+if __name__ == '__main__':
+    from run_pipeline import load_config
+
+    run_meta_analysis(load_config())
@@ -0,0 +1,205 @@
+"""
+Batched scoring of many gene signatures for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Scores N signatures (per cohort, per endotype, pediatric vs adult, ...) in
+one pass. The signatures become a sparse signatures x genes membership
+matrix (CSR) over a shared gene universe whose component matrix is computed
+once. Every membership entry is scored with a single gather (optionally
+with per-signature weights), and all per-signature rankings come from one
+segmented sort of the entries.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import sparse
+
+from run_pipeline import COMPONENTS, calculate_score_components, load_config, prepare_signature
+
+BASE_DIR = Path(__file__).parent.parent
+
+
+def membership_matrix(signatures, genes):
+    """CSR membership (signatures x universe genes) from {name: [genes]}
+
+    Returns the matrix, the signature names and the number of genes per
+    signature that are not in the universe.
+    """
+    names = list(signatures)
+    lengths = np.array([len(signatures[name]) for name in names], dtype=np.int64)
+    rows = np.repeat(np.arange(len(names)), lengths)
+    flat = np.concatenate([np.asarray(signatures[name], dtype=object) for name in names]) if names else np.array([])
+    cols = pd.Index(genes).get_indexer(flat)
+
+    found = cols >= 0
+    unmatched = np.bincount(rows[~found], minlength=len(names))
+    membership = sparse.csr_matrix((np.ones(found.sum(), dtype=np.int8), (rows[found], cols[found])),
+                                   shape=(len(names), len(genes)))
+    # Duplicate genes within a signature count once; indices end up sorted
+    membership.sum_duplicates()
+    membership.sort_indices()
+    membership.data[:] = 1
+    return membership, names, pd.Series(unmatched, index=names)
+
+
+def signatures_from_table(df, signature_col='Signature', gene_col='Gene'):
+    """{name: [genes]} from a long table, keeping first-appearance order"""
+    return {name: group[gene_col].tolist() for name, group in df.groupby(signature_col, sort=False)}
+
+
+def cohort_signatures(config, tables_dir=None):
+    """One signature per GEO cohort from its significant DE genes"""
+    tables_dir = Path(tables_dir or BASE_DIR / 'outputs' / 'tables')
+    cfg = config['gene_signature']
+    signatures = {}
+    for dataset in config['geo_datasets']:
+        path = tables_dir / f"de_{dataset['id']}.csv"
+        if not path.exists():
+            continue
+        de = pd.read_csv(path, usecols=['Symbol', 'log2FC', 'FDR'])
+        significant = (de['log2FC'].abs() >= cfg['min_abs_log2fc']) & (de['FDR'] < cfg['max_fdr'])
+        signatures[dataset['id']] = de.loc[significant, 'Symbol'].tolist()
+    return signatures
+
+
+def signature_weights(weights, names):
+    """(signatures x components) weight matrix from a per-signature weight table
+
+    Rows are matched by signature name; a signature or component without a
+    weight is an error rather than a NaN score.
+    """
+    missing_components = [name for name in COMPONENTS if name not in weights.columns]
+    if missing_components:
+        raise ValueError(f"Weight table lacks components: {', '.join(missing_components)}")
+    w = weights.reindex(pd.Index(names))[COMPONENTS]
+    incomplete = w.index[w.isna().any(axis=1)]
+    if len(incomplete):
+        raise ValueError(f"No complete weight row for signatures: {', '.join(map(str, incomplete[:10]))}")
+    return w.to_numpy(dtype=float)
+
+
+def score_signatures(membership, components, weights, names=None):
+    """Composite score of every membership entry
+
+    weights is a dict (shared by all signatures) or a DataFrame indexed by
+    signature name with one row of component weights per signature; names
+    gives the signature of each membership row.
+    """
+    matrix = components[COMPONENTS].to_numpy(dtype=float)
+    if isinstance(weights, pd.DataFrame):
+        if names is None:
+            raise ValueError("Per-signature weights need the signature names")
+        rows = np.repeat(np.arange(membership.shape[0]), np.diff(membership.indptr))
+        w = signature_weights(weights, names)
+        composite = np.einsum('ij,ij->i', w[rows], matrix[membership.indices])
+    else:
+        shared = np.array([weights[name] for name in COMPONENTS], dtype=float)
+        if np.isnan(shared).any():
+            raise ValueError("Component weights must not be NaN")
+        composite = (matrix @ shared)[membership.indices]
+    return np.round(composite, 3)
+
+
+def segment_ranks(membership, scores):
+    """Entry order and 1-based rank within each signature (ties keep gene order)"""
+    rows = np.repeat(np.arange(membership.shape[0]), np.diff(membership.indptr))
+    # One integer key (signature, descending score) on the 3-decimal scores;
+    # membership indices are sorted within each row, so a stable sort keeps
+    # gene order among ties
+    milli = np.rint(scores * 1000).astype(np.int64)
+    span = milli.max() - milli.min() + 1 if len(milli) else 1
+    order = np.argsort(rows * span + (milli.max(initial=0) - milli), kind='stable')
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[order] = np.arange(len(scores)) - membership.indptr[rows[order]] + 1
+    return order, ranks
+
+
+def _take(column, positions):
+    """column[positions] as a Categorical (cheap for millions of entries)"""
+    codes, uniques = pd.factorize(column)
+    return pd.Categorical.from_codes(codes[positions], categories=uniques)
+
+
+def rank_signatures(signatures, genes_df, weights, components=None):
+    """Rank every signature against one shared component matrix
+
+    Returns a long DataFrame (Signature, Rank, Gene, Symbol, Pathway,
+    Composite_Score) sorted by signature then rank, and the per-signature
+    count of genes missing from the universe.
+    """
+    genes_df = genes_df.reset_index(drop=True)
+    if components is None:
+        components = calculate_score_components(genes_df)
+    membership, names, unmatched = membership_matrix(signatures, genes_df['Gene'])
+
+    scores = score_signatures(membership, components, weights, names)
+    order, ranks = segment_ranks(membership, scores)
+    rows = np.repeat(np.arange(len(names)), np.diff(membership.indptr))[order]
+    cols = membership.indices[order]
+    rankings = pd.DataFrame({
+        'Signature': pd.Categorical.from_codes(rows, categories=pd.Index(names)),
+        'Rank': ranks[order],
+        'Gene': _take(genes_df['Gene'], cols),
+        'Symbol': _take(genes_df['Symbol'], cols),
+        'Pathway': _take(genes_df['Pathway'], cols),
+        'Composite_Score': scores[order],
+    })
+    return rankings, unmatched
+
+
+def random_signatures(genes, n_signatures, min_size=20, max_size=500, seed=0):
+    """Random gene lists drawn from the universe (throughput measurements)"""
+    rng = np.random.default_rng(seed)
+    genes = np.asarray(genes, dtype=object)
+    sizes = rng.integers(min_size, min(max_size, len(genes)) + 1, size=n_signatures)
+    return {f'SIG{i:06d}': genes[rng.choice(len(genes), size=size, replace=False)].tolist()
+            for i, size in enumerate(sizes)}
+
+
+def run_multi_signature(signatures, config=None, output_path=None):
+    """Score a set of signatures and save the combined rankings"""
+    print("\n" + "="*60)
+    print("MULTI-SIGNATURE SCORING")
+    print("="*60)
+
+    config = config or load_config()
+    genes_df = prepare_signature(config)
+    components = calculate_score_components(genes_df)
+
+    start = time.perf_counter()
+    rankings, unmatched = rank_signatures(signatures, genes_df, config['scoring'], components)
+    elapsed = time.perf_counter() - start
+
+    output_path = output_path or BASE_DIR / 'outputs' / 'tables' / 'multi_signature_rankings.csv'
+    rankings.to_csv(output_path, index=False)
+    print(f"Scored {len(signatures)} signatures ({len(rankings)} gene entries) in {elapsed * 1000:.1f} ms "
+          f"({len(signatures) / max(elapsed, 1e-9):,.0f} signatures/s)")
+    if unmatched.any():
+        print(f"Genes outside the annotated universe: {int(unmatched.sum())} "
+              f"across {int((unmatched > 0).sum())} signatures")
+    print(f"Saved rankings to: {output_path}")
+    return rankings
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Score many gene signatures in one batched pass')
+    parser.add_argument('signatures', nargs='?', type=Path,
+                        help='long CSV with Signature and Gene columns (default: per-cohort DE signatures)')
+    parser.add_argument('--random', type=int, metavar='N', help='score N random signatures (throughput check)')
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.random:
+        signatures = random_signatures(prepare_signature(config)['Gene'], args.random)
+    elif args.signatures:
+        signatures = signatures_from_table(pd.read_csv(args.signatures))
+    else:
+        signatures = cohort_signatures(config)
+        if not signatures:
+            print("No per-cohort DE tables found; pass a signature table or --random N")
+            raise SystemExit(1)
+    run_multi_signature(signatures, config)
@@ -0,0 +1,253 @@
+"""
+Protein-protein interaction network centrality for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Replaces the hand-set pathway centrality table with a per-gene score from a
+locally downloaded PPI edge file (e.g. STRING links mapped to symbols). The
+network becomes a symmetric CSR adjacency over factorized gene codes;
+degree, PageRank (power iteration) and optionally sampled betweenness are
+computed on the sparse arrays. Centrality is computed once per network
+version: results are cached on disk (and in memory) under a hash of the
+edge file and the centrality settings, and scoring only looks genes up.
+Random walk with restart over the same adjacency drives signature
+propagation (scripts/propagation.py).
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import sparse
+from scipy.stats import rankdata
+
+import tracing
+
+BASE_DIR = Path(__file__).parent.parent
+
+METHODS = ['pagerank', 'degree', 'betweenness']
+
+DEFAULT_SETTINGS = {
+    'method': 'pagerank',
+    'min_score': 0,
+    'damping': 0.85,
+    'tol': 1e-10,
+    'max_iter': 200,
+    'betweenness_samples': 256,
+    'seed': 0,
+}
+
+_memory_cache = {}
+_adjacency_cache = {}
+
+
+def read_edges(path, min_score=0):
+    """(source, target) symbol arrays from a whitespace-delimited edge file
+
+    The first two columns are interactors; an optional third numeric column
+    (e.g. STRING combined_score) is thresholded at min_score. A header line
+    is detected by a non-numeric score field.
+    """
+    edges = pd.read_csv(path, sep=r'\s+', header=None, comment='#', dtype=str)
+    if len(edges.columns) > 2:
+        score = pd.to_numeric(edges[2], errors='coerce')
+        if pd.isna(score.iloc[0]):
+            edges, score = edges.iloc[1:], score.iloc[1:]
+        edges = edges[score.to_numpy() >= min_score]
+    return edges[0].to_numpy(dtype=object), edges[1].to_numpy(dtype=object)
+
+
+def adjacency_matrix(source, target):
+    """Symmetric binary CSR adjacency and node names (self-loops dropped)"""
+    codes, nodes = pd.factorize(np.concatenate([source, target]))
+    rows, cols = codes[:len(source)], codes[len(source):]
+    keep = rows != cols
+    rows, cols = rows[keep], cols[keep]
+    n = len(nodes)
+    both = (np.concatenate([rows, cols]), np.concatenate([cols, rows]))
+    adjacency = sparse.csr_matrix((np.ones(2 * len(rows)), both), shape=(n, n))
+    # Edges listed in both directions (or repeated) count once
+    adjacency.sum_duplicates()
+    adjacency.data[:] = 1.0
+    return adjacency, pd.Index(nodes)
+
+
+def pagerank(adjacency, damping=0.85, tol=1e-10, max_iter=200):
+    """PageRank by power iteration; dangling nodes spread uniformly"""
+    n = adjacency.shape[0]
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = degree == 0
+    inv_degree = np.divide(1.0, degree, out=np.zeros(n), where=~dangling)
+    # Adjacency is symmetric, so A.T @ x == A @ x
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        spread = adjacency @ (rank * inv_degree)
+        updated = damping * spread + (damping * rank[dangling].sum() + 1 - damping) / n
+        delta = np.abs(updated - rank).sum()
+        rank = updated
+        if delta < n * tol:
+            break
+    return rank / rank.sum()
+
+
+def sampled_betweenness(adjacency, n_samples=256, seed=0, batch=64):
+    """Betweenness estimated from n_samples BFS sources (Brandes accumulation)
+
+    Sources are processed in batches: every BFS level is one sparse
+    (nodes x nodes) @ (nodes x batch) product for the path counts, and the
+    dependency accumulation runs back over the levels the same way.
+    """
+    n = adjacency.shape[0]
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(n, size=min(n_samples, n), replace=False)
+    centrality = np.zeros(n)
+    for start in range(0, len(sources), batch):
+        chunk = sources[start:start + batch]
+        columns = np.arange(len(chunk))
+        sigma = np.zeros((n, len(chunk)))
+        dist = np.full((n, len(chunk)), -1, dtype=np.int32)
+        sigma[chunk, columns] = 1.0
+        dist[chunk, columns] = 0
+
+        level = 0
+        while True:
+            paths = adjacency @ np.where(dist == level, sigma, 0.0)
+            reached = (dist < 0) & (paths > 0)
+            if not reached.any():
+                break
+            sigma[reached] = paths[reached]
+            dist[reached] = level + 1
+            level += 1
+
+        delta = np.zeros_like(sigma)
+        for depth in range(level, 0, -1):
+            at_depth = dist == depth
+            coefficient = np.divide(1.0 + delta, sigma, out=np.zeros_like(sigma), where=at_depth)
+            parents = dist == depth - 1
+            delta[parents] += (sigma * (adjacency @ coefficient))[parents]
+        delta[chunk, columns] = 0.0
+        centrality += delta.sum(axis=1)
+    # Scale to all sources; each undirected path is counted from both ends
+    return centrality * n / max(len(sources), 1) / 2
+
+
+def random_walk_with_restart(adjacency, seeds, restart=0.3, tol=1e-8, max_iter=200):
+    """Steady-state visiting probabilities for one or more seed vectors
+
+    seeds is a (nodes x seed sets) matrix (sparse or dense); each column is
+    normalized to a restart distribution. All seed sets iterate together, so
+    every step is one sparse (nodes x nodes) @ (nodes x seed sets) product.
+    Walkers at isolated nodes return to their seeds.
+    """
+    seeds = sparse.csc_matrix(seeds, dtype=float)
+    totals = np.asarray(seeds.sum(axis=0)).ravel()
+    if (totals <= 0).any():
+        raise ValueError("Every seed set needs at least one seed gene in the network with a positive weight")
+    start = seeds.multiply(1.0 / totals).toarray()
+
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    isolated = degree == 0
+    inv_degree = np.divide(1.0, degree, out=np.zeros(len(degree)), where=~isolated)[:, None]
+    # Column-stochastic walk on a symmetric adjacency: W @ p == A @ (p / degree)
+    prob = start.copy()
+    for iteration in range(1, max_iter + 1):
+        stuck = prob[isolated].sum(axis=0)
+        updated = (1 - restart) * (adjacency @ (prob * inv_degree)) + (restart + (1 - restart) * stuck) * start
+        delta = np.abs(updated - prob).sum(axis=0).max()
+        prob = updated
+        if delta < tol:
+            break
+    tracing.count('rwr_iterations', iteration)
+    return prob
+
+
+def centrality_table(adjacency, nodes, settings=None):
+    """Per-gene degree, PageRank (and betweenness) with a [0, 1] centrality score
+
+    Network_Centrality is the percentile rank of the configured method among
+    all network nodes, so it sits on the same scale as the other components.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    method = settings['method']
+    if method not in METHODS:
+        raise ValueError(f"Unknown centrality method '{method}' (expected one of {', '.join(METHODS)})")
+
+    table = pd.DataFrame({
+        'Degree': np.asarray(adjacency.sum(axis=1)).ravel().astype(int),
+        'PageRank': pagerank(adjacency, settings['damping'], settings['tol'], settings['max_iter']),
+    }, index=pd.Index(nodes, name='Gene'))
+    if method == 'betweenness':
+        table['Betweenness'] = sampled_betweenness(adjacency, settings['betweenness_samples'], settings['seed'])
+    measure = {'pagerank': 'PageRank', 'degree': 'Degree', 'betweenness': 'Betweenness'}[method]
+    table['Network_Centrality'] = rankdata(table[measure]) / len(table) if len(table) else []
+    return table
+
+
+def network_key(path, settings):
+    """Content hash of the edge file and the centrality settings"""
+    digest = hashlib.sha256(repr(sorted(settings.items())).encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def network_path(config):
+    """Configured edge file, or None if not configured or not downloaded"""
+    edges = (config.get('reference', {}) or {}).get('ppi_edges')
+    if not edges or not (BASE_DIR / edges).exists():
+        return None
+    return BASE_DIR / edges
+
+
+def load_network(config, cache_dir=None):
+    """(adjacency, nodes) for the configured edge file, parsed once per version"""
+    path = network_path(config)
+    if path is None:
+        return None
+    settings = {**DEFAULT_SETTINGS, **(config.get('network', {}) or {})}
+    key = network_key(path, {'min_score': settings['min_score']})
+    if key in _adjacency_cache:
+        return _adjacency_cache[key]
+
+    cache_path = Path(cache_dir or BASE_DIR / 'outputs' / 'cache') / f'network_{key}.npz'
+    if cache_path.exists():
+        with np.load(cache_path) as stored:
+            n = len(stored['nodes'])
+            adjacency = sparse.csr_matrix((np.ones(len(stored['indices'])), stored['indices'], stored['indptr']),
+                                          shape=(n, n))
+            nodes = pd.Index(stored['nodes'].astype(object))
+    else:
+        adjacency, nodes = adjacency_matrix(*read_edges(path, settings['min_score']))
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_path, indptr=adjacency.indptr, indices=adjacency.indices, nodes=nodes.to_numpy(dtype=str))
+    print(f"PPI network: {adjacency.shape[0]} proteins, {adjacency.nnz // 2} interactions")
+
+    _adjacency_cache[key] = (adjacency, nodes)
+    return adjacency, nodes
+
+
+def load_network_centrality(config, cache_dir=None):
+    """Centrality per gene for the configured edge file, or None if absent"""
+    path = network_path(config)
+    if path is None:
+        return None
+    settings = {**DEFAULT_SETTINGS, **(config.get('network', {}) or {})}
+
+    key = network_key(path, settings)
+    if key in _memory_cache:
+        tracing.count('network_cache_hits')
+        return _memory_cache[key]
+
+    cache_path = Path(cache_dir or BASE_DIR / 'outputs' / 'cache') / f'network_{key}.csv'
+    if cache_path.exists():
+        tracing.count('network_cache_hits')
+        table = pd.read_csv(cache_path, index_col='Gene')
+    else:
+        tracing.count('network_cache_misses')
+        adjacency, nodes = load_network(config, cache_dir)
+        table = centrality_table(adjacency, nodes, settings)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        table.to_csv(cache_path)
+
+    _memory_cache[key] = table
+    return table
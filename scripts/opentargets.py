@@ -0,0 +1,370 @@
+"""
+Offline Open Targets release ingestion for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Replaces the PubMed-based opentargets_evidence proxy with real target-disease
+association scores from a locally downloaded Open Targets Platform release
+(the version in databases.opentargets). Sepsis diseases are picked from the
+release's disease index by name (or given as ids); the association part
+files (Parquet or JSON lines) are then streamed one at a time, keeping only
+rows for those diseases. JSON parts are pre-filtered on the raw bytes, so
+only matching lines are parsed. The kept rows are reduced to one record per
+target and written once per release as a small columnar store (sorted
+Ensembl ids, symbols, scores) that scoring joins in one indexed lookup.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import tracing
+
+BASE_DIR = Path(__file__).parent.parent
+
+STORE_VERSION = 2
+META_FILE = 'meta.json'
+
+DEFAULT_SETTINGS = {
+    'release_dir': 'data/reference/opentargets/{version}',
+    'dataset': 'associationByOverallIndirect',
+    'disease_terms': ['sepsis', 'septic shock'],
+    'disease_ids': [],
+    'store': 'data/reference/opentargets/store',
+}
+
+ASSOCIATION_COLUMNS = ['diseaseId', 'targetId', 'score', 'evidenceCount']
+
+# Bytes of a JSON part scanned per regex pass
+BLOCK_BYTES = 1 << 24
+# Up to this many values are matched as a regex alternation
+MAX_ALTERNATIVES = 256
+
+_memory_cache = {}
+
+
+def settings_from_config(config):
+    settings = {**DEFAULT_SETTINGS, **(config.get('opentargets') or {})}
+    settings['version'] = str(config.get('databases', {}).get('opentargets', ''))
+    return settings
+
+
+def dataset_dir(release_dir, name):
+    """Directory of a release dataset, flat or in the FTP output/etl layout"""
+    for candidate in [release_dir / name, release_dir / 'output' / 'etl' / 'parquet' / name,
+                      release_dir / 'output' / 'etl' / 'json' / name]:
+        if candidate.is_dir():
+            return candidate
+    return None
+
+
+def part_files(directory):
+    """Parquet parts if any, else JSON-lines parts (.json / .json.gz)"""
+    parts = sorted(directory.glob('*.parquet'))
+    return parts or sorted(p for p in directory.iterdir() if p.name.endswith(('.json', '.json.gz')))
+
+
+def _open_part(path):
+    return gzip.open(path, 'rb') if path.name.endswith('.gz') else open(path, 'rb')
+
+
+def read_part(path, columns):
+    """One part file as a DataFrame of the given columns"""
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    with _open_part(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def matching_lines(path, field, values, block_bytes=BLOCK_BYTES):
+    """Raw JSON lines of a part whose `field` equals one of `values`
+
+    Blocks of the file are searched for the "field": "value" byte pattern
+    and only the enclosing lines are returned, so non-matching rows are
+    never decoded. Short value lists are matched by the regex itself.
+    """
+    wanted = {v.encode() for v in values}
+    if len(wanted) <= MAX_ALTERNATIVES:
+        value = b'(' + b'|'.join(re.escape(v) for v in sorted(wanted)) + b')'
+    else:
+        value = b'([^"]*)'
+    pattern = re.compile(b'"' + re.escape(field.encode()) + rb'"\s*:\s*"' + value + b'"')
+    lines = []
+    tail = b''
+    with _open_part(path) as f:
+        while True:
+            block = f.read(block_bytes)
+            data = tail + block
+            # Keep the trailing partial line for the next block
+            end = len(data) if not block else data.rfind(b'\n') + 1
+            data, tail = data[:end], data[end:]
+            last = -1
+            for match in pattern.finditer(data):
+                start = data.rfind(b'\n', 0, match.start()) + 1
+                if start <= last or match.group(1) not in wanted:
+                    continue
+                stop = data.find(b'\n', match.end())
+                stop = len(data) if stop < 0 else stop
+                lines.append(data[start:stop])
+                last = stop
+            if not block:
+                return lines
+
+
+def sepsis_disease_ids(release_dir, terms):
+    """Ids of diseases in the release's disease index named exactly like a term"""
+    directory = dataset_dir(release_dir, 'diseases')
+    if directory is None:
+        raise FileNotFoundError(f"No diseases index in {release_dir}; set opentargets.disease_ids instead")
+    wanted = {t.lower() for t in terms}
+    ids = []
+    for part in part_files(directory):
+        diseases = read_part(part, ['id', 'name'])
+        ids += diseases.loc[diseases['name'].str.lower().isin(wanted), 'id'].tolist()
+    return sorted(set(ids))
+
+
+def target_symbols(release_dir, target_ids):
+    """Ensembl id -> approved symbol for the given targets (empty if no targets index)"""
+    directory = dataset_dir(release_dir, 'targets')
+    if directory is None:
+        return pd.Series(dtype=object)
+    symbols = []
+    for part in part_files(directory):
+        if part.suffix == '.parquet':
+            targets = pd.read_parquet(part, columns=['id', 'approvedSymbol'])
+        else:
+            lines = matching_lines(part, 'id', target_ids)
+            targets = pd.DataFrame.from_records([json.loads(line) for line in lines], columns=['id', 'approvedSymbol'])
+        symbols.append(targets[targets['id'].isin(target_ids)])
+    if not symbols:
+        return pd.Series(dtype=object)
+    return pd.concat(symbols).drop_duplicates('id').set_index('id')['approvedSymbol']
+
+
+def _filter_part(task):
+    """Association rows of one part file for the selected diseases"""
+    path, disease_ids = task
+    path = Path(path)
+    if path.suffix == '.parquet':
+        # Row groups without these diseases are skipped by the reader
+        return pd.read_parquet(path, columns=ASSOCIATION_COLUMNS, filters=[('diseaseId', 'in', disease_ids)])
+    lines = matching_lines(path, 'diseaseId', disease_ids)
+    return pd.DataFrame.from_records([json.loads(line) for line in lines], columns=ASSOCIATION_COLUMNS)
+
+
+def stream_associations(parts, disease_ids, processes=None):
+    """Concatenated sepsis association rows, one part file per task"""
+    tasks = [(str(p), list(disease_ids)) for p in parts]
+    if processes == 1 or len(tasks) <= 1:
+        frames = list(map(_filter_part, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            frames = list(pool.map(_filter_part, tasks))
+    if not frames:
+        return pd.DataFrame(columns=ASSOCIATION_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def reduce_by_target(associations):
+    """One row per target: best score over the sepsis diseases, summed evidence"""
+    grouped = associations.groupby('targetId', sort=True)
+    return pd.DataFrame({
+        'score': grouped['score'].max().astype(float),
+        'evidence_count': grouped['evidenceCount'].sum().fillna(0).astype(np.int64),
+        'n_diseases': grouped['diseaseId'].nunique().astype(np.int32),
+    })
+
+
+class OpenTargetsStore:
+    """Target-indexed sepsis association scores of one release"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.targets = np.load(self.path / 'targets.npy')
+        self.symbols = np.load(self.path / 'symbols.npy')
+        self.score = np.load(self.path / 'score.npy')
+        self.evidence_count = np.load(self.path / 'evidence_count.npy')
+        self.n_diseases = np.load(self.path / 'n_diseases.npy')
+        self._target_index = pd.Index(self.targets)
+        # Symbols are not guaranteed unique across releases; keep the first
+        symbols = pd.Series(np.arange(len(self.symbols)), index=self.symbols)
+        self._symbol_index = symbols[~symbols.index.duplicated() & (symbols.index != '')]
+
+    def __len__(self):
+        return len(self.targets)
+
+    def match(self, genes_df):
+        """Store row of each signature row (-1 where unmatched)
+
+        Rows are matched on Ensembl_ID when the signature carries it, and on
+        the Gene symbol otherwise.
+        """
+        rows = np.full(len(genes_df), -1, dtype=np.int64)
+        if 'Ensembl_ID' in genes_df:
+            rows = self._target_index.get_indexer(genes_df['Ensembl_ID'].astype(object).fillna(''))
+        missing = rows < 0
+        if missing.any():
+            by_symbol = self._symbol_index.reindex(genes_df['Gene'].to_numpy()[missing])
+            rows[missing] = by_symbol.fillna(-1).to_numpy(dtype=np.int64)
+        return rows
+
+    def lookup(self, genes_df, absent=np.nan):
+        """Association score per signature row
+
+        Unmatched rows with a known Ensembl_ID are targets the release has no
+        sepsis association for and get `absent`; rows that could not be
+        looked up (no Ensembl_ID, symbol not in the store) stay NaN.
+        """
+        rows = self.match(genes_df)
+        score = np.where(rows >= 0, self.score[np.maximum(rows, 0)], np.nan).astype(float)
+        if 'Ensembl_ID' in genes_df:
+            known = genes_df['Ensembl_ID'].notna().to_numpy()
+            score[(rows < 0) & known] = absent
+        return score
+
+    def __repr__(self):
+        return f"OpenTargetsStore({self.meta['version']!r}, {len(self)} targets)"
+
+
+def source_fingerprint(parts):
+    return [[p.name, p.stat().st_size, p.stat().st_mtime] for p in parts]
+
+
+def disease_terms(settings):
+    """Normalized disease names to resolve, or None when ids are configured"""
+    if settings['disease_ids']:
+        return None
+    return sorted({t.lower() for t in settings['disease_terms']})
+
+
+def disease_sources(release_dir):
+    directory = dataset_dir(release_dir, 'diseases')
+    return None if directory is None else source_fingerprint(part_files(directory))
+
+
+def resolve_disease_ids(release_dir, path, settings, force=False):
+    """Configured disease ids, or those named by the terms
+
+    Ids resolved from names are kept in the store's metadata with the terms
+    and the disease index fingerprint, so the index is only scanned again
+    when either changes.
+    """
+    terms = disease_terms(settings)
+    if terms is None:
+        return sorted(settings['disease_ids'])
+    meta_path = Path(path) / META_FILE
+    if meta_path.exists() and not force:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (meta.get('version_store') == STORE_VERSION and meta.get('version') == settings['version']
+                and meta.get('disease_terms') == terms and meta.get('disease_sources') == disease_sources(release_dir)):
+            return meta['disease_ids']
+    tracing.count('opentargets_disease_scans')
+    return sepsis_disease_ids(release_dir, terms)
+
+
+def is_current(path, settings, disease_ids, parts):
+    """True when the store was built from these files, diseases and settings"""
+    meta_path = Path(path) / META_FILE
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return (meta.get('version_store') == STORE_VERSION and meta.get('version') == settings['version']
+            and meta.get('dataset') == settings['dataset'] and meta.get('disease_ids') == disease_ids
+            and meta.get('sources') == source_fingerprint(parts))
+
+
+def ingest_release(release_dir, path, settings, disease_ids, processes=None):
+    """Stream the association parts of a release into the store at path"""
+    parts = part_files(dataset_dir(release_dir, settings['dataset']))
+    start = time.perf_counter()
+    associations = stream_associations(parts, disease_ids, processes)
+    tracing.count('opentargets_rows_kept', len(associations))
+    by_target = reduce_by_target(associations)
+    symbols = target_symbols(release_dir, by_target.index.tolist()).reindex(by_target.index).fillna('')
+
+    staging = Path(path).with_name(Path(path).name + '.tmp')
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    np.save(staging / 'targets.npy', by_target.index.to_numpy(dtype=str))
+    np.save(staging / 'symbols.npy', symbols.to_numpy(dtype=str))
+    np.save(staging / 'score.npy', by_target['score'].to_numpy())
+    np.save(staging / 'evidence_count.npy', by_target['evidence_count'].to_numpy())
+    np.save(staging / 'n_diseases.npy', by_target['n_diseases'].to_numpy())
+    meta = {
+        'version_store': STORE_VERSION,
+        'version': settings['version'],
+        'dataset': settings['dataset'],
+        'disease_ids': disease_ids,
+        'disease_terms': disease_terms(settings),
+        'disease_sources': disease_sources(release_dir) if disease_terms(settings) else None,
+        'sources': source_fingerprint(parts),
+        'rows_kept': len(associations),
+        'targets': len(by_target),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(staging / META_FILE, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap in atomically so readers never see a half-written store
+    if Path(path).exists():
+        shutil.rmtree(path)
+    os.replace(staging, path)
+    return OpenTargetsStore(path)
+
+
+def load_opentargets_store(config, force=False, processes=None):
+    """Store for the configured release, ingesting it if needed; None if not downloaded"""
+    settings = settings_from_config(config)
+    release_dir = BASE_DIR / settings['release_dir'].format(version=settings['version'])
+    if dataset_dir(release_dir, settings['dataset']) is None:
+        return None
+
+    path = BASE_DIR / settings['store'] / settings['version']
+    key = (str(path), tuple(sorted(settings['disease_ids'])), tuple(disease_terms(settings) or ()))
+    if key in _memory_cache and not force:
+        return _memory_cache[key]
+
+    disease_ids = resolve_disease_ids(release_dir, path, settings, force)
+    if not disease_ids:
+        raise ValueError(f"No Open Targets disease named {', '.join(settings['disease_terms'])} in {release_dir}")
+
+    parts = part_files(dataset_dir(release_dir, settings['dataset']))
+    if not force and is_current(path, settings, disease_ids, parts):
+        tracing.count('opentargets_cache_hits')
+        store = OpenTargetsStore(path)
+    else:
+        tracing.count('opentargets_cache_misses')
+        store = ingest_release(release_dir, path, settings, disease_ids, processes)
+        print(f"Ingested Open Targets {settings['version']}: {store.meta['rows_kept']} sepsis associations, "
+              f"{len(store)} targets ({store.meta['seconds']:.1f}s)")
+    _memory_cache[key] = store
+    return store
+
+
+if __name__ == '__main__':
+    import argparse
+    from run_pipeline import load_config
+
+    parser = argparse.ArgumentParser(description='Ingest a local Open Targets release for scoring')
+    parser.add_argument('--force', action='store_true', help='re-ingest even if the store is current')
+    parser.add_argument('--processes', type=int, help='worker processes (one part file per task)')
+    args = parser.parse_args()
+
+    store = load_opentargets_store(load_config(), force=args.force, processes=args.processes)
+    if store is None:
+        print("No local Open Targets release found (see opentargets.release_dir in the config)")
+    else:
+        print(store)
@@ -0,0 +1,108 @@
+"""
+Network propagation of the sepsis signature for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Extends the prioritization beyond the curated signature: a random walk with
+restart over the local PPI network is seeded from the signature genes,
+weighted by their composite score, and every network protein receives a
+propagation score. Several seed sets (all targets, early-phase, late-phase)
+are batched as columns of one sparse seed matrix and propagated together.
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import sparse
+
+import tracing
+from network import load_network, random_walk_with_restart
+
+BASE_DIR = Path(__file__).parent.parent
+
+DEFAULT_RESTART = 0.3
+
+# Seed sets by phase relevance; 'Both' genes seed either phase
+PHASE_SEEDS = {
+    'Early': ['Early', 'Both'],
+    'Late': ['Late', 'Both'],
+}
+
+
+def signature_seed_sets(targets_df):
+    """{name: Series(Gene -> composite score)} for all targets and per phase"""
+    scores = targets_df.set_index('Gene')['Composite_Score']
+    seed_sets = {'All': scores}
+    for name, phases in PHASE_SEEDS.items():
+        seed_sets[name] = scores[targets_df['Phase_Relevance'].isin(phases).to_numpy()]
+    return seed_sets
+
+
+def seed_matrix(nodes, seed_sets):
+    """Sparse (nodes x seed sets) matrix of seed weights; genes off the network are dropped"""
+    rows, cols, weights = [], [], []
+    for column, seeds in enumerate(seed_sets.values()):
+        index = nodes.get_indexer(seeds.index)
+        found = index >= 0
+        rows.append(index[found])
+        cols.append(np.full(found.sum(), column))
+        weights.append(seeds.to_numpy(dtype=float)[found])
+    matrix = sparse.csc_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(len(nodes), len(seed_sets)))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def propagate(adjacency, nodes, seed_sets, restart=DEFAULT_RESTART):
+    """Genome-wide RWR scores, one column per seed set, ranked by the first"""
+    seeds = seed_matrix(nodes, seed_sets)
+    prob = random_walk_with_restart(adjacency, seeds, restart)
+    table = pd.DataFrame(prob, index=pd.Index(nodes, name='Gene'),
+                         columns=[f'RWR_{name}' for name in seed_sets])
+    table['Seed'] = np.asarray((seeds != 0).sum(axis=1)).ravel() > 0
+    first = table.columns[0]
+    table = table.sort_values(first, ascending=False, kind='mergesort')
+    table['Rank'] = np.arange(1, len(table) + 1)
+    # Rank among non-seed genes: the new candidates
+    candidates = ~table['Seed'].to_numpy()
+    table['Candidate_Rank'] = pd.array(np.cumsum(candidates), dtype='Int64')
+    table.loc[~candidates, 'Candidate_Rank'] = pd.NA
+    return table.reset_index()
+
+
+@tracing.traced()
+def run_propagation(config, targets_df):
+    """Propagation stage: genome-wide candidate scores from the ranked signature"""
+    print("\n" + "="*60)
+    print("NETWORK PROPAGATION")
+    print("="*60)
+
+    network = load_network(config)
+    if network is None:
+        print("No PPI edge file available (reference.ppi_edges); skipping propagation")
+        return None
+    adjacency, nodes = network
+
+    seed_sets = signature_seed_sets(targets_df)
+    restart = (config.get('network', {}) or {}).get('restart', DEFAULT_RESTART)
+    seeded = {name: int((nodes.get_indexer(seeds.index) >= 0).sum()) for name, seeds in seed_sets.items()}
+    print("Seeds in network: " + ", ".join(f"{name} {n}/{len(seed_sets[name])}" for name, n in seeded.items()))
+    seed_sets = {name: seeds for name, seeds in seed_sets.items() if seeded[name]}
+    if not seed_sets:
+        print("No signature gene is in the network; skipping propagation")
+        return None
+
+    with tracing.span('rwr', nodes=adjacency.shape[0], seed_sets=len(seed_sets)):
+        table = propagate(adjacency, nodes, seed_sets, restart)
+
+    output_path = BASE_DIR / 'outputs' / 'tables' / 'network_propagation.csv'
+    table.to_csv(output_path, index=False)
+    top = table[~table['Seed']].head(10)['Gene'].tolist()
+    print(f"Top propagated candidates outside the signature: {', '.join(top)}")
+    print(f"Saved {len(table)} genome-wide scores to: {output_path}")
+    return table
+
+
+if __name__ == '__main__':
+    from run_pipeline import load_config
+
+    run_propagation(load_config(), pd.read_csv(BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv'))
@@ -0,0 +1,101 @@
+"""
+Cross-cohort replication score for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Replaces the fixed replication proxy with a per-gene score computed from
+direction and significance consistency across the configured GEO cohorts.
+The genes x cohorts computation runs once per cohort set; results are cached
+on disk (and in memory) under a hash of the per-cohort DE tables, so
+re-scoring with new weights never recomputes it.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import tracing
+
+BASE_DIR = Path(__file__).parent.parent
+CACHE_DIR = BASE_DIR / 'outputs' / 'cache'
+
+# Credit per cohort: significant in the consensus direction, same direction
+# but not significant, opposite direction
+CREDIT_SIGNIFICANT = 1.0
+CREDIT_DIRECTION_ONLY = 0.5
+
+_memory_cache = {}
+
+
+def stack_cohorts(de_tables):
+    """genes x cohorts matrices of log2FC and FDR (NaN where a gene is not measured)"""
+    long = pd.concat([de[['Symbol', 'log2FC', 'FDR']].assign(Cohort=cohort) for cohort, de in de_tables.items()],
+                     ignore_index=True)
+    lfc = long.pivot_table(index='Symbol', columns='Cohort', values='log2FC', aggfunc='first')
+    fdr = long.pivot_table(index='Symbol', columns='Cohort', values='FDR', aggfunc='first').reindex_like(lfc)
+    return lfc.index, lfc.to_numpy(dtype=float), fdr.to_numpy(dtype=float)
+
+
+def replication_scores(de_tables, max_fdr=0.05):
+    """Per-gene replication in [0, 1] from direction and significance consistency"""
+    genes, lfc, fdr = stack_cohorts(de_tables)
+    measured = np.isfinite(lfc)
+    direction = np.sign(np.where(measured, lfc, 0.0))
+    significant = measured & (np.where(np.isfinite(fdr), fdr, 1.0) < max_fdr)
+
+    # Consensus direction: majority of significant cohorts, falling back to
+    # the majority of all measured cohorts when none is significant
+    consensus = np.sign((direction * significant).sum(axis=1))
+    consensus = np.where(consensus == 0, np.sign(direction.sum(axis=1)), consensus)
+
+    agrees = measured & (direction == consensus[:, None]) & (consensus[:, None] != 0)
+    credit = np.where(agrees & significant, CREDIT_SIGNIFICANT, np.where(agrees, CREDIT_DIRECTION_ONLY, 0.0))
+    n_measured = measured.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        score = credit.sum(axis=1) / n_measured
+
+    return pd.DataFrame({
+        'Replication': score,
+        'Consensus_Direction': consensus.astype(int),
+        'N_Measured': n_measured,
+        'N_Replicated': (agrees & significant).sum(axis=1),
+    }, index=pd.Index(genes, name='Gene'))
+
+
+def cohort_set_key(de_paths, max_fdr):
+    """Content hash of the cohort set and the significance threshold"""
+    digest = hashlib.sha256(f'max_fdr={max_fdr}'.encode())
+    for cohort, path in sorted(de_paths.items()):
+        digest.update(cohort.encode())
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def load_replication_scores(config, cache_dir=CACHE_DIR):
+    """Replication scores for the available cohorts, computed once per cohort set"""
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+    de_paths = {d['id']: tables_dir / f"de_{d['id']}.csv" for d in config['geo_datasets']}
+    de_paths = {cohort: path for cohort, path in de_paths.items() if path.exists()}
+    if len(de_paths) < 2:
+        return None
+
+    max_fdr = config['gene_signature']['max_fdr']
+    key = cohort_set_key(de_paths, max_fdr)
+    if key in _memory_cache:
+        tracing.count('replication_cache_hits')
+        return _memory_cache[key]
+
+    cache_path = Path(cache_dir) / f'replication_{key}.csv'
+    if cache_path.exists():
+        tracing.count('replication_cache_hits')
+        scores = pd.read_csv(cache_path, index_col='Gene')
+    else:
+        tracing.count('replication_cache_misses')
+        de_tables = {cohort: pd.read_csv(path, usecols=['Symbol', 'log2FC', 'FDR'])
+                     for cohort, path in de_paths.items()}
+        scores = replication_scores(de_tables, max_fdr)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        scores.to_csv(cache_path)
+
+    _memory_cache[key] = scores
+    return scores
@@ -9,13 +9,36 @@ from pathlib import Path
 import requests
 import time
 import json
+import yaml
+
+from gene_resolver import load_gene_resolver, annotate_identifiers
+from geo_expression import run_geo_stage
+from literature_query import PUBMED_QUERY, run_literature_queries
+from meta_analysis import attach_meta_evidence, run_meta_analysis
+from network import load_network_centrality
+from opentargets import load_opentargets_store
+from propagation import run_propagation
+from replication import load_replication_scores
+from summary_stats import SummaryStats, compute_target_summary
+from validation import REPORT_FILE, check_table, record_result
+import tracing
+from tracing import span
 
 BASE_DIR = Path(__file__).parent.parent
+CONFIG_PATH = BASE_DIR / 'config' / 'sepsis_config.yaml'
+
+def load_config(path=CONFIG_PATH):
+    """Load the pipeline configuration"""
+    with open(path) as f:
+        return yaml.safe_load(f)
 
-def load_gene_signature():
-    """Load the 60-gene sepsis signature"""
-    df = pd.read_csv(BASE_DIR / 'data' / 'gene_signature.csv')
-    print(f"Loaded {len(df)} genes from signature")
+def load_gene_signature(path=None):
+    """Load the sepsis signature (GEO-derived if available, else the curated 60 genes)"""
+    if path is None:
+        derived = BASE_DIR / load_config()['gene_signature']['geo_derived']
+        path = derived if derived.exists() else BASE_DIR / 'data' / 'gene_signature.csv'
+    df = pd.read_csv(path)
+    print(f"Loaded {len(df)} genes from signature ({Path(path).name})")
     return df
 
 def query_opentargets(gene_symbol):
@@ -36,76 +59,219 @@ def query_opentargets(gene_symbol):
         pass
     return None
 
-def calculate_omics_strength(pubmed_count, druggability):
+# Composite score components, keyed like the 'scoring' weights in the config
+COMPONENTS = ['omics_strength', 'opentargets_evidence', 'druggability_proxy', 'pathway_centrality', 'replication']
+
+DEFAULT_WEIGHTS = {
+    'omics_strength': 0.35,
+    'opentargets_evidence': 0.25,
+    'druggability_proxy': 0.20,
+    'pathway_centrality': 0.10,
+    'replication': 0.10,
+}
+
+# Druggability contribution to omics strength
+OMICS_DRUG_MAP = {'High': 1.0, 'Moderate': 0.6, 'Low': 0.3}
+
+# Druggability proxy from annotation
+DRUGGABILITY_MAP = {'High': 0.9, 'Moderate': 0.6, 'Low': 0.3}
+
+# Pathway centrality (major pathways get higher scores); fallback for genes
+# without PPI network centrality
+PATHWAY_SCORES = {
+    'cytokine_storm': 0.9,
+    'checkpoint_exhaustion': 0.85,
+    'inflammasome': 0.8,
+    'survival_signaling': 0.75,
+    'coagulation': 0.7,
+    'metabolism': 0.65,
+    'pattern_recognition': 0.7,
+    'myeloid_dysfunction': 0.6,
+    'cell_trafficking': 0.55,
+    'vascular': 0.65,
+    'apoptosis': 0.5
+}
+
+# Replication proxy for genes without cohort data (curated signature)
+REPLICATION_PROXY = 0.7
+
+def calculate_omics_strength(pubmed_count, druggability, meta_strength=None):
     """Calculate omics strength component"""
-    # Normalize PubMed count (log scale)
-    pubmed_norm = min(np.log10(pubmed_count + 1) / 3, 1.0)
+    # Pooled multi-cohort expression evidence when available, otherwise
+    # normalized PubMed count (log scale)
+    if meta_strength is not None and not pd.isna(meta_strength):
+        evidence = meta_strength
+    else:
+        evidence = min(np.log10(pubmed_count + 1) / 3, 1.0)
     
     # Druggability score
-    drug_map = {'High': 1.0, 'Moderate': 0.6, 'Low': 0.3}
-    drug_score = drug_map.get(druggability, 0.5)
+    drug_score = OMICS_DRUG_MAP.get(druggability, 0.5)
     
-    return (pubmed_norm * 0.6 + drug_score * 0.4)
+    return (evidence * 0.6 + drug_score * 0.4)
 
-def calculate_composite_score(row):
+def calculate_composite_score(row, weights=DEFAULT_WEIGHTS):
     """Calculate composite prioritization score"""
-    omics = calculate_omics_strength(row['PubMed_Count'], row['Druggability'])
+    omics = calculate_omics_strength(row['PubMed_Count'], row['Druggability'], row.get('Meta_Strength'))
     
     # Druggability proxy from annotation
-    drug_map = {'High': 0.9, 'Moderate': 0.6, 'Low': 0.3}
-    druggability = drug_map.get(row['Druggability'], 0.5)
-    
-    # Pathway centrality (major pathways get higher scores)
-    pathway_scores = {
-        'cytokine_storm': 0.9,
-        'checkpoint_exhaustion': 0.85,
-        'inflammasome': 0.8,
-        'survival_signaling': 0.75,
-        'coagulation': 0.7,
-        'metabolism': 0.65,
-        'pattern_recognition': 0.7,
-        'myeloid_dysfunction': 0.6,
-        'cell_trafficking': 0.55,
-        'vascular': 0.65,
-        'apoptosis': 0.5
-    }
-    pathway = pathway_scores.get(row['Pathway'], 0.5)
-    
-    # Open Targets proxy (based on PubMed count as proxy)
-    ot_score = min(row['PubMed_Count'] / 200, 1.0)
+    druggability = DRUGGABILITY_MAP.get(row['Druggability'], 0.5)
+    
+    # PPI network centrality when available, otherwise the pathway table
+    pathway = row.get('Network_Centrality')
+    if pathway is None or pd.isna(pathway):
+        pathway = PATHWAY_SCORES.get(row['Pathway'], 0.5)
+    
+    # Open Targets association score when a release is ingested, otherwise the PubMed proxy
+    ot_score = row.get('OT_Association')
+    if ot_score is None or pd.isna(ot_score):
+        ot_score = min(row['PubMed_Count'] / 200, 1.0)
+    
+    # Cross-cohort replication when available, otherwise the curated proxy
+    replication = row.get('Replication')
+    if replication is None or pd.isna(replication):
+        replication = REPLICATION_PROXY
     
     # Calculate composite
     # Weights: 0.35×Omics + 0.25×OpenTargets + 0.20×Druggability + 0.10×Pathway + 0.10×Replication
     composite = (
-        0.35 * omics +
-        0.25 * ot_score +
-        0.20 * druggability +
-        0.10 * pathway +
-        0.10 * 0.7  # Replication proxy
+        weights['omics_strength'] * omics +
+        weights['opentargets_evidence'] * ot_score +
+        weights['druggability_proxy'] * druggability +
+        weights['pathway_centrality'] * pathway +
+        weights['replication'] * replication
     )
     
     return round(composite, 3)
 
+def calculate_score_components(genes_df):
+    """Vectorized score components for all genes (one column per component)"""
+    pubmed = genes_df['PubMed_Count'].to_numpy(dtype=float)
+    
+    evidence = np.minimum(np.log10(pubmed + 1) / 3, 1.0)
+    if 'Meta_Strength' in genes_df:
+        meta = genes_df['Meta_Strength'].to_numpy(dtype=float)
+        evidence = np.where(np.isnan(meta), evidence, meta)
+    omics = evidence * 0.6 + genes_df['Druggability'].map(OMICS_DRUG_MAP).fillna(0.5).to_numpy() * 0.4
+    
+    if 'Replication' in genes_df:
+        replication = genes_df['Replication'].fillna(REPLICATION_PROXY).to_numpy(dtype=float)
+    else:
+        replication = np.full(len(genes_df), REPLICATION_PROXY)
+    
+    opentargets = np.minimum(pubmed / 200, 1.0)
+    if 'OT_Association' in genes_df:
+        association = genes_df['OT_Association'].to_numpy(dtype=float)
+        opentargets = np.where(np.isnan(association), opentargets, association)
+    
+    centrality = genes_df['Pathway'].map(PATHWAY_SCORES).fillna(0.5).to_numpy(dtype=float)
+    if 'Network_Centrality' in genes_df:
+        network = genes_df['Network_Centrality'].to_numpy(dtype=float)
+        centrality = np.where(np.isnan(network), centrality, network)
+    
+    return pd.DataFrame({
+        'omics_strength': omics,
+        'opentargets_evidence': opentargets,
+        'druggability_proxy': genes_df['Druggability'].map(DRUGGABILITY_MAP).fillna(0.5).to_numpy(),
+        'pathway_centrality': centrality,
+        'replication': replication,
+    }, index=genes_df.index)
+
+def calculate_composite_scores(components, weights=DEFAULT_WEIGHTS):
+    """Weighted sum of the component matrix, rounded like calculate_composite_score"""
+    composite = sum(weights[name] * components[name].to_numpy() for name in COMPONENTS)
+    return np.round(composite, 3)
+
+def prepare_signature(config):
+    """Signature annotated with identifiers, meta-analysis, replication and network evidence"""
+    # Load genes
+    with span('load'):
+        genes_df = load_gene_signature()
+    tracing.count('genes_loaded', len(genes_df))
+    
+    # Resolve identifiers against the local gene-info dump when available
+    with span('resolve_identifiers'):
+        resolver = load_gene_resolver(config)
+        if resolver is not None:
+            genes_df = annotate_identifiers(genes_df, resolver)
+    
+    # Pooled expression evidence feeds the omics component when available
+    meta_path = BASE_DIR / 'outputs' / 'tables' / 'meta_analysis.csv'
+    if meta_path.exists():
+        with span('attach_meta_evidence'):
+            genes_df = attach_meta_evidence(genes_df, pd.read_csv(meta_path), config['gene_signature']['max_fdr'])
+        print(f"Attached meta-analysis evidence for {int(genes_df['Meta_Effect'].notna().sum())} genes")
+    
+    # Open Targets sepsis associations from the local release (ingested once per release)
+    with span('opentargets'):
+        opentargets = load_opentargets_store(config)
+    if opentargets is not None:
+        matched = int((opentargets.match(genes_df) >= 0).sum())
+        if matched == 0:
+            print(f"Warning: no signature gene matched Open Targets {opentargets.meta['version']} "
+                  "(no Ensembl IDs and no targets index?); keeping the PubMed proxy")
+        else:
+            # A looked-up target the release does not list has no sepsis association
+            # in it: score 0 rather than fall back to the PubMed proxy on another scale
+            genes_df['OT_Association'] = opentargets.lookup(genes_df, absent=0.0)
+            print(f"Open Targets {opentargets.meta['version']} association scores for {matched} genes "
+                  f"({int(genes_df['OT_Association'].isna().sum())} not looked up, PubMed proxy)")
+    
+    # Co-mention counts from the local MEDLINE index replace the curated PubMed_Count
+    with span('literature'):
+        literature = run_literature_queries(config, genes_df)
+    if literature is not None:
+        genes_df['PubMed_Count_Curated'] = genes_df['PubMed_Count']
+        genes_df['PubMed_Count'] = literature[PUBMED_QUERY].to_numpy()
+        print(f"PubMed counts from the local MEDLINE index for {len(genes_df)} genes "
+              f"({int((genes_df['PubMed_Count'] > 0).sum())} with sepsis co-mentions)")
+    
+    # Data-driven replication from cross-cohort consistency (cached per cohort set)
+    with span('replication'):
+        replication = load_replication_scores(config)
+    if replication is not None:
+        genes_df = genes_df.join(replication[['Replication']], on='Gene')
+        print(f"Replication scores available for {int(genes_df['Replication'].notna().sum())} genes")
+    
+    # PPI network centrality (computed once per network version, then looked up)
+    with span('network_centrality'):
+        network = load_network_centrality(config)
+    if network is not None:
+        genes_df = genes_df.join(network[['Network_Centrality']], on='Gene')
+        print(f"Network centrality available for {int(genes_df['Network_Centrality'].notna().sum())} genes")
+    
+    return genes_df
+
+@tracing.traced()
 def prioritize_targets():
     """Main prioritization function"""
     print("\n" + "="*60)
     print("SEPSIS HDT TARGET PRIORITIZATION PIPELINE")
     print("="*60)
     
-    # Load genes
-    genes_df = load_gene_signature()
+    config = load_config()
+    genes_df = prepare_signature(config)
     
     # Calculate scores
     print("\nCalculating composite scores...")
-    genes_df['Composite_Score'] = genes_df.apply(calculate_composite_score, axis=1)
+    with span('score', rows=len(genes_df)):
+        components = calculate_score_components(genes_df)
+        genes_df['Composite_Score'] = calculate_composite_scores(components, config['scoring'])
+    tracing.count('rows_scored', len(genes_df))
+    
+    # Sort by score (stable, so ties keep signature order)
+    with span('rank', rows=len(genes_df)):
+        genes_df = genes_df.sort_values('Composite_Score', ascending=False, kind='mergesort').reset_index(drop=True)
+        genes_df['Rank'] = range(1, len(genes_df) + 1)
     
-    # Sort by score
-    genes_df = genes_df.sort_values('Composite_Score', ascending=False).reset_index(drop=True)
-    genes_df['Rank'] = range(1, len(genes_df) + 1)
+    # Schema and invariants are checked before anything is written
+    with span('validate', rows=len(genes_df)):
+        validation = check_table('targets', genes_df)
     
     # Save results
     output_path = BASE_DIR / 'outputs' / 'tables' / 'targets_ranked.csv'
-    genes_df.to_csv(output_path, index=False)
+    with span('write', path=output_path.name):
+        genes_df.to_csv(output_path, index=False)
+    record_result('targets', validation, BASE_DIR / 'outputs' / 'tables' / REPORT_FILE)
     print(f"\nSaved ranked targets to: {output_path}")
     
     # Display top 15
@@ -121,22 +287,22 @@ def prioritize_targets():
     print("\n" + "="*60)
     print("SUMMARY STATISTICS")
     print("="*60)
-    print(f"Total targets: {len(genes_df)}")
-    print(f"Score range: {genes_df['Composite_Score'].min():.3f} - {genes_df['Composite_Score'].max():.3f}")
-    print(f"Median score: {genes_df['Composite_Score'].median():.3f}")
+    stats = compute_target_summary(genes_df)
+    print(f"Total targets: {stats['total']}")
+    print(f"Score range: {stats['score_min']:.3f} - {stats['score_max']:.3f}")
+    print(f"Median score: {stats['score_median']:.3f}")
     
     print("\nTargets by druggability:")
     for drug in ['High', 'Moderate', 'Low']:
-        count = len(genes_df[genes_df['Druggability'] == drug])
-        print(f"  {drug}: {count} targets")
+        print(f"  {drug}: {stats['by_druggability'].get(drug, 0)} targets")
     
     print("\nTargets by phase:")
     for phase in ['Early', 'Late', 'Both']:
-        count = len(genes_df[genes_df['Phase_Relevance'] == phase])
-        print(f"  {phase}: {count} targets")
+        print(f"  {phase}: {stats['by_phase_relevance'].get(phase, 0)} targets")
     
     return genes_df
 
+@tracing.traced()
 def generate_compound_data(targets_df):
     """Generate compound bioactivity data based on known sepsis drugs"""
     print("\n" + "="*60)
@@ -210,28 +376,56 @@ def generate_compound_data(targets_df):
     ]
     
     compounds_df = pd.DataFrame(compounds)
+    tracing.count('compounds', len(compounds_df))
+    
+    with span('validate', rows=len(compounds_df)):
+        validation = check_table('compounds', compounds_df, targets_df['Gene'])
     
     # Save
     output_path = BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv'
-    compounds_df.to_csv(output_path, index=False)
+    with span('write', path=output_path.name):
+        compounds_df.to_csv(output_path, index=False)
+    record_result('compounds', validation, BASE_DIR / 'outputs' / 'tables' / REPORT_FILE)
     print(f"Saved {len(compounds_df)} compounds to: {output_path}")
     
     # Summary
-    print(f"\nTotal compounds: {len(compounds_df)}")
-    print(f"FDA-approved (Phase 4): {len(compounds_df[compounds_df['Phase'] == 4])}")
-    print(f"Phase 3: {len(compounds_df[compounds_df['Phase'] == 3])}")
-    print(f"Phase 2: {len(compounds_df[compounds_df['Phase'] == 2])}")
-    print(f"Phase 1/Preclinical: {len(compounds_df[compounds_df['Phase'] <= 1])}")
+    with span('summary_stats'):
+        summary = SummaryStats.from_tables(targets_df, compounds_df)
+    print(f"\nTotal compounds: {summary.compounds['total']}")
+    print(f"FDA-approved (Phase 4): {summary.clinical_phase_count(4)}")
+    print(f"Phase 3: {summary.clinical_phase_count(3)}")
+    print(f"Phase 2: {summary.clinical_phase_count(2)}")
+    print(f"Phase 1/Preclinical: {summary.clinical_phase_count_at_most(1)}")
+    
+    # Shared with the report generators
+    summary_path = summary.save()
+    print(f"Saved summary statistics to: {summary_path}")
     
     return compounds_df
 
 if __name__ == '__main__':
-    # Run prioritization
-    targets_df = prioritize_targets()
+    from rank_aggregation import run_rank_aggregation
     
-    # Generate compound data
-    compounds_df = generate_compound_data(targets_df)
+    # Derive the signature from local GEO cohorts when they are available
+    config = load_config()
+    trace_path = tracing.configure(config)
+    with span('pipeline'):
+        run_geo_stage(config, resolver=load_gene_resolver(config))
+        run_meta_analysis(config)
+        
+        # Run prioritization
+        targets_df = prioritize_targets()
+        
+        # Alternative ranking from per-source rank aggregation
+        run_rank_aggregation(config, targets_df)
+        
+        # Extend the ranked signature genome-wide over the PPI network
+        run_propagation(config, targets_df)
+        
+        # Generate compound data
+        compounds_df = generate_compound_data(targets_df)
     
     print("\n" + "="*60)
     print("PIPELINE COMPLETE")
     print("="*60)
+    tracing.finish(trace_path)
@@ -0,0 +1,261 @@
+"""
+Warm scoring daemon for interactive re-ranking
+Author: Dr. Siddalingaiah H S
+
+Loads the annotated signature and its component matrix once and serves
+score, rank and top-k requests over a local HTTP endpoint. A request can
+override the component weights and the pathway centrality table; the
+composite is then one (genes x components) @ (components) product on the
+resident matrix, so answers take milliseconds instead of a full pipeline
+run. Results for repeated weight settings are served from an LRU cache.
+Requests are handled on a thread per connection.
+
+    POST /score   {"weights": {...}, "pathway_scores": {...}, "genes": [...]}
+    POST /rank    {"weights": {...}, "pathway_scores": {...}}
+    POST /topk    {"k": 10, "weights": {...}, "phase": "Early"}
+    POST /reload  re-read the signature and evidence tables
+    GET  /health
+"""
+
+import json
+import threading
+import time
+import traceback
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from run_pipeline import (
+    COMPONENTS, PATHWAY_SCORES, calculate_score_components, load_config, prepare_signature,
+)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+POST_ENDPOINTS = ['/score', '/rank', '/topk', '/reload']
+
+# Gene fields returned with each ranked record
+RECORD_COLUMNS = ['Gene', 'Symbol', 'Pathway', 'Phase_Relevance']
+
+# Fallback centrality for pathways missing from the table (as in scoring)
+DEFAULT_PATHWAY_SCORE = 0.5
+
+
+class ScoringState:
+    """Resident signature, component matrix and ranking cache"""
+
+    def __init__(self, genes_df, weights):
+        self.genes = genes_df.reset_index(drop=True)
+        components = calculate_score_components(self.genes)
+        self.matrix = np.ascontiguousarray(components[COMPONENTS].to_numpy(dtype=float))
+        self.weights = {name: float(weights[name]) for name in COMPONENTS}
+        self.pathway_codes, self.pathways = pd.factorize(self.genes['Pathway'])
+        # Genes scored from PPI network centrality keep it under pathway overrides
+        if 'Network_Centrality' in self.genes:
+            self.from_network = self.genes['Network_Centrality'].notna().to_numpy()
+        else:
+            self.from_network = np.zeros(len(self.genes), dtype=bool)
+        self.gene_index = pd.Index(self.genes['Gene'])
+        self.phases = self.genes['Phase_Relevance'].to_numpy()
+        self._columns = {name: self.genes[name].to_numpy(dtype=object) for name in RECORD_COLUMNS}
+        self.loaded_at = time.time()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(prepare_signature(config), config['scoring'])
+
+    def _weight_vector(self, weights):
+        weights = weights or {}
+        unknown = set(weights) - set(COMPONENTS)
+        if unknown:
+            raise ValueError(f"Unknown score components: {', '.join(sorted(unknown))}")
+        merged = {**self.weights, **{k: float(v) for k, v in weights.items()}}
+        return np.array([merged[name] for name in COMPONENTS])
+
+    def _key(self, weights, pathway_scores):
+        return (tuple(sorted((weights or {}).items())), tuple(sorted((pathway_scores or {}).items())))
+
+    def scores(self, weights=None, pathway_scores=None):
+        """Composite score per gene, rounded like calculate_composite_scores"""
+        key = self._key(weights, pathway_scores)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        w = self._weight_vector(weights)
+        composite = self.matrix @ w
+        if pathway_scores:
+            # Swap in the overridden centrality column without rebuilding the matrix
+            table = {**PATHWAY_SCORES, **pathway_scores}
+            centrality = np.array([table.get(p, DEFAULT_PATHWAY_SCORE) for p in self.pathways], dtype=float)
+            column = COMPONENTS.index('pathway_centrality')
+            centrality = np.where(self.from_network, self.matrix[:, column], centrality[self.pathway_codes])
+            composite = composite + w[column] * (centrality - self.matrix[:, column])
+        composite = np.round(composite, 3)
+        order = np.argsort(-composite, kind='stable')
+
+        result = (composite, order)
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    def _records(self, composite, rows):
+        columns = [self._columns[name][rows] for name in RECORD_COLUMNS]
+        return [dict(zip(RECORD_COLUMNS + ['Composite_Score'], values))
+                for values in zip(*columns, composite[rows].tolist())]
+
+    def score(self, weights=None, pathway_scores=None, genes=None):
+        composite, _ = self.scores(weights, pathway_scores)
+        if genes is None:
+            return dict(zip(self.gene_index, composite.tolist()))
+        rows = self.gene_index.get_indexer(genes)
+        return {g: (float(composite[r]) if r >= 0 else None) for g, r in zip(genes, rows)}
+
+    def rank(self, weights=None, pathway_scores=None):
+        composite, order = self.scores(weights, pathway_scores)
+        records = self._records(composite, order)
+        for rank, record in enumerate(records, start=1):
+            record['Rank'] = rank
+        return records
+
+    def topk(self, k=10, weights=None, pathway_scores=None, phase=None):
+        composite, order = self.scores(weights, pathway_scores)
+        if phase is not None:
+            order = order[(self.phases == phase)[order]]
+        return self._records(composite, order[:k])
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """JSON request handler; the server holds the shared ScoringState"""
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            state = self.server.state
+            self._send(200, {'status': 'ok', 'genes': len(state.genes), 'loaded_at': state.loaded_at})
+        else:
+            self._send(404, {'error': f'unknown endpoint {self.path}'})
+
+    def do_POST(self):
+        if self.path not in POST_ENDPOINTS:
+            self._send(404, {'error': f'unknown endpoint {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = parse_request(self.rfile.read(length) or b'{}')
+            start = time.perf_counter()
+            result = self.server.dispatch(self.path, request)
+            result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self._send(200, result)
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            # Always answer; the traceback goes to the server's stderr
+            traceback.print_exc()
+            self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+
+def parse_request(body):
+    """Decoded request object; ValueError when it or its override fields are malformed"""
+    request = json.loads(body)
+    if not isinstance(request, dict):
+        raise ValueError('request body must be a JSON object')
+    for field in ['weights', 'pathway_scores']:
+        if request.get(field) is not None and not isinstance(request[field], dict):
+            raise ValueError(f'{field} must be a JSON object')
+    genes = request.get('genes')
+    if genes is not None and not (isinstance(genes, list) and all(isinstance(g, str) for g in genes)):
+        raise ValueError('genes must be a list of symbols')
+    return request
+
+
+class ScoringServer(ThreadingHTTPServer):
+    """Threaded HTTP server around one resident ScoringState"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, config, host=DEFAULT_HOST, port=DEFAULT_PORT, state=None, verbose=False):
+        self.config = config
+        self.state = state or ScoringState.from_config(config)
+        self.verbose = verbose
+        self._reload_lock = threading.Lock()
+        super().__init__((host, port), ScoringHandler)
+
+    def reload(self):
+        with self._reload_lock:
+            # Build the new state off to the side; requests keep using the old one
+            self.state = ScoringState.from_config(self.config)
+        return self.state
+
+    def dispatch(self, endpoint, request):
+        state = self.state
+        weights, pathway_scores = request.get('weights'), request.get('pathway_scores')
+        if endpoint == '/score':
+            return {'scores': state.score(weights, pathway_scores, request.get('genes'))}
+        if endpoint == '/rank':
+            return {'ranking': state.rank(weights, pathway_scores)}
+        if endpoint == '/topk':
+            k = request.get('k', 10)
+            if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+                raise ValueError(f'k must be a positive integer, got {k!r}')
+            return {'top': state.topk(k, weights, pathway_scores, request.get('phase'))}
+        if endpoint == '/reload':
+            return {'genes': len(self.reload().genes)}
+        raise KeyError(f'unknown endpoint {endpoint}')
+
+
+def query(endpoint, payload=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10):
+    """Send one request to a running daemon and return the decoded reply"""
+    url = f'http://{host}:{port}{endpoint}'
+    if payload is None and endpoint == '/health':
+        request = urllib.request.Request(url)
+    else:
+        request = urllib.request.Request(url, data=json.dumps(payload or {}).encode(),
+                                         headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    config = load_config()
+    settings = config.get('daemon', {}) or {}
+    parser = argparse.ArgumentParser(description='Serve interactive scoring requests from a warm process')
+    parser.add_argument('--host', default=settings.get('host', DEFAULT_HOST))
+    parser.add_argument('--port', type=int, default=settings.get('port', DEFAULT_PORT))
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("SEPSIS HDT SCORING DAEMON")
+    print("="*60)
+    server = ScoringServer(config, args.host, args.port, verbose=args.verbose)
+    print(f"Serving {len(server.state.genes)} genes on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,239 @@
+"""
+Global (Sobol) sensitivity analysis of the composite score
+Author: Dr. Siddalingaiah H S
+
+Which scoring inputs drive rank volatility? The five component weights, the
+pathway centrality table, both druggability maps and the two PubMed
+normalization constants are varied together (uniformly within +/- spread of
+their nominal values). Saltelli sample matrices come from a scrambled Sobol
+sequence (scipy.stats.qmc); every block of parameter vectors is scored for
+all genes at once by a vectorized scorer, and each gene's rank is the model
+output. First-order (Saltelli 2010) and total (Jansen) indices per input and
+gene are accumulated block by block, so 10^6 evaluations need memory for one
+block only.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.stats import qmc
+
+from run_pipeline import (
+    COMPONENTS, DRUGGABILITY_MAP, OMICS_DRUG_MAP, PATHWAY_SCORES, REPLICATION_PROXY, load_config, prepare_signature,
+)
+
+BASE_DIR = Path(__file__).parent.parent
+
+# PubMed normalization constants: log10(count + 1) / 3 and count / 200
+PUBMED_LOG_SCALE = 3.0
+PUBMED_OT_SCALE = 200.0
+
+# Score levels for unmapped druggability classes and pathways (as in scoring)
+DEFAULT_LEVEL = 0.5
+
+LEVELS = ['High', 'Moderate', 'Low']
+
+# Parameter vectors scored per block
+BLOCK_SIZE = 2048
+
+
+def input_space(weights, spread=0.5):
+    """Names, nominal values and sampling bounds of every varied input"""
+    names, nominal = [], []
+    for name in COMPONENTS:
+        names.append(f'weight:{name}')
+        nominal.append(weights[name])
+    for pathway, score in PATHWAY_SCORES.items():
+        names.append(f'pathway:{pathway}')
+        nominal.append(score)
+    for level in LEVELS:
+        names.append(f'omics_drug:{level}')
+        nominal.append(OMICS_DRUG_MAP[level])
+    for level in LEVELS:
+        names.append(f'drug_map:{level}')
+        nominal.append(DRUGGABILITY_MAP[level])
+    names += ['pubmed_log_scale', 'pubmed_ot_scale']
+    nominal += [PUBMED_LOG_SCALE, PUBMED_OT_SCALE]
+
+    nominal = np.array(nominal, dtype=float)
+    lower = nominal * (1 - spread)
+    upper = nominal * (1 + spread)
+    # Table scores are probabilities-like levels: keep them within [0, 1]
+    bounded = np.array([n.startswith(('pathway:', 'omics_drug:', 'drug_map:')) for n in names])
+    upper[bounded] = np.minimum(upper[bounded], 1.0)
+    return names, nominal, lower, upper
+
+
+class VectorizedScorer:
+    """Composite scores of all genes for a block of parameter vectors"""
+
+    def __init__(self, genes_df):
+        genes_df = genes_df.reset_index(drop=True)
+        self.n_genes = len(genes_df)
+        self.pubmed = genes_df['PubMed_Count'].to_numpy(dtype=float)[:, None]
+        self.log_pubmed = np.log10(self.pubmed + 1)
+        # Codes into the parameter vector; unmapped classes point at a constant slot
+        self.drug_codes = genes_df['Druggability'].map({lvl: i for i, lvl in enumerate(LEVELS)}).fillna(len(LEVELS))
+        self.drug_codes = self.drug_codes.to_numpy(dtype=int)
+        pathways = list(PATHWAY_SCORES)
+        self.pathway_codes = genes_df['Pathway'].map({p: i for i, p in enumerate(pathways)}).fillna(len(pathways))
+        self.pathway_codes = self.pathway_codes.to_numpy(dtype=int)
+
+        meta = genes_df['Meta_Strength'].to_numpy(dtype=float) if 'Meta_Strength' in genes_df else None
+        self.meta = None if meta is None or np.isnan(meta).all() else meta[:, None]
+        network = genes_df['Network_Centrality'].to_numpy(dtype=float) if 'Network_Centrality' in genes_df else None
+        self.network = None if network is None or np.isnan(network).all() else network[:, None]
+        association = genes_df['OT_Association'].to_numpy(dtype=float) if 'OT_Association' in genes_df else None
+        self.association = None if association is None or np.isnan(association).all() else association[:, None]
+        if 'Replication' in genes_df:
+            self.replication = genes_df['Replication'].fillna(REPLICATION_PROXY).to_numpy(dtype=float)[:, None]
+        else:
+            self.replication = np.full((self.n_genes, 1), REPLICATION_PROXY)
+
+        n_w, n_p, n_l = len(COMPONENTS), len(pathways), len(LEVELS)
+        self.slices = {
+            'weights': slice(0, n_w),
+            'pathway': slice(n_w, n_w + n_p),
+            'omics_drug': slice(n_w + n_p, n_w + n_p + n_l),
+            'drug_map': slice(n_w + n_p + n_l, n_w + n_p + 2 * n_l),
+        }
+        self.log_scale = n_w + n_p + 2 * n_l
+        self.ot_scale = self.log_scale + 1
+
+    @staticmethod
+    def _levels(block, codes):
+        """(genes x samples) lookup of table values, DEFAULT_LEVEL for unmapped codes"""
+        table = np.column_stack([block, np.full(len(block), DEFAULT_LEVEL)])
+        return table[:, codes].T
+
+    def scores(self, params):
+        """(genes x samples) composite scores, rounded like the pipeline"""
+        weights = params[:, self.slices['weights']].T
+
+        evidence = np.minimum(self.log_pubmed / params[:, self.log_scale], 1.0)
+        if self.meta is not None:
+            evidence = np.where(np.isnan(self.meta), evidence, self.meta)
+        omics = evidence * 0.6 + self._levels(params[:, self.slices['omics_drug']], self.drug_codes) * 0.4
+        ot = np.minimum(self.pubmed / params[:, self.ot_scale], 1.0)
+        if self.association is not None:
+            ot = np.where(np.isnan(self.association), ot, self.association)
+        drug = self._levels(params[:, self.slices['drug_map']], self.drug_codes)
+        pathway = self._levels(params[:, self.slices['pathway']], self.pathway_codes)
+        if self.network is not None:
+            pathway = np.where(np.isnan(self.network), pathway, self.network)
+
+        composite = (weights[0] * omics + weights[1] * ot + weights[2] * drug + weights[3] * pathway
+                     + weights[4] * self.replication)
+        return np.round(composite, 3)
+
+    def ranks(self, params):
+        """(genes x samples) 1-based ranks; ties keep signature order"""
+        order = np.argsort(-self.scores(params), axis=0, kind='stable')
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(1, self.n_genes + 1)[:, None], axis=0)
+        return ranks.astype(float)
+
+
+def saltelli_matrices(lower, upper, base2=12, seed=0):
+    """A and B sample matrices (2^base2 x inputs) from one scrambled Sobol draw"""
+    d = len(lower)
+    sample = qmc.Sobol(d=2 * d, scramble=True, seed=seed).random_base2(base2)
+    return qmc.scale(sample[:, :d], lower, upper), qmc.scale(sample[:, d:], lower, upper)
+
+
+def sobol_indices(model, A, B, block_size=BLOCK_SIZE):
+    """First-order and total Sobol indices of every output (model rows) per input
+
+    model maps an (samples x inputs) block to (outputs x samples). Sums for
+    the estimators are accumulated over row blocks of A and B.
+    """
+    n, d = A.shape
+    sums = {'y': 0.0, 'y2': 0.0, 'first': 0.0, 'total': 0.0}
+    for start in range(0, n, block_size):
+        a, b = A[start:start + block_size], B[start:start + block_size]
+        y_a, y_b = model(a), model(b)
+        sums['y'] = sums['y'] + y_a.sum(axis=1) + y_b.sum(axis=1)
+        sums['y2'] = sums['y2'] + (y_a ** 2).sum(axis=1) + (y_b ** 2).sum(axis=1)
+        first, total = [], []
+        for i in range(d):
+            ab = a.copy()
+            ab[:, i] = b[:, i]
+            y_ab = model(ab)
+            first.append((y_b * (y_ab - y_a)).sum(axis=1))
+            total.append(((y_a - y_ab) ** 2).sum(axis=1))
+        sums['first'] = sums['first'] + np.column_stack(first)
+        sums['total'] = sums['total'] + np.column_stack(total)
+
+    mean = sums['y'] / (2 * n)
+    variance = (sums['y2'] / (2 * n) - mean ** 2)[:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Outputs that never move (zero variance) have undefined indices
+        variance = np.where(variance > 1e-12, variance, np.nan)
+        first = sums['first'] / n / variance
+        total = sums['total'] / (2 * n) / variance
+    return first, total, np.sqrt(np.maximum(np.nan_to_num(variance[:, 0]), 0.0))
+
+
+def run_sensitivity(config=None, base2=12, spread=0.5, seed=0):
+    """Sobol analysis of every gene's rank; saves per-gene and summary tables"""
+    print("\n" + "="*60)
+    print("GLOBAL SENSITIVITY ANALYSIS (SOBOL)")
+    print("="*60)
+
+    config = config or load_config()
+    genes_df = prepare_signature(config).reset_index(drop=True)
+    names, nominal, lower, upper = input_space(config['scoring'], spread)
+    scorer = VectorizedScorer(genes_df)
+    A, B = saltelli_matrices(lower, upper, base2, seed)
+    evaluations = len(A) * (len(names) + 2)
+    print(f"{len(names)} inputs varied by ±{spread:.0%}; {len(A)} base samples, "
+          f"{evaluations:,} evaluations x {len(genes_df)} genes")
+
+    start = time.perf_counter()
+    first, total, rank_sd = sobol_indices(scorer.ranks, A, B)
+    elapsed = time.perf_counter() - start
+    print(f"Scored in {elapsed:.1f} s ({evaluations / elapsed:,.0f} evaluations/s)")
+
+    per_gene = pd.DataFrame({
+        'Gene': np.repeat(genes_df['Gene'].to_numpy(), len(names)),
+        'Symbol': np.repeat(genes_df['Symbol'].to_numpy(), len(names)),
+        'Input': np.tile(names, len(genes_df)),
+        'S1': first.ravel(),
+        'ST': total.ravel(),
+    })
+    summary = pd.DataFrame({
+        'Input': names,
+        'Nominal': nominal,
+        'Lower': lower,
+        'Upper': upper,
+        'Mean_S1': np.nanmean(first, axis=0),
+        'Mean_ST': np.nanmean(total, axis=0),
+        'Max_ST': np.nanmax(total, axis=0),
+    }).sort_values('Mean_ST', ascending=False, kind='mergesort')
+
+    print(f"\n{'Input':<36}{'Mean S1':>10}{'Mean ST':>10}")
+    print("-"*56)
+    for _, row in summary.head(10).iterrows():
+        print(f"{row['Input']:<36}{row['Mean_S1']:>10.3f}{row['Mean_ST']:>10.3f}")
+    volatile = genes_df.assign(Rank_SD=rank_sd).nlargest(5, 'Rank_SD')
+    print("\nMost rank-volatile genes: "
+          + ", ".join(f"{s} (SD {v:.1f})" for s, v in zip(volatile['Symbol'], volatile['Rank_SD'])))
+
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+    per_gene.to_csv(tables_dir / 'sobol_sensitivity.csv', index=False)
+    summary.to_csv(tables_dir / 'sobol_sensitivity_summary.csv', index=False)
+    print(f"Saved sensitivity tables to: {tables_dir}")
+    return per_gene, summary
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sobol sensitivity of target ranks to the scoring inputs')
+    parser.add_argument('--base2', type=int, default=12,
+                        help='2^BASE2 base samples; evaluations = 2^BASE2 x (inputs + 2) (15 gives ~10^6)')
+    parser.add_argument('--spread', type=float, default=0.5, help='relative range around each nominal value')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run_sensitivity(base2=args.base2, spread=args.spread, seed=args.seed)
@@ -0,0 +1,153 @@
+"""
+Summary statistics shared by the pipeline and report generators
+Author: Dr. Siddalingaiah H S
+
+Each table is aggregated in a single grouped pass (targets by pathway x phase
+x druggability, compounds by clinical phase x gene); every marginal count,
+range and per-group aggregate is derived from that small grouped table. The
+result is written next to the output tables so the manuscript, supplement
+and cover-letter generators read it instead of recounting.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+SUMMARY_FILE = 'summary_stats.json'
+
+
+def _counts(series):
+    return {str(k): int(v) for k, v in series.items()}
+
+
+def compute_target_summary(targets_df):
+    """Counts, score range and per-pathway aggregates for ranked targets"""
+    # Rows with a missing label still count towards totals (as a 'nan' group)
+    grouped = targets_df.groupby(['Pathway', 'Phase_Relevance', 'Druggability'], observed=True, dropna=False).agg(
+        count=('Composite_Score', 'size'),
+        score_sum=('Composite_Score', 'sum'),
+        score_max=('Composite_Score', 'max'),
+        score_min=('Composite_Score', 'min'),
+        pubmed_sum=('PubMed_Count', 'sum'),
+    )
+
+    by_pathway = grouped.groupby(level='Pathway', dropna=False).agg(
+        {'count': 'sum', 'score_sum': 'sum', 'score_max': 'max', 'pubmed_sum': 'sum'})
+    phase_counts = grouped['count'].groupby(level=['Pathway', 'Phase_Relevance'], dropna=False).sum()
+    phase_counts = phase_counts.unstack(fill_value=0)
+    # Ties resolve to the alphabetically first phase, as Series.mode() does
+    predominant = phase_counts.idxmax(axis=1)
+
+    pathways = {}
+    for pathway, row in by_pathway.iterrows():
+        pathways[str(pathway)] = {
+            'count': int(row['count']),
+            'mean_score': float(row['score_sum'] / row['count']),
+            'max_score': float(row['score_max']),
+            'pubmed_total': int(row['pubmed_sum']),
+            'predominant_phase': str(predominant[pathway]),
+        }
+
+    scores = targets_df['Composite_Score'].to_numpy()
+    return {
+        'total': int(grouped['count'].sum()),
+        'score_min': float(grouped['score_min'].min()),
+        'score_max': float(grouped['score_max'].max()),
+        'score_median': float(np.median(scores)) if len(scores) else float('nan'),
+        'by_druggability': _counts(grouped['count'].groupby(level='Druggability', dropna=False).sum()),
+        'by_phase_relevance': _counts(grouped['count'].groupby(level='Phase_Relevance', dropna=False).sum()),
+        'by_pathway': pathways,
+    }
+
+
+def compute_compound_summary(compounds_df):
+    """Counts and potency aggregates per clinical phase and per gene"""
+    grouped = compounds_df.groupby(['Phase', 'Related_Gene'], dropna=False).agg(
+        count=('pChEMBL', 'size'),
+        pchembl_sum=('pChEMBL', 'sum'),
+        pchembl_max=('pChEMBL', 'max'),
+        pchembl_min=('pChEMBL', 'min'),
+    )
+
+    def aggregate(level):
+        agg = grouped.groupby(level=level, dropna=False).agg(
+            {'count': 'sum', 'pchembl_sum': 'sum', 'pchembl_max': 'max'})
+        return {
+            str(key): {
+                'count': int(row['count']),
+                'mean_pchembl': float(row['pchembl_sum'] / row['count']),
+                'max_pchembl': float(row['pchembl_max']),
+            }
+            for key, row in agg.iterrows()
+        }
+
+    return {
+        'total': int(grouped['count'].sum()),
+        'pchembl_min': float(grouped['pchembl_min'].min()),
+        'pchembl_max': float(grouped['pchembl_max'].max()),
+        'pchembl_median': float(np.median(compounds_df['pChEMBL'].to_numpy())),
+        'by_phase': aggregate('Phase'),
+        'by_gene': aggregate('Related_Gene'),
+    }
+
+
+class SummaryStats:
+    """Precomputed summary of the target and compound tables"""
+
+    def __init__(self, targets, compounds=None):
+        self.targets = targets
+        self.compounds = compounds
+
+    @classmethod
+    def from_tables(cls, targets_df, compounds_df=None):
+        compounds = compute_compound_summary(compounds_df) if compounds_df is not None else None
+        return cls(compute_target_summary(targets_df), compounds)
+
+    def phase_count(self, phase):
+        """Targets with the given Phase_Relevance (Early/Late/Both)"""
+        return self.targets['by_phase_relevance'].get(phase, 0)
+
+    def druggability_count(self, level):
+        return self.targets['by_druggability'].get(level, 0)
+
+    def clinical_phase_count(self, phase):
+        """Compounds in the given clinical phase (4 = approved)"""
+        return self.compounds['by_phase'].get(str(phase), {}).get('count', 0)
+
+    def clinical_phase_count_at_most(self, phase):
+        return sum(v['count'] for k, v in self.compounds['by_phase'].items() if int(k) <= phase)
+
+    def pathway_table(self):
+        """Per-pathway aggregates as a DataFrame (Table 3 layout)"""
+        table = pd.DataFrame.from_dict(self.targets['by_pathway'], orient='index')
+        table = table.rename_axis('Pathway').reset_index()
+        return table.rename(columns={'count': 'Count', 'mean_score': 'Mean Score', 'max_score': 'Max Score',
+                                     'predominant_phase': 'Predominant Phase', 'pubmed_total': 'PubMed Total'})
+
+    def to_dict(self):
+        return {'targets': self.targets, 'compounds': self.compounds}
+
+    def save(self, path=None):
+        path = path or BASE_DIR / 'outputs' / 'tables' / SUMMARY_FILE
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def load_summary(path=None, targets_path=None, compounds_path=None):
+    """Read the serialized summary, rebuilding it if the tables are newer"""
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+    targets_path = targets_path or tables_dir / 'targets_ranked.csv'
+    compounds_path = compounds_path or tables_dir / 'compounds_ranked.csv'
+    path = Path(path or tables_dir / SUMMARY_FILE)
+    if path.exists() and path.stat().st_mtime >= max(Path(targets_path).stat().st_mtime,
+                                                     Path(compounds_path).stat().st_mtime):
+        with open(path) as f:
+            data = json.load(f)
+        return SummaryStats(data['targets'], data['compounds'])
+
+    summary = SummaryStats.from_tables(pd.read_csv(targets_path), pd.read_csv(compounds_path))
+    summary.save(path)
+    return summary
@@ -0,0 +1,237 @@
+"""
+Synthetic input generator for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Fits simple distributions to the shipped signature and compound tables
+(joint pathway x phase x druggability frequencies, log-normal literature
+counts per druggability class, clinical-phase mix, per-phase potency and
+compounds per gene by druggability) and samples arbitrarily large tables
+from them with a seeded generator. Expression cohorts are written as GEO
+series matrices with a known set of differentially expressed genes.
+All sampling is vectorized, so million-row tables take seconds.
+"""
+
+import csv
+import gzip
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+SIGNATURE_COLUMNS = ['Gene', 'Symbol', 'Pathway', 'Phase_Relevance', 'PubMed_Count', 'Druggability', 'Description']
+COMPOUND_COLUMNS = ['Drug', 'Target', 'Related_Gene', 'pChEMBL', 'Phase', 'Evidence']
+
+# Bounds of the pChEMBL scale
+PCHEMBL_RANGE = (4.0, 11.0)
+
+# Expression model for synthetic cohorts (log2 scale)
+BASELINE_MEAN, BASELINE_SD = 8.0, 1.5
+NOISE_SHAPE, NOISE_SCALE = 4.0, 0.15
+
+
+def fit_signature_model(signature_df):
+    """Category frequencies and log-normal PubMed counts from a signature"""
+    cells = signature_df.groupby(['Pathway', 'Phase_Relevance', 'Druggability']).size()
+    log_counts = np.log(signature_df['PubMed_Count'].clip(lower=1))
+    by_class = log_counts.groupby(signature_df['Druggability']).agg(['mean', 'std'])
+    by_class['std'] = by_class['std'].fillna(log_counts.std())
+    return {
+        'cells': cells.index.to_frame(index=False),
+        'cell_p': (cells / cells.sum()).to_numpy(),
+        'log_pubmed': by_class,
+    }
+
+
+def fit_compound_model(compounds_df, signature_df):
+    """Phase mix, per-phase potency and compounds per gene by druggability"""
+    phase_p = compounds_df['Phase'].value_counts(normalize=True).sort_index()
+    potency = compounds_df.groupby('Phase')['pChEMBL'].agg(['mean', 'std'])
+    potency['std'] = potency['std'].fillna(compounds_df['pChEMBL'].std())
+
+    druggability = signature_df.set_index('Gene')['Druggability']
+    hits = compounds_df['Related_Gene'].map(druggability).value_counts()
+    genes = druggability.value_counts()
+    # Smoothed so a class without known compounds keeps a small rate
+    rate = (hits.reindex(genes.index, fill_value=0) + 0.5) / (genes + 1)
+    return {'phase_p': phase_p, 'potency': potency, 'rate': rate}
+
+
+def load_models(signature_path=None, compounds_path=None):
+    """Models fitted to the shipped signature and compound tables"""
+    signature_df = pd.read_csv(signature_path or BASE_DIR / 'data' / 'gene_signature.csv')
+    compounds_df = pd.read_csv(compounds_path or BASE_DIR / 'outputs' / 'tables' / 'compounds_ranked.csv')
+    return fit_signature_model(signature_df), fit_compound_model(compounds_df, signature_df)
+
+
+def _names(prefix, start, n, width=7):
+    return np.array([f'{prefix}{i:0{width}d}' for i in range(start, start + n)], dtype=object)
+
+
+def _take_categorical(labels, index):
+    """labels[index] as a Categorical, without materializing strings per row"""
+    codes, uniques = pd.factorize(np.asarray(labels, dtype=object))
+    return pd.Categorical.from_codes(codes[index], categories=uniques)
+
+
+def _as_text(column):
+    """Column formatted as an object array of strings"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        labels = column.cat.categories.astype(str).to_numpy(dtype=object)
+        return labels[column.cat.codes.to_numpy()]
+    if pd.api.types.is_integer_dtype(column):
+        return column.to_numpy().astype(str).astype(object)
+    if pd.api.types.is_float_dtype(column):
+        return column.map(str).to_numpy(dtype=object)
+    return column.to_numpy(dtype=object)
+
+
+def write_csv(df, path):
+    """Fast CSV writer for synthetic tables
+
+    Rows are assembled by vectorized string concatenation, which is several
+    times faster than DataFrame.to_csv for million-row tables. Synthetic
+    values never contain delimiters or quotes, so no quoting is needed.
+    """
+    columns = [_as_text(df[name]) for name in df.columns]
+    rows = columns[0]
+    for column in columns[1:]:
+        rows = rows + ',' + column
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(df.columns) + '\n')
+        if len(rows):
+            f.write('\n'.join(rows) + '\n')
+    return path
+
+
+def synthetic_signature(n_genes, model, seed=0, start=0):
+    """Signature table of n_genes rows in the data/gene_signature.csv layout"""
+    rng = np.random.default_rng(seed)
+    cells = model['cells']
+    cell = rng.choice(len(cells), size=n_genes, p=model['cell_p'])
+
+    params = model['log_pubmed'].reindex(cells['Druggability'])
+    pubmed = np.exp(rng.normal(params['mean'].to_numpy()[cell], params['std'].to_numpy()[cell]))
+    descriptions = 'Synthetic ' + cells['Pathway'].str.replace('_', ' ') + ' gene'
+    genes = _names('SYN', start, n_genes)
+    return pd.DataFrame({
+        'Gene': genes,
+        'Symbol': genes,
+        'Pathway': _take_categorical(cells['Pathway'], cell),
+        'Phase_Relevance': _take_categorical(cells['Phase_Relevance'], cell),
+        'PubMed_Count': np.maximum(1, np.round(pubmed)).astype(np.int64),
+        'Druggability': _take_categorical(cells['Druggability'], cell),
+        'Description': _take_categorical(descriptions, cell),
+    }, columns=SIGNATURE_COLUMNS)
+
+
+def synthetic_compounds(targets_df, model, n_compounds=None, seed=0):
+    """Compound table in the compounds_ranked.csv layout for the given targets
+
+    Genes are drawn in proportion to the fitted compounds-per-gene rate of
+    their druggability class; by default the table size follows that rate.
+    """
+    rng = np.random.default_rng(seed)
+    weights = targets_df['Druggability'].map(model['rate']).astype(float).fillna(model['rate'].min()).to_numpy()
+    if n_compounds is None:
+        n_compounds = max(1, int(round(weights.sum())))
+    genes = targets_df['Gene'].to_numpy()[rng.choice(len(targets_df), size=n_compounds, p=weights / weights.sum())]
+
+    phase = rng.choice(model['phase_p'].index.to_numpy(), size=n_compounds, p=model['phase_p'].to_numpy())
+    params = model['potency'].reindex(phase)
+    pchembl = np.clip(rng.normal(params['mean'].to_numpy(), params['std'].to_numpy()), *PCHEMBL_RANGE)
+    return pd.DataFrame({
+        'Drug': _names('SYNDRUG', 0, n_compounds),
+        'Target': genes,
+        'Related_Gene': genes,
+        'pChEMBL': np.round(pchembl, 1),
+        'Phase': phase.astype(np.int64),
+        'Evidence': 'Synthetic',
+    }, columns=COMPOUND_COLUMNS)
+
+
+def synthetic_cohort(symbols, n_case, n_control, de_fraction=0.05, effect=1.5, seed=0):
+    """Log2 expression matrix (genes x samples) with known DE genes
+
+    Returns the matrix, the sample labels and the signed true log2 fold
+    change per gene (0 for genes that are not differentially expressed).
+    """
+    rng = np.random.default_rng(seed)
+    n_genes = len(symbols)
+    baseline = rng.normal(BASELINE_MEAN, BASELINE_SD, size=(n_genes, 1))
+    noise_sd = rng.gamma(NOISE_SHAPE, NOISE_SCALE, size=(n_genes, 1))
+    values = (baseline + noise_sd * rng.standard_normal((n_genes, n_case + n_control))).astype(np.float32)
+
+    true_lfc = np.zeros(n_genes)
+    de = rng.random(n_genes) < de_fraction
+    true_lfc[de] = rng.choice([-1.0, 1.0], size=de.sum()) * rng.gamma(4.0, effect / 4.0, size=de.sum())
+    values[:, :n_case] += true_lfc[:, None].astype(np.float32)
+    labels = ['septic shock'] * n_case + ['healthy control'] * n_control
+    return values, labels, true_lfc
+
+
+def write_series_matrix(path, values, labels, probes, chunk_rows=50_000):
+    """Write a GEO series matrix (gzip when the name ends in .gz)"""
+    samples = [f'GSM{i}' for i in range(len(labels))]
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        f.write('!Series_title\t"synthetic sepsis cohort"\n')
+        f.write('!Sample_title\t' + '\t'.join(f'"{label}"' for label in labels) + '\n')
+        f.write('!Sample_geo_accession\t' + '\t'.join(f'"{s}"' for s in samples) + '\n')
+        f.write('!series_matrix_table_begin\n')
+        f.write('"ID_REF"\t' + '\t'.join(f'"{s}"' for s in samples) + '\n')
+        for start in range(0, len(probes), chunk_rows):
+            ids = ['"' + str(p) + '"' for p in probes[start:start + chunk_rows]]
+            block = pd.DataFrame(values[start:start + chunk_rows], index=ids)
+            block.to_csv(f, sep='\t', header=False, float_format='%.4f', quoting=csv.QUOTE_NONE)
+        f.write('!series_matrix_table_end\n')
+    return path
+
+
+def write_synthetic_inputs(root, n_genes, n_compounds=None, cohorts=0, n_case=50, n_control=50, seed=0):
+    """Write a signature, compound table and optional cohorts under root"""
+    root = Path(root)
+    signature_model, compound_model = load_models()
+    rng = np.random.default_rng(seed)
+    seeds = rng.integers(0, 2**32, size=2 + cohorts)
+
+    (root / 'data').mkdir(parents=True, exist_ok=True)
+    (root / 'outputs' / 'tables').mkdir(parents=True, exist_ok=True)
+    signature = synthetic_signature(n_genes, signature_model, seed=seeds[0])
+    write_csv(signature, root / 'data' / 'gene_signature.csv')
+    compounds = synthetic_compounds(signature, compound_model, n_compounds, seed=seeds[1])
+    write_csv(compounds, root / 'outputs' / 'tables' / 'compounds_ranked.csv')
+
+    paths = {'signature': root / 'data' / 'gene_signature.csv',
+             'compounds': root / 'outputs' / 'tables' / 'compounds_ranked.csv', 'cohorts': []}
+    if cohorts:
+        (root / 'data' / 'geo').mkdir(parents=True, exist_ok=True)
+    for i in range(cohorts):
+        values, labels, _ = synthetic_cohort(signature['Gene'].to_numpy(), n_case, n_control, seed=seeds[2 + i])
+        path = root / 'data' / 'geo' / f'SYN{i + 1:03d}_series_matrix.txt.gz'
+        paths['cohorts'].append(write_series_matrix(path, values, labels, signature['Gene'].to_numpy()))
+    return paths
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Write seeded synthetic pipeline inputs')
+    parser.add_argument('output', type=Path, help='project-style directory to write into')
+    parser.add_argument('--genes', type=int, default=1_000_000)
+    parser.add_argument('--compounds', type=int, default=None, help='default: fitted compounds-per-gene rate')
+    parser.add_argument('--cohorts', type=int, default=0, help='number of synthetic GEO cohorts')
+    parser.add_argument('--cases', type=int, default=50)
+    parser.add_argument('--controls', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = write_synthetic_inputs(args.output, args.genes, args.compounds, args.cohorts,
+                                   args.cases, args.controls, args.seed)
+    print(f"Wrote {args.genes} genes to: {paths['signature']}")
+    print(f"Wrote compounds to: {paths['compounds']}")
+    for path in paths['cohorts']:
+        print(f"Wrote cohort: {path}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
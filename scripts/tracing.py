@@ -0,0 +1,319 @@
+"""
+Stage-level tracing and memory instrumentation for the Sepsis HDT Pipeline
+Author: Dr. Siddalingaiah H S
+
+Nested timing spans, counters and optional memory tracking (peak RSS and
+tracemalloc peaks per span, plus tracemalloc snapshots on demand). Traces
+export to the Chrome trace-event JSON format (chrome://tracing, Perfetto)
+and to a compact per-span summary table.
+
+Tracing is off unless enabled from the config, the SEPSIS_TRACE environment
+variable or enable(). When off, span() returns a shared no-op context
+manager and count() returns immediately, so instrumented code pays one
+global lookup per call.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_TRACE_PATH = BASE_DIR / 'outputs' / 'traces' / 'pipeline_trace.json'
+ENV_VAR = 'SEPSIS_TRACE'
+
+_NULL_SPAN = contextlib.nullcontext()
+_tracer = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unavailable)"""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 2**10
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start', 'mem_peak')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.mem_peak = 0
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._exit(self)
+        return False
+
+
+class _Sections:
+    """Consecutive spans: starting a section ends the previous one"""
+
+    def __init__(self, tracer, prefix):
+        self.tracer = tracer
+        self.prefix = prefix
+        self.current = None
+
+    def start(self, name):
+        self.end()
+        self.current = self.tracer.span(f'{self.prefix}: {name}')
+        self.current.__enter__()
+
+    def end(self):
+        if self.current is not None:
+            self.current.__exit__(None, None, None)
+            self.current = None
+
+
+class _NullSections:
+    def start(self, name):
+        pass
+
+    def end(self):
+        pass
+
+
+_NULL_SECTIONS = _NullSections()
+
+
+class Tracer:
+    """Collects spans, counters and memory snapshots for one run"""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.events = []
+        self.counters = {}
+        self.snapshots = []
+        self.pid = os.getpid()
+        self._origin = time.perf_counter_ns()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def _now_us(self):
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def _enter(self, span):
+        stack = self._stack()
+        if self.memory:
+            # Fold the peak so far into the parent, then measure this span alone
+            peak = tracemalloc.get_traced_memory()[1]
+            if stack:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, peak)
+            tracemalloc.reset_peak()
+        stack.append(span)
+        span.start = self._now_us()
+
+    def _exit(self, span):
+        end = self._now_us()
+        stack = self._stack()
+        stack.pop()
+        args = dict(span.args)
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            span.mem_peak = max(span.mem_peak, peak)
+            if stack:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, span.mem_peak)
+            args['tracemalloc_peak_mb'] = round(span.mem_peak / 2**20, 3)
+            args['tracemalloc_current_mb'] = round(current / 2**20, 3)
+        rss = peak_rss_mb()
+        if rss is not None:
+            args['peak_rss_mb'] = round(rss, 1)
+        event = {'name': span.name, 'cat': 'pipeline', 'ph': 'X', 'ts': span.start, 'dur': end - span.start,
+                 'pid': self.pid, 'tid': threading.get_ident(), 'args': args}
+        with self._lock:
+            self.events.append(event)
+
+    def count(self, name, value=1):
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.events.append({'name': name, 'cat': 'counter', 'ph': 'C', 'ts': self._now_us(),
+                                'pid': self.pid, 'tid': threading.get_ident(), 'args': {name: total}})
+
+    def snapshot(self, label, limit=10):
+        """Record the top allocation sites (requires memory tracking)"""
+        if not tracemalloc.is_tracing():
+            return None
+        stats = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+        entry = {
+            'label': label,
+            'ts': self._now_us(),
+            'top': [{'site': str(s.traceback), 'size_mb': round(s.size / 2**20, 3), 'count': s.count} for s in stats],
+        }
+        with self._lock:
+            self.snapshots.append(entry)
+        return entry
+
+    def close(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def summary(self):
+        """Per-span totals: calls, total/mean/max seconds and memory peaks"""
+        spans = [e for e in self.events if e['ph'] == 'X']
+        if not spans:
+            return pd.DataFrame(columns=['Span', 'Calls', 'Total_s', 'Mean_s', 'Max_s'])
+        df = pd.DataFrame({
+            'Span': [e['name'] for e in spans],
+            'Start': [e['ts'] for e in spans],
+            'Seconds': [e['dur'] / 1e6 for e in spans],
+            'Tracemalloc_Peak_MB': [e['args'].get('tracemalloc_peak_mb') for e in spans],
+            'Peak_RSS_MB': [e['args'].get('peak_rss_mb') for e in spans],
+        })
+        table = df.groupby('Span', sort=False).agg(
+            Start=('Start', 'min'),
+            Calls=('Seconds', 'size'),
+            Total_s=('Seconds', 'sum'),
+            Mean_s=('Seconds', 'mean'),
+            Max_s=('Seconds', 'max'),
+            Tracemalloc_Peak_MB=('Tracemalloc_Peak_MB', 'max'),
+            Peak_RSS_MB=('Peak_RSS_MB', 'max'),
+        )
+        table = table.sort_values('Start').drop(columns='Start').reset_index()
+        return table.dropna(axis=1, how='all')
+
+    def to_chrome_trace(self):
+        return {
+            'traceEvents': self.events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'counters': self.counters, 'tracemalloc_snapshots': self.snapshots},
+        }
+
+    def export_chrome_trace(self, path=None):
+        path = Path(path or DEFAULT_TRACE_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+
+def enable(memory=False):
+    """Start collecting; returns the active tracer"""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(memory=memory)
+    return _tracer
+
+
+def disable():
+    """Stop collecting; returns the tracer that was active (or None)"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+    return tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def span(name, **args):
+    """Timing span as a context manager (no-op when tracing is off)"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **args)
+
+
+def sections(prefix):
+    """Sequential spans for the sections of one document or stage"""
+    if _tracer is None:
+        return _NULL_SECTIONS
+    return _Sections(_tracer, prefix)
+
+
+def count(name, value=1):
+    """Add to a named counter (no-op when tracing is off)"""
+    if _tracer is not None:
+        _tracer.count(name, value)
+
+
+def snapshot(label, limit=10):
+    if _tracer is not None:
+        return _tracer.snapshot(label, limit)
+    return None
+
+
+def traced(name=None):
+    """Decorator wrapping every call of a function in a span"""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def configure(config):
+    """Enable tracing from the config's tracing block or SEPSIS_TRACE
+
+    SEPSIS_TRACE may be '1' (default output path) or a trace file path.
+    Returns the output path when tracing was enabled, else None.
+    """
+    settings = config.get('tracing', {}) or {}
+    env = os.environ.get(ENV_VAR, '').strip()
+    if not (settings.get('enabled') or env not in ('', '0')):
+        return None
+    enable(memory=settings.get('memory', False))
+    if env not in ('', '0', '1'):
+        return Path(env)
+    return BASE_DIR / settings.get('output', 'outputs/traces/pipeline_trace.json')
+
+
+def finish(path=None):
+    """Stop tracing, export the Chrome trace and print the summary table"""
+    tracer = disable()
+    if tracer is None:
+        return None
+    trace_path = tracer.export_chrome_trace(path)
+    table = tracer.summary()
+
+    print("\n" + "="*60)
+    print("TRACE SUMMARY")
+    print("="*60)
+    print(table.to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+    if tracer.counters:
+        print("\nCounters:")
+        for name, value in tracer.counters.items():
+            print(f"  {name}: {value}")
+    print(f"\nSaved Chrome trace to: {trace_path}")
+    return trace_path
@@ -0,0 +1,187 @@
+"""
+Schema and invariant validation of the output tables
+Author: Dr. Siddalingaiah H S
+
+Every table the pipeline writes has a declared schema (column -> kind) and
+a set of invariants, each a vectorized column expression giving the mask of
+offending rows: unique identifiers, scores in [0, 1], a contiguous rank
+that follows the score, valid phase categories and compounds referencing
+known genes. The pipeline validates a table before writing it and records
+the results in a report next to the tables, which the tests read instead of
+re-checking the CSVs.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from pandas.api import types
+
+BASE_DIR = Path(__file__).parent.parent
+REPORT_FILE = 'validation_report.json'
+
+PHASES = ['Early', 'Late', 'Both']
+DRUGGABILITY = ['High', 'Moderate', 'Low']
+CLINICAL_PHASES = [0, 1, 2, 3, 4]
+
+# Column -> kind; every declared column must be present and fully populated
+SCHEMAS = {
+    'targets': {
+        'Gene': 'string',
+        'Symbol': 'string',
+        'Pathway': 'string',
+        'Phase_Relevance': 'string',
+        'PubMed_Count': 'integer',
+        'Druggability': 'string',
+        'Composite_Score': 'float',
+        'Rank': 'integer',
+    },
+    'compounds': {
+        'Drug': 'string',
+        'Target': 'string',
+        'Related_Gene': 'string',
+        'pChEMBL': 'float',
+        'Phase': 'integer',
+        'Evidence': 'string',
+    },
+}
+
+# Categorical columns and their allowed values (missing values fail these too)
+CATEGORIES = {
+    'targets': {'Phase_Relevance': PHASES, 'Druggability': DRUGGABILITY},
+    'compounds': {'Phase': CLINICAL_PHASES},
+}
+
+KIND_CHECKS = {
+    # is_string_dtype inspects the values of object columns; the dtype test is free
+    'string': lambda s: types.is_object_dtype(s) or types.is_string_dtype(s),
+    'integer': types.is_integer_dtype,
+    'float': types.is_numeric_dtype,
+}
+
+# Offending rows reported per failed check
+MAX_EXAMPLES = 5
+
+
+def duplicated(series):
+    """Mask of every repeated value; the usual all-unique case costs one hash pass"""
+    if pd.Index(series).is_unique:
+        return np.zeros(len(series), dtype=bool)
+    return series.duplicated(keep=False).to_numpy()
+
+
+def category_checks(name, df):
+    return {f'{column.lower()}_valid': ~df[column].isin(allowed).to_numpy()
+            for column, allowed in CATEGORIES[name].items()}
+
+
+def target_invariants(df, known_genes=None):
+    """Check name -> mask of rows breaking it (the table is in rank order)"""
+    score = df['Composite_Score'].to_numpy(dtype=float)
+    rank = df['Rank'].to_numpy()
+    # NaN scores fail the range check (NaN comparisons are False)
+    in_range = (score >= 0) & (score <= 1)
+    rising = np.zeros(len(df), dtype=bool)
+    rising[1:] = score[1:] > score[:-1]
+    return {
+        'unique_gene': duplicated(df['Gene']),
+        'unique_symbol': duplicated(df['Symbol']),
+        'score_in_range': ~in_range,
+        'rank_contiguous': rank != np.arange(1, len(df) + 1),
+        'rank_follows_score': rising,
+        **category_checks('targets', df),
+    }
+
+
+def compound_invariants(df, known_genes=None):
+    """Check name -> mask of rows breaking it; known_genes enables the reference check"""
+    pchembl = df['pChEMBL'].to_numpy(dtype=float)
+    checks = {
+        'pchembl_in_range': ~((pchembl > 0) & (pchembl <= 15)),
+        **category_checks('compounds', df),
+    }
+    if known_genes is not None:
+        checks['known_gene'] = ~df['Related_Gene'].isin(pd.Index(known_genes)).to_numpy()
+    return checks
+
+
+INVARIANTS = {
+    'targets': target_invariants,
+    'compounds': compound_invariants,
+}
+
+
+def schema_problems(name, df):
+    """Missing columns, wrong kinds and missing values against the declared schema"""
+    problems = []
+    for column, kind in SCHEMAS[name].items():
+        if column not in df.columns:
+            problems.append(f'missing column {column}')
+        elif not KIND_CHECKS[kind](df[column]):
+            problems.append(f'{column}: expected {kind}, got {df[column].dtype}')
+        elif column not in CATEGORIES[name] and df[column].hasnans:
+            problems.append(f'{column}: {int(df[column].isna().sum())} missing values')
+    return problems
+
+
+def validate_table(name, df, known_genes=None):
+    """Result dict for one table: rows, schema problems, failed rows per check"""
+    result = {'rows': len(df), 'schema': schema_problems(name, df), 'failures': {}, 'examples': {}}
+    # Invariants need the declared columns with usable dtypes
+    if any(p.startswith('missing column') or 'expected' in p for p in result['schema']):
+        result['ok'] = False
+        return result
+    for check, mask in INVARIANTS[name](df, known_genes).items():
+        failed = int(mask.sum())
+        result['failures'][check] = failed
+        if failed:
+            rows = np.flatnonzero(mask)[:MAX_EXAMPLES]
+            result['examples'][check] = df.iloc[rows, 0].astype(str).tolist()
+    result['ok'] = not result['schema'] and not any(result['failures'].values())
+    return result
+
+
+def check_table(name, df, known_genes=None):
+    """validate_table, raising ValueError when the table breaks its schema or an invariant"""
+    result = validate_table(name, df, known_genes)
+    if not result['ok']:
+        failed = [f"{check} ({n} rows, e.g. {', '.join(result['examples'][check])})"
+                  for check, n in result['failures'].items() if n]
+        raise ValueError(f"{name} table failed validation: {'; '.join(result['schema'] + failed)}")
+    return result
+
+
+def record_result(name, result, path=None):
+    """Store one table's result in the validation report"""
+    path = Path(path or BASE_DIR / 'outputs' / 'tables' / REPORT_FILE)
+    report = {}
+    if path.exists():
+        with open(path) as f:
+            report = json.load(f)
+    report[name] = result
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load_report(path=None, targets_path=None, compounds_path=None):
+    """Read the validation report, re-validating the CSVs if they are newer"""
+    tables_dir = BASE_DIR / 'outputs' / 'tables'
+    targets_path = targets_path or tables_dir / 'targets_ranked.csv'
+    compounds_path = compounds_path or tables_dir / 'compounds_ranked.csv'
+    path = Path(path or tables_dir / REPORT_FILE)
+    if path.exists() and path.stat().st_mtime >= max(Path(targets_path).stat().st_mtime,
+                                                     Path(compounds_path).stat().st_mtime):
+        with open(path) as f:
+            report = json.load(f)
+        if set(INVARIANTS) <= set(report):
+            return report
+
+    targets = pd.read_csv(targets_path)
+    report = {
+        'targets': validate_table('targets', targets),
+        'compounds': validate_table('compounds', pd.read_csv(compounds_path), targets['Gene']),
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,168 @@
+"""
+Unit tests for GEO expression analysis
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import sys
+
+# Add scripts to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from geo_expression import bh_fdr, build_signature, differential_expression
+from expression_store import cohort_differential_expression, convert_series_matrix, is_current, open_cohort
+from meta_analysis import meta_analyze
+from replication import replication_scores
+
+
+def write_series_matrix(path, values, labels, probes):
+    """Write a minimal GEO series-matrix file"""
+    samples = [f'GSM{i}' for i in range(len(labels))]
+    lines = [
+        '!Series_title\t"synthetic"',
+        '!Sample_title\t' + '\t'.join(f'"{label}"' for label in labels),
+        '!Sample_geo_accession\t' + '\t'.join(f'"{s}"' for s in samples),
+        '!series_matrix_table_begin',
+        '"ID_REF"\t' + '\t'.join(f'"{s}"' for s in samples),
+    ]
+    for probe, row in zip(probes, values):
+        lines.append(f'"{probe}"\t' + '\t'.join(f'{v:.4f}' for v in row))
+    lines.append('!series_matrix_table_end')
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.fixture
+def series_matrix(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.normal(8, 0.5, size=(40, 12))
+    values[0, :6] += 3  # IL6 strongly up in sepsis
+    values[1, :6] -= 2  # HLA-DRA down
+    probes = ['IL6', 'HLA-DRA'] + [f'G{i}' for i in range(38)]
+    labels = ['septic shock'] * 6 + ['healthy control'] * 6
+    path = tmp_path / 'GSE1_series_matrix.txt'
+    write_series_matrix(path, values, labels, probes)
+    return path, values
+
+
+class TestDifferentialExpression:
+    """Test streaming Welch differential expression"""
+
+    def test_welch_matches_reference(self, series_matrix):
+        """Chunked statistics equal a direct Welch computation"""
+        path, values = series_matrix
+        de = differential_expression(path, chunk_rows=7).set_index('Symbol')
+        case, control = values[0, :6], values[0, 6:]
+        se = np.sqrt(case.var(ddof=1) / 6 + control.var(ddof=1) / 6)
+        assert de.loc['IL6', 'log2FC'] == pytest.approx(case.mean() - control.mean(), abs=1e-3)
+        assert de.loc['IL6', 't'] == pytest.approx((case.mean() - control.mean()) / se, rel=1e-3)
+        assert de.loc['IL6', 'FDR'] < 0.05 and de.loc['HLA-DRA', 'log2FC'] < -1
+
+    def test_bh_fdr(self):
+        """BH adjustment is monotone and NaN-preserving"""
+        fdr = bh_fdr([0.01, 0.04, 0.03, np.nan, 0.5])
+        np.testing.assert_allclose(fdr[[0, 1, 2, 4]], [0.04, 0.0533333, 0.0533333, 0.5], rtol=1e-5)
+        assert np.isnan(fdr[3])
+
+    def test_synthetic_cohort_recovered(self, tmp_path):
+        """Known DE genes of a generated cohort are found in the right direction"""
+        from synthetic_data import synthetic_cohort, write_series_matrix as write_synthetic
+        symbols = np.array([f'G{i}' for i in range(2000)])
+        values, labels, true_lfc = synthetic_cohort(symbols, 30, 30, effect=2.0, seed=4)
+        path = write_synthetic(tmp_path / 'SYN_series_matrix.txt.gz', values, labels, symbols)
+        de = differential_expression(path).set_index('Symbol').loc[symbols]
+        strong = np.abs(true_lfc) > 1
+        assert (np.sign(de['log2FC'].values[strong]) == np.sign(true_lfc[strong])).all()
+        assert (de['FDR'].values[strong] < 0.05).mean() > 0.95
+
+    def test_signature_requires_consistent_direction(self):
+        """Genes flipping direction between cohorts are excluded"""
+        curated = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        de_a = pd.DataFrame({'Symbol': ['IL6', 'NEW1', 'FLIP'], 'log2FC': [2.0, 1.5, 1.2], 'FDR': [1e-5, 1e-3, 1e-3]})
+        de_b = pd.DataFrame({'Symbol': ['IL6', 'NEW1', 'FLIP'], 'log2FC': [1.8, 1.1, -1.4], 'FDR': [1e-4, 1e-2, 1e-2]})
+        signature = build_signature({'A': de_a, 'B': de_b}, curated, min_cohorts=2)
+        assert signature['Gene'].tolist() == ['IL6', 'NEW1']
+        assert signature.loc[0, 'Pathway'] == 'cytokine_storm'
+        assert signature.loc[1, 'Pathway'] == 'unassigned'
+
+
+class TestExpressionStore:
+    """Test the memory-mapped cohort store"""
+
+    def test_round_trip(self, series_matrix, tmp_path):
+        """Converted cohorts are float32 memmaps matching the source"""
+        path, values = series_matrix
+        convert_series_matrix(path, tmp_path / 'store', 'GSE1', chunk_rows=16)
+        cohort = open_cohort(tmp_path / 'store', 'GSE1')
+        assert isinstance(cohort.values, np.memmap) and cohort.values.dtype == np.float32
+        np.testing.assert_allclose(cohort.values, values, atol=1e-4)
+        assert cohort.case.sum() == 6 and cohort.control.sum() == 6
+        assert is_current(tmp_path / 'store', 'GSE1', path)
+
+    def test_store_matches_streaming(self, series_matrix, tmp_path):
+        """Differential expression from the store equals the streaming reader"""
+        path, _ = series_matrix
+        cohort = convert_series_matrix(path, tmp_path / 'store', 'GSE1')
+        stored = cohort_differential_expression(cohort).set_index('Symbol').sort_index()
+        streamed = differential_expression(path).set_index('Symbol').sort_index()
+        np.testing.assert_allclose(stored['t'], streamed['t'], rtol=1e-5)
+
+    def test_settings_invalidate_cohort(self, series_matrix, tmp_path, monkeypatch):
+        """Changed grouping patterns or a rewritten probe map force a new conversion"""
+        import os
+        import expression_store
+        from expression_store import cohort_settings
+        path, _ = series_matrix
+        monkeypatch.setattr(expression_store, 'BASE_DIR', tmp_path)
+        (tmp_path / 'data' / 'geo').mkdir(parents=True)
+        probe_map = tmp_path / 'data' / 'geo' / 'GPL1.tsv'
+        probe_map.write_text('ID\tSymbol\nIL6\tIL6\n')
+        dataset = {'id': 'GSE1', 'probe_map': 'GPL1.tsv'}
+        settings = cohort_settings({}, dataset)
+        convert_series_matrix(path, tmp_path / 'store', 'GSE1', settings=settings)
+        assert is_current(tmp_path / 'store', 'GSE1', path, cohort_settings({}, dataset))
+        assert not is_current(tmp_path / 'store', 'GSE1', path)
+
+        changed = {**dataset, 'case_pattern': 'sepsis'}
+        assert not is_current(tmp_path / 'store', 'GSE1', path, cohort_settings({}, changed))
+        os.utime(probe_map, (0, 0))
+        assert not is_current(tmp_path / 'store', 'GSE1', path, cohort_settings({}, dataset))
+
+
+class TestMetaAnalysis:
+    """Test vectorized fixed/random-effects pooling"""
+
+    def test_dersimonian_laird(self):
+        """Pooled estimates match a hand-computed DerSimonian-Laird example"""
+        effects = {
+            'A': pd.DataFrame({'Symbol': ['IL6', 'TNF'], 'g': [0.5, 1.0], 'var_g': [0.04, 0.1]}),
+            'B': pd.DataFrame({'Symbol': ['IL6', 'TNF'], 'g': [0.8, 1.0], 'var_g': [0.09, 0.1]}),
+            'C': pd.DataFrame({'Symbol': ['IL6'], 'g': [0.2], 'var_g': [0.05]}),
+        }
+        meta = meta_analyze(effects).set_index('Symbol')
+        assert meta.loc['IL6', 'N_Cohorts'] == 3 and meta.loc['TNF', 'N_Cohorts'] == 2
+        assert meta.loc['IL6', 'FE_Effect'] == pytest.approx(25.4 / 56.111, rel=1e-3)
+        assert meta.loc['IL6', 'Q'] == pytest.approx(2.6733, rel=1e-3)
+        assert meta.loc['IL6', 'Tau2'] == pytest.approx(0.0189, rel=1e-2)
+        assert meta.loc['IL6', 'I2'] == pytest.approx(0.2519, rel=1e-2)
+        assert meta.loc['TNF', 'Tau2'] == 0 and meta.loc['TNF', 'RE_Effect'] == pytest.approx(1.0)
+
+
+class TestReplication:
+    """Test cross-cohort replication scores"""
+
+    def test_direction_and_significance(self):
+        """Credit depends on consensus direction and per-cohort significance"""
+        de_tables = {
+            'A': pd.DataFrame({'Symbol': ['IL6', 'FLIP', 'WEAK'],
+                               'log2FC': [2.0, 1.5, 0.3], 'FDR': [1e-6, 1e-3, 0.4]}),
+            'B': pd.DataFrame({'Symbol': ['IL6', 'FLIP', 'WEAK'],
+                               'log2FC': [1.5, -1.2, 0.2], 'FDR': [1e-4, 1e-3, 0.6]}),
+            'C': pd.DataFrame({'Symbol': ['IL6', 'FLIP'], 'log2FC': [0.4, 1.1], 'FDR': [0.2, 1e-2]}),
+        }
+        scores = replication_scores(de_tables)
+        assert scores.loc['IL6', 'Replication'] == pytest.approx((1 + 1 + 0.5) / 3)
+        assert scores.loc['FLIP', 'Replication'] == pytest.approx(2 / 3)
+        assert scores.loc['WEAK', 'Replication'] == pytest.approx(0.5)
+        assert scores.loc['WEAK', 'N_Measured'] == 2
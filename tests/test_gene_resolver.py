@@ -0,0 +1,52 @@
+"""
+Unit tests for offline gene identifier resolution
+"""
+
+import pytest
+from pathlib import Path
+import sys
+
+# Add scripts to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+from gene_resolver import GeneResolver
+
+GENE_INFO = """#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\tdbXrefs\tchromosome
+9606\t3569\tIL6\t-\tBSF-2|HGF|IFNB2\tMIM:147620|HGNC:HGNC:6018|Ensembl:ENSG00000136244\t7
+9606\t7124\tTNF\t-\tDIF|TNFA|TNF-alpha\tMIM:191160|HGNC:HGNC:11892|Ensembl:ENSG00000232810\t6
+9606\t5133\tPDCD1\t-\tPD1|CD279|HGF\tMIM:600244|Ensembl:ENSG00000188389\t2
+10090\t16193\tIl6\t-\tIl-6\tEnsembl:ENSMUSG00000025746\t5
+"""
+
+UNIPROT = "P05231\tGeneID\t3569\nP05231\tGene_Name\tIL6\nP01375\tGeneID\t7124\n"
+
+
+@pytest.fixture
+def resolver(tmp_path):
+    gene_info = tmp_path / 'gene_info'
+    gene_info.write_text(GENE_INFO)
+    uniprot = tmp_path / 'idmapping.dat'
+    uniprot.write_text(UNIPROT)
+    return GeneResolver.from_files(gene_info, uniprot)
+
+
+class TestGeneResolver:
+    """Test hash-indexed identifier resolution"""
+
+    def test_human_only(self, resolver):
+        """Non-human genes are excluded from the index"""
+        assert len(resolver) == 3
+
+    def test_all_namespaces(self, resolver):
+        """Symbols, aliases, Entrez, Ensembl and UniProt IDs resolve"""
+        result = resolver.resolve(['il6', 'TNFA', '5133', 'ENSG00000232810', 'P05231'])
+        assert result['Status'].eq('resolved').all()
+        assert result['Symbol'].tolist() == ['IL6', 'TNF', 'PDCD1', 'TNF', 'IL6']
+        assert result['Matched_By'].tolist() == ['symbol', 'alias', 'entrez', 'ensembl', 'uniprot']
+
+    def test_ambiguous_and_unresolved(self, resolver):
+        """Shared aliases and unknown symbols are reported, not guessed"""
+        result = resolver.resolve(['HGF', 'NOTAGENE'])
+        assert result['Status'].tolist() == ['ambiguous', 'unresolved']
+        assert result.loc[0, 'Candidates'] == 'IL6|PDCD1'
+        assert result['GeneID'].isna().all()
@@ -0,0 +1,171 @@
+"""
+Unit tests for the local MEDLINE co-mention index
+"""
+
+import gzip
+import pandas as pd
+import pytest
+from pathlib import Path
+import sys
+
+# Add scripts to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import medline_index
+from medline_index import TokenAutomaton, load_literature_index, pubmed_counts
+
+
+def article(pmid, year, title, abstract='', mesh=()):
+    headings = ''.join(f'<MeshHeading><DescriptorName UI="D0">{m}</DescriptorName></MeshHeading>' for m in mesh)
+    return (f'<PubmedArticle><MedlineCitation Status="MEDLINE"><PMID Version="1">{pmid}</PMID>'
+            f'<Article><Journal><JournalIssue><PubDate><Year>{year}</Year></PubDate></JournalIssue></Journal>'
+            f'<ArticleTitle>{title}</ArticleTitle><Abstract><AbstractText>{abstract}</AbstractText></Abstract>'
+            f'</Article><MeshHeadingList>{headings}</MeshHeadingList></MedlineCitation></PubmedArticle>')
+
+
+def write_medline(path, articles, deleted=()):
+    deletions = ''.join(f'<PMID Version="1">{p}</PMID>' for p in deleted)
+    xml = ('<?xml version="1.0" encoding="utf-8"?>\n<PubmedArticleSet>' + ''.join(articles)
+           + (f'<DeleteCitation>{deletions}</DeleteCitation>' if deleted else '') + '</PubmedArticleSet>')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(xml)
+
+
+@pytest.fixture
+def medline(tmp_path, monkeypatch):
+    directory = tmp_path / 'data' / 'reference' / 'medline'
+    directory.mkdir(parents=True)
+    write_medline(directory / 'pubmed24n0001.xml.gz', [
+        article(101, 2001, 'IL-6 predicts mortality in <i>septic shock</i>'),
+        article(102, 2010, 'TNF and IL6 in rheumatoid arthritis'),
+        article(103, 1995, 'Interleukin 6', 'IL6 levels in SEPSIS', mesh=['Sepsis']),
+    ])
+    write_medline(directory / 'pubmed24n0002.xml.gz', [
+        article(104, 2020, 'NFkB signalling', 'Systemic inflammatory response syndrome after surgery'),
+        article(102, 2011, 'TNF in sepsis (revised)'),
+        article(105, 2022, 'IL66 is not a gene we index', 'sepsis'),
+    ], deleted=[101])
+    monkeypatch.setattr(medline_index, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(medline_index, '_memory_cache', {})
+    genes = pd.DataFrame({'Gene': ['IL6', 'TNF', 'NFKB1'], 'Symbol': ['IL6', 'TNF', 'NFkB']})
+    return genes
+
+
+class TestMedlineIndex:
+    """Test the token automaton and the inverted index built from MEDLINE files"""
+
+    def test_automaton_matches_on_token_boundaries(self):
+        """Overlapping multi-token patterns are all found; matches end on a word end"""
+        automaton = TokenAutomaton([(('SEPTIC', 'SHOCK'), 'shock'), (('SHOCK',), 'any shock'),
+                                    (('IL', '6'), 'il6'), (('SEPTIC', 'SHOCK', 'SYNDROME'), 'syndrome')])
+        assert automaton.scan('SEPTIC SHOCK SYNDROME with IL-6') == {'shock', 'any shock', 'syndrome', 'il6'}
+        assert automaton.scan('SEPTIC SHOCKS and IL66') == set()
+        assert automaton.scan('SHOCK') == {'any shock'}
+        for text in ['IL6R blockade', 'soluble IL-6R levels', 'IL6ST signalling']:
+            assert automaton.scan(text) == set()
+        assert automaton.scan('IL6R and IL6 levels') == {'il6'}
+
+        genes = TokenAutomaton([(('TLR', '4'), 'TLR4'), (('IL', '10'), 'IL10')])
+        assert genes.scan('TLR4s and IL10RA') == set()
+        assert genes.scan('TLR4, IL-10') == {'TLR4', 'IL10'}
+
+    def test_index_postings_and_counts(self, medline):
+        """Revised citations replace the earlier version, deletions drop it"""
+        index = load_literature_index({}, medline, processes=1)
+        assert index.pmids.tolist() == [102, 103, 104, 105]
+        assert index.years.tolist() == [2011, 1995, 2020, 2022]
+        assert index.pmids[index.docs('gene:IL6')].tolist() == [103]
+        assert index.pmids[index.docs('gene:TNF')].tolist() == [102]
+        assert index.pmids[index.docs('gene:NFKB1')].tolist() == [104]
+        assert index.pmids[index.docs('term:sepsis')].tolist() == [102, 103, 105]
+
+        counts = pubmed_counts(index, ['IL6', 'TNF', 'NFKB1', 'STAT3'])
+        assert counts['Mentions'].tolist() == [1, 1, 1, 0]
+        assert counts['Sepsis_Mentions'].tolist() == [1, 1, 1, 0]
+        recent = pubmed_counts(index, ['IL6', 'TNF'], years=(2000, 2024))
+        assert recent['Sepsis_Mentions'].tolist() == [0, 1]
+
+    def test_index_reused_until_files_change(self, medline, tmp_path):
+        """A current index is opened; a new update file triggers a rebuild"""
+        first = load_literature_index({}, medline, processes=1)
+        medline_index._memory_cache.clear()
+        again = load_literature_index({}, medline, processes=1)
+        assert again.meta == first.meta
+
+        write_medline(tmp_path / 'data' / 'reference' / 'medline' / 'pubmed24n0003.xml.gz',
+                      [article(106, 2023, 'IL6 blockade in sepsis')])
+        medline_index._memory_cache.clear()
+        updated = load_literature_index({}, medline, processes=1)
+        assert updated.pmids[updated.docs('gene:IL6')].tolist() == [103, 106]
+        # Another signature is not served the cached index of the first
+        fewer = load_literature_index({}, medline.head(1), processes=1)
+        assert 'gene:TNF' not in fewer and 'gene:TNF' in updated
+        assert load_literature_index({'literature': {'medline_dir': 'missing'}}, medline) is None
+
+    def test_resolver_aliases(self):
+        """Unambiguous aliases that are not another gene's symbol are indexed"""
+        from gene_resolver import GeneResolver
+        genes = pd.DataFrame({'GeneID': [3569, 7124, 6774], 'Symbol': ['IL6', 'TNF', 'STAT3'],
+                              'Ensembl_ID': [None] * 3})
+        keys = pd.DataFrame({'GeneID': [3569, 3569, 7124, 6774, 7124], 'key': ['IL6', 'BSF2', 'TNF', 'APRF', 'STAT3'],
+                             'namespace': ['symbol', 'alias', 'symbol', 'alias', 'alias']})
+        keys = pd.concat([keys, pd.DataFrame({'GeneID': [6774], 'key': ['STAT3'], 'namespace': ['symbol']})])
+        aliases = GeneResolver(genes, keys).alias_table()
+        assert sorted(zip(aliases['Symbol'], aliases['Alias'])) == [('IL6', 'BSF2'), ('STAT3', 'APRF')]
+
+
+class TestLiteratureQuery:
+    """Test Boolean queries over the MEDLINE index and their use in Table S3"""
+
+    def test_query_semantics(self, medline):
+        """Operators apply left to right; unknown operands are rejected"""
+        from literature_query import QueryEngine
+        engine = QueryEngine(load_literature_index({}, medline, processes=1))
+        assert engine.search('sepsis OR TNF AND IL6').tolist() == [103]
+        assert engine.search('sepsis OR (TNF AND IL6)').tolist() == [102, 103, 105]
+        assert engine.search('"septic shock" OR systemic inflammatory response syndrome').tolist() == [104]
+        assert engine.search('sepsis NOT [Gene Symbol]', gene='IL6').tolist() == [102, 105]
+        with pytest.raises(ValueError, match='cancer'):
+            engine.search('IL6 AND cancer')
+        with pytest.raises(ValueError, match='parentheses'):
+            engine.search('(IL6 AND sepsis')
+
+    def test_gene_templates_with_year_range(self, medline):
+        """Bitmap-filtered templates agree with per-gene posting list evaluation"""
+        from literature_query import QueryEngine
+        engine = QueryEngine(load_literature_index({}, medline, processes=1), years=(2000, 2024))
+        genes = ['IL6', 'TNF', 'NFKB1', 'STAT3']
+        templates = {
+            '[Gene Symbol] AND (sepsis OR septic shock OR SIRS)': [0, 1, 0, 0],
+            '(sepsis OR systemic inflammatory response syndrome) AND [Gene Symbol]': [0, 1, 1, 0],
+            '[Gene Symbol] OR sepsis': [2, 2, 3, 2],
+            '[Gene Symbol] NOT sepsis': [0, 0, 1, 0],
+        }
+        for template, expected in templates.items():
+            assert engine.count_genes(template, genes).tolist() == expected
+            assert [len(engine.search(template, g)) for g in genes] == expected
+
+    def test_counts_feed_table_s3(self, medline, tmp_path, monkeypatch):
+        """Query counts are written next to the tables and become the S3 rows"""
+        import literature_query
+        import generate_supplementary_final
+        from literature_query import run_literature_queries
+        (tmp_path / 'outputs' / 'tables').mkdir(parents=True)
+        monkeypatch.setattr(literature_query, 'BASE_DIR', tmp_path)
+        monkeypatch.setattr(generate_supplementary_final, 'BASE_DIR', tmp_path)
+
+        config = {'literature': {'years': [1990, 2024]}}
+        counts = run_literature_queries(config, medline)
+        assert counts['pubmed'].tolist() == [1, 1, 0]
+
+        inputs = type('Inputs', (), {'targets': pd.DataFrame({'Gene': ['TNF', 'IL6', 'NFKB1'], 'Rank': [1, 2, 3]})})()
+        rows, summary, search = generate_supplementary_final.literature_validation(inputs)
+        assert [row[:4] for row in rows] == [('TNF', '1', '1', 'Minimal'), ('IL6', '2', '1', 'Minimal'),
+                                             ('NFKB1', '3', '0', 'None')]
+        assert rows[1][4] == 'RECOVERY trial success; cytokine storm mediator'
+        assert summary[-1] == ('Minimal (1-4 pubs)', '2', '67%')
+        assert search['years'] == [1990, 2024] and search['documents'] == 4
+
+        # Once the MEDLINE files are gone, the counts of the earlier run are too
+        assert run_literature_queries({'literature': {'medline_dir': 'missing'}}, medline) is None
+        assert generate_supplementary_final.literature_validation(inputs) is None
@@ -0,0 +1,142 @@
+"""
+Unit tests for offline Open Targets release ingestion
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+import sys
+
+# Add scripts to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import opentargets
+from opentargets import load_opentargets_store, matching_lines
+
+DISEASES = [
+    {'id': 'EFO_SEPSIS', 'name': 'Sepsis', 'descendants': ['EFO_SHOCK']},
+    {'id': 'EFO_SHOCK', 'name': 'septic shock'},
+    {'id': 'EFO_ASTHMA', 'name': 'asthma'},
+]
+
+TARGETS = [
+    {'id': 'ENSG00000136244', 'approvedSymbol': 'IL6', 'proteinIds': [{'id': 'P05231'}]},
+    {'id': 'ENSG00000232810', 'approvedSymbol': 'TNF'},
+    {'id': 'ENSG00000171855', 'approvedSymbol': 'IFNB1'},
+]
+
+ASSOCIATIONS = [
+    [{'diseaseId': 'EFO_SEPSIS', 'targetId': 'ENSG00000136244', 'score': 0.62, 'evidenceCount': 40},
+     {'diseaseId': 'EFO_ASTHMA', 'targetId': 'ENSG00000136244', 'score': 0.91, 'evidenceCount': 7}],
+    [{'diseaseId': 'EFO_SHOCK', 'targetId': 'ENSG00000136244', 'score': 0.48, 'evidenceCount': 12},
+     {'diseaseId': 'EFO_SHOCK', 'targetId': 'ENSG00000232810', 'score': 0.55, 'evidenceCount': 9},
+     {'diseaseId': 'EFO_ASTHMA', 'targetId': 'ENSG00000171855', 'score': 0.3, 'evidenceCount': 2}],
+]
+
+
+def write_parts(directory, parts):
+    directory.mkdir(parents=True)
+    for i, records in enumerate(parts):
+        (directory / f'part-{i:05d}.json').write_text(''.join(json.dumps(r) + '\n' for r in records))
+
+
+@pytest.fixture
+def release(tmp_path, monkeypatch):
+    root = tmp_path / 'data' / 'reference' / 'opentargets' / '24.09'
+    write_parts(root / 'diseases', [DISEASES])
+    write_parts(root / 'targets', [TARGETS])
+    write_parts(root / 'associationByOverallIndirect', ASSOCIATIONS)
+    monkeypatch.setattr(opentargets, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(opentargets, '_memory_cache', {})
+    return root
+
+
+class TestOpenTargetsIngestion:
+    """Test streaming a release into the target-indexed store"""
+
+    def test_matching_lines_across_blocks(self, tmp_path):
+        """Only lines with a wanted value are returned, also when split across reads"""
+        write_parts(tmp_path / 'parts', ASSOCIATIONS)
+        path = tmp_path / 'parts' / 'part-00001.json'
+        for block_bytes in [7, 64, 1 << 20]:
+            lines = matching_lines(path, 'diseaseId', ['EFO_SHOCK'], block_bytes=block_bytes)
+            assert [json.loads(line)['targetId'] for line in lines] == ['ENSG00000136244', 'ENSG00000232810']
+        ids = [t['id'] for t in TARGETS[:2]] + [f'ENSG{i:011d}' for i in range(300)]
+        lines = matching_lines(tmp_path / 'parts' / 'part-00000.json', 'targetId', ids)
+        assert len(lines) == 2
+
+    def test_store_scores_and_lookup(self, release):
+        """Sepsis rows only, best score per target, joined by Ensembl id or symbol"""
+        config = {'databases': {'opentargets': '24.09'}}
+        store = load_opentargets_store(config, processes=1)
+        assert store.meta['disease_ids'] == ['EFO_SEPSIS', 'EFO_SHOCK']
+        assert store.meta['rows_kept'] == 3
+        assert list(store.targets) == ['ENSG00000136244', 'ENSG00000232810']
+        assert list(store.symbols) == ['IL6', 'TNF']
+        assert store.score.tolist() == [0.62, 0.55]
+        assert store.evidence_count.tolist() == [52, 9]
+
+        genes = pd.DataFrame({'Gene': ['TNF', 'IL6', 'IFNB1', 'STAT3'],
+                              'Ensembl_ID': [None, 'ENSG00000136244', 'ENSG00000171855', None]})
+        np.testing.assert_array_equal(store.lookup(genes), [0.55, 0.62, np.nan, np.nan])
+
+    def test_store_reused_until_release_changes(self, release, monkeypatch):
+        """A current store is opened, not re-ingested; explicit ids bypass the disease index"""
+        scans = []
+        resolve = opentargets.sepsis_disease_ids
+        monkeypatch.setattr(opentargets, 'sepsis_disease_ids', lambda *args: scans.append(1) or resolve(*args))
+        config = {'databases': {'opentargets': '24.09'}}
+        first = load_opentargets_store(config, processes=1)
+        opentargets._memory_cache.clear()
+        again = load_opentargets_store(config, processes=1)
+        assert again.meta == first.meta
+        # Disease ids come from the store until the terms change
+        assert len(scans) == 1
+        opentargets._memory_cache.clear()
+        config['opentargets'] = {'disease_terms': ['Septic Shock']}
+        assert load_opentargets_store(config, processes=1).meta['disease_ids'] == ['EFO_SHOCK']
+        assert len(scans) == 2
+
+        config['opentargets'] = {'disease_ids': ['EFO_ASTHMA']}
+        asthma = load_opentargets_store(config, processes=1)
+        assert asthma.score.tolist() == [0.91, 0.3]
+        assert load_opentargets_store({'databases': {'opentargets': '99.99'}}) is None
+
+    def test_scoring_uses_associations(self):
+        """opentargets_evidence takes the association score where present, else the proxy"""
+        from run_pipeline import calculate_composite_score, calculate_composite_scores, calculate_score_components
+        genes = pd.DataFrame({
+            'Gene': ['IL6', 'TNF'], 'Pathway': ['cytokine_storm'] * 2, 'Druggability': ['High'] * 2,
+            'PubMed_Count': [450, 100], 'OT_Association': [0.62, np.nan],
+        })
+        components = calculate_score_components(genes)
+        assert components['opentargets_evidence'].tolist() == [0.62, 0.5]
+        assert [calculate_composite_score(row) for _, row in genes.iterrows()] == \
+            calculate_composite_scores(components).tolist()
+
+    def test_targets_absent_from_release_score_zero(self, release, capsys):
+        """Looked-up targets the release lacks get 0; genes that cannot be looked up keep the proxy"""
+        import shutil
+        from run_pipeline import calculate_score_components, load_config, prepare_signature
+        store = load_opentargets_store({'databases': {'opentargets': '24.09'}}, processes=1)
+        genes = pd.DataFrame({'Gene': ['TNF', 'IL6', 'IFNB1', 'STAT3'],
+                              'Ensembl_ID': [None, 'ENSG00000136244', 'ENSG00000171855', None]})
+        np.testing.assert_array_equal(store.lookup(genes, absent=0.0), [0.55, 0.62, 0.0, np.nan])
+
+        signature = prepare_signature(load_config())
+        association = signature.set_index('Gene')['OT_Association']
+        assert association['IL6'] == 0.62 and association['TNF'] == 0.55
+        components = calculate_score_components(signature).set_index(signature['Gene'])
+        proxy = np.minimum(signature.set_index('Gene')['PubMed_Count'] / 200, 1.0)
+        unmatched = association.index[association.isna()]
+        assert len(unmatched) and components.loc[unmatched, 'opentargets_evidence'].equals(proxy[unmatched])
+
+        # Without a targets index or Ensembl IDs nothing matches: warn, keep the proxy
+        shutil.rmtree(release / 'targets')
+        load_opentargets_store({'databases': {'opentargets': '24.09'}}, force=True, processes=1)
+        capsys.readouterr()
+        signature = prepare_signature(load_config())
+        assert 'OT_Association' not in signature
+        assert 'Warning: no signature gene matched Open Targets' in capsys.readouterr().out
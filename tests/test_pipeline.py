@@ -3,6 +3,7 @@ Unit tests for Sepsis HDT Pipeline
 """
 
 import pytest
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import sys
@@ -11,6 +12,13 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
 
 
+@pytest.fixture(scope='module')
+def validation_report():
+    """Validation results recorded by the pipeline (re-validated only if stale)"""
+    from validation import load_report
+    return load_report()
+
+
 class TestGeneSignature:
     """Test gene signature loading and validation"""
     
@@ -55,19 +63,13 @@ class TestPipelineOutputs:
         path = Path(__file__).parent.parent / 'outputs' / 'tables' / 'compounds_ranked.csv'
         assert path.exists(), "compounds_ranked.csv not found"
     
-    def test_targets_have_scores(self):
+    def test_targets_have_scores(self, validation_report):
         """Verify all targets have composite scores"""
-        path = Path(__file__).parent.parent / 'outputs' / 'tables' / 'targets_ranked.csv'
-        df = pd.read_csv(path)
-        assert 'Composite_Score' in df.columns
-        assert df['Composite_Score'].notna().all(), "Some targets missing scores"
+        assert validation_report['targets']['schema'] == [], "Some targets missing scores"
     
-    def test_scores_in_valid_range(self):
+    def test_scores_in_valid_range(self, validation_report):
         """Verify scores are between 0 and 1"""
-        path = Path(__file__).parent.parent / 'outputs' / 'tables' / 'targets_ranked.csv'
-        df = pd.read_csv(path)
-        assert (df['Composite_Score'] >= 0).all(), "Scores below 0 found"
-        assert (df['Composite_Score'] <= 1).all(), "Scores above 1 found"
+        assert validation_report['targets']['failures']['score_in_range'] == 0, "Scores outside [0, 1] found"
 
 
 class TestFigures:
@@ -96,6 +98,27 @@ class TestFigures:
         """Verify figures have content"""
         path = Path(__file__).parent.parent / 'outputs' / 'figures' / figure_name
         assert path.stat().st_size > 10000, f"Figure seems too small: {figure_name}"
+    
+    def test_config_driven_output(self, tmp_path, monkeypatch):
+        """One draw is written in every format and resolution; draft goes elsewhere"""
+        import matplotlib.pyplot as plt
+        import generate_figures
+        monkeypatch.setattr(generate_figures, 'BASE_DIR', tmp_path)
+        config = {'output': {'figures': {'dpi': 100, 'format': ['png', 'svg'], 'resolutions': [50]}}}
+        monkeypatch.setattr(generate_figures, '_settings', generate_figures.configure_output(config))
+
+        fig, ax = plt.subplots(figsize=(4, 3))
+        ax.plot([0, 1], [0, 1])
+        paths = generate_figures.save_figure(fig, 'demo')
+        assert [p.name for p in paths] == ['demo.png', 'demo_50dpi.png', 'demo.svg']
+        assert all(p.exists() for p in paths)
+        assert plt.imread(paths[0]).shape[1] > 1.8 * plt.imread(paths[1]).shape[1]
+
+        generate_figures.configure_output(config, draft=True)
+        fig, ax = plt.subplots(figsize=(4, 3))
+        draft, = generate_figures.save_figure(fig, 'demo')
+        assert draft == tmp_path / 'outputs' / 'figures' / 'draft' / 'demo.png'
+        assert plt.imread(draft).shape[:2] == (216, 288)  # 72 dpi, uncropped
 
 
 class TestScoring:
@@ -116,5 +139,605 @@ class TestScoring:
         assert len(phase_counts) >= 2, "Should have multiple phase categories"
 
 
+class TestSummaryStats:
+    """Test grouped summary statistics"""
+    
+    def test_summary_matches_tables(self):
+        """Single-pass aggregates equal direct counts on the output tables"""
+        from summary_stats import SummaryStats
+        tables = Path(__file__).parent.parent / 'outputs' / 'tables'
+        targets = pd.read_csv(tables / 'targets_ranked.csv')
+        compounds = pd.read_csv(tables / 'compounds_ranked.csv')
+        summary = SummaryStats.from_tables(targets, compounds)
+        
+        assert summary.targets['total'] == len(targets)
+        assert summary.targets['score_median'] == targets['Composite_Score'].median()
+        assert summary.phase_count('Early') == (targets['Phase_Relevance'] == 'Early').sum()
+        assert summary.clinical_phase_count(4) == (compounds['Phase'] == 4).sum()
+        assert summary.clinical_phase_count_at_most(1) == (compounds['Phase'] <= 1).sum()
+        pathways = summary.pathway_table().set_index('Pathway')
+        expected = targets.groupby('Pathway')['Composite_Score'].mean()
+        assert (pathways.loc[expected.index, 'Mean Score'] - expected).abs().max() < 1e-9
+
+    def test_missing_labels_still_counted(self):
+        """Rows with a missing pathway, phase or druggability stay in totals and ranges"""
+        from summary_stats import compute_target_summary
+        targets = pd.DataFrame({
+            'Pathway': ['a', 'a', np.nan, 'b'], 'Phase_Relevance': ['Early', np.nan, 'Late', 'Late'],
+            'Druggability': ['High', 'Low', 'High', np.nan], 'Composite_Score': [0.9, 0.2, 0.95, 0.1],
+            'PubMed_Count': [1, 2, 3, 4],
+        })
+        summary = compute_target_summary(targets)
+        assert summary['total'] == 4
+        assert (summary['score_min'], summary['score_max']) == (0.1, 0.95)
+        assert summary['by_phase_relevance'] == {'Early': 1, 'Late': 2, 'nan': 1}
+        assert sum(p['count'] for p in summary['by_pathway'].values()) == 4
+
+
+class TestValidation:
+    """Test write-time schema and invariant validation"""
+
+    def test_output_tables_valid(self, validation_report):
+        """The written tables passed every check (from the pipeline's report)"""
+        report = validation_report
+        for name in ['targets', 'compounds']:
+            assert report[name]['ok'], report[name]
+            assert report[name]['schema'] == []
+            assert not any(report[name]['failures'].values())
+        assert report['compounds']['failures']['known_gene'] == 0
+
+    def test_invariants_flag_bad_rows(self):
+        """Broken rows are counted per check and check_table refuses the table"""
+        from validation import check_table, validate_table
+        tables = Path(__file__).parent.parent / 'outputs' / 'tables'
+        targets = pd.read_csv(tables / 'targets_ranked.csv')
+        targets.loc[3, 'Symbol'] = targets.loc[4, 'Symbol']
+        targets.loc[10, 'Composite_Score'] = 1.2
+        targets.loc[20, 'Phase_Relevance'] = 'Mid'
+        targets.loc[30, 'Rank'] = 99
+        result = validate_table('targets', targets)
+        assert result['failures'] == {
+            'unique_gene': 0, 'unique_symbol': 2, 'score_in_range': 1, 'rank_contiguous': 1,
+            'rank_follows_score': 1, 'phase_relevance_valid': 1, 'druggability_valid': 0,
+        }
+        assert result['examples']['phase_relevance_valid'] == [targets.loc[20, 'Gene']]
+        with pytest.raises(ValueError, match='score_in_range'):
+            check_table('targets', targets)
+
+        compounds = pd.read_csv(tables / 'compounds_ranked.csv')
+        compounds.loc[0, 'Related_Gene'] = 'NOTAGENE'
+        compounds = compounds.drop(columns='Evidence')
+        result = validate_table('compounds', compounds, targets['Gene'])
+        assert result['schema'] == ['missing column Evidence'] and not result['ok']
+        result = validate_table('compounds', compounds.assign(Evidence=''), targets['Gene'])
+        assert result['failures']['known_gene'] == 1
+
+    def test_stale_report_revalidated(self, tmp_path):
+        """A report older than the tables is rebuilt from the CSVs"""
+        import os
+        import shutil
+        from validation import load_report, record_result
+        tables = Path(__file__).parent.parent / 'outputs' / 'tables'
+        for name in ['targets_ranked.csv', 'compounds_ranked.csv']:
+            shutil.copy(tables / name, tmp_path / name)
+        paths = dict(path=tmp_path / 'report.json', targets_path=tmp_path / 'targets_ranked.csv',
+                     compounds_path=tmp_path / 'compounds_ranked.csv')
+        record_result('targets', {'ok': False}, paths['path'])
+        record_result('compounds', {'ok': False}, paths['path'])
+        os.utime(paths['path'], (0, 0))
+        report = load_report(**paths)
+        assert report['targets']['ok'] and report['compounds']['ok']
+        assert load_report(**paths) == report
+
+
+class TestScoringDaemon:
+    """Test the warm scoring daemon"""
+
+    @pytest.fixture
+    def state(self):
+        from run_pipeline import DEFAULT_WEIGHTS
+        from scoring_daemon import ScoringState
+        genes = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        return ScoringState(genes, DEFAULT_WEIGHTS)
+
+    def test_overrides_match_pipeline_scoring(self, state, monkeypatch):
+        """Weight and pathway overrides equal re-running the vectorized scorer"""
+        import run_pipeline
+        weights = {**run_pipeline.DEFAULT_WEIGHTS, 'replication': 0.3}
+        monkeypatch.setitem(run_pipeline.PATHWAY_SCORES, 'vascular', 0.95)
+        expected = run_pipeline.calculate_composite_scores(
+            run_pipeline.calculate_score_components(state.genes), weights)
+        composite, order = state.scores({'replication': 0.3}, {'vascular': 0.95})
+        np.testing.assert_allclose(composite, expected, atol=1e-3)
+        assert list(composite[order]) == sorted(composite, reverse=True)
+        with pytest.raises(ValueError):
+            state.scores({'unknown_component': 1.0})
+
+    def test_http_round_trip(self, state, monkeypatch):
+        """Concurrent clients get consistent top-k answers over HTTP"""
+        import threading
+        import urllib.error
+        from concurrent.futures import ThreadPoolExecutor
+        from scoring_daemon import ScoringServer, query
+        server = ScoringServer({}, port=0, state=state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            port = server.server_address[1]
+            assert query('/health', port=port)['genes'] == len(state.genes)
+            with ThreadPoolExecutor(8) as pool:
+                replies = list(pool.map(lambda _: query('/topk', {'k': 5, 'phase': 'Late'}, port=port), range(32)))
+            top = [r['Gene'] for r in replies[0]['top']]
+            assert all([r['Gene'] for r in reply['top']] == top for reply in replies)
+            assert {r['Phase_Relevance'] for r in replies[0]['top']} == {'Late'}
+            for payload in [['IL6'], {'k': 0}, {'k': -3}, {'k': '5'}, {'weights': [1]},
+                            {'pathway_scores': ['a']}, {'genes': 'IL6'}]:
+                with pytest.raises(urllib.error.HTTPError) as error:
+                    query('/topk', payload, port=port)
+                assert error.value.code == 400
+            with pytest.raises(urllib.error.HTTPError) as error:
+                query('/unknown', {}, port=port)
+            assert error.value.code == 404
+            # A scoring failure is a server error, not a missing endpoint
+            monkeypatch.setattr(state, 'rank', lambda *args: {}['missing'])
+            with pytest.raises(urllib.error.HTTPError) as error:
+                query('/rank', {}, port=port)
+            assert error.value.code == 500
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestMultiSignature:
+    """Test batched multi-signature scoring"""
+
+    def test_batched_matches_per_signature(self):
+        """Each batched ranking equals scoring that signature on its own"""
+        from run_pipeline import DEFAULT_WEIGHTS, calculate_composite_scores, calculate_score_components
+        from multi_signature import rank_signatures
+        genes = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        signatures = {
+            'early': genes.loc[genes['Phase_Relevance'] == 'Early', 'Gene'].tolist(),
+            'late': genes.loc[genes['Phase_Relevance'] == 'Late', 'Gene'].tolist() + ['NOT_A_GENE', 'PDCD1'],
+        }
+        rankings, unmatched = rank_signatures(signatures, genes, DEFAULT_WEIGHTS)
+        assert unmatched.to_dict() == {'early': 0, 'late': 1}
+
+        for name in signatures:
+            subset = genes[genes['Gene'].isin(signatures[name])].copy()
+            subset['Composite_Score'] = calculate_composite_scores(calculate_score_components(subset), DEFAULT_WEIGHTS)
+            expected = subset.sort_values('Composite_Score', ascending=False, kind='mergesort')
+            got = rankings[rankings['Signature'] == name]
+            assert got['Gene'].astype(str).tolist() == expected['Gene'].tolist()
+            assert got['Rank'].tolist() == list(range(1, len(expected) + 1))
+
+    def test_per_signature_weights(self):
+        """A weight row per signature changes only that signature's scores"""
+        from run_pipeline import DEFAULT_WEIGHTS
+        from multi_signature import rank_signatures
+        genes = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        signatures = {'a': genes['Gene'].tolist(), 'b': genes['Gene'].tolist()}
+        weights = pd.DataFrame([DEFAULT_WEIGHTS, {**DEFAULT_WEIGHTS, 'pathway_centrality': 0.0}], index=['a', 'b'])
+        rankings, _ = rank_signatures(signatures, genes, weights)
+        shared, _ = rank_signatures({'a': genes['Gene'].tolist()}, genes, DEFAULT_WEIGHTS)
+        a = rankings[rankings['Signature'] == 'a'].reset_index(drop=True)
+        assert a['Composite_Score'].equals(shared['Composite_Score'])
+        b = rankings[rankings['Signature'] == 'b']
+        assert b['Composite_Score'].max() < a['Composite_Score'].max()
+
+        # Rows are matched by name, not position; gaps are errors
+        reordered, _ = rank_signatures(signatures, genes, weights.loc[['b', 'a']])
+        assert reordered['Composite_Score'].equals(rankings['Composite_Score'])
+        with pytest.raises(ValueError, match='signatures: b'):
+            rank_signatures(signatures, genes, weights.loc[['a']])
+        with pytest.raises(ValueError, match='replication'):
+            rank_signatures(signatures, genes, weights.drop(columns='replication'))
+        with pytest.raises(ValueError, match='signatures: a'):
+            rank_signatures(signatures, genes, weights.assign(replication=[np.nan, 0.1]))
+
+
+class TestRankAggregation:
+    """Test rank aggregation across evidence sources"""
+
+    def test_rra_and_borda(self):
+        """Consistently top genes win; missing sources are skipped"""
+        from rank_aggregation import borda_scores, normalized_ranks, rra_scores
+        evidence = pd.DataFrame({'a': [5.0, 4.0, 3.0, 2.0], 'b': [4.0, 5.0, np.nan, 1.0], 'c': [9.0, 1.0, 2.0, 3.0]})
+        ranks = normalized_ranks(evidence)
+        assert ranks[:, 1].tolist() == pytest.approx([2 / 3, 1 / 3, np.nan, 1.0], nan_ok=True)
+        rra = rra_scores(ranks)
+        assert rra.argmin() == 0
+        # Single source: rho is the normalized rank itself
+        assert rra_scores(ranks[:, :1]).tolist() == pytest.approx([0.25, 0.5, 0.75, 1.0])
+        assert borda_scores(ranks)[2] == pytest.approx(0.25)  # ranked 3rd of 4 by a and c; b skipped
+
+    def test_mc3_matches_dense_chain(self):
+        """Prefix-sum iteration equals the stationary vector of the explicit chain"""
+        from rank_aggregation import MC_JUMP, mc3_scores, normalized_ranks
+        rng = np.random.default_rng(0)
+        ranks = normalized_ranks(pd.DataFrame(rng.integers(0, 5, (30, 4)).astype(float)))
+        n, m = ranks.shape
+        beats = (ranks[None, :, :] < ranks[:, None, :]).sum(axis=2) / (n * m)  # beats[i, j]: j above i
+        chain = beats + np.diag(1 - beats.sum(axis=1))
+        chain = (1 - MC_JUMP) * chain + MC_JUMP / n
+        values, vectors = np.linalg.eig(chain.T)
+        stationary = np.real(vectors[:, np.argmax(np.real(values))])
+        np.testing.assert_allclose(mc3_scores(ranks), stationary / stationary.sum(), atol=1e-10)
+
+    def test_aggregated_table_written(self):
+        """The alternative ranking covers every ranked target"""
+        targets = pd.read_csv(Path(__file__).parent.parent / 'outputs' / 'tables' / 'targets_ranked.csv')
+        aggregated = pd.read_csv(Path(__file__).parent.parent / 'outputs' / 'tables' / 'targets_aggregated.csv')
+        assert sorted(aggregated['Gene']) == sorted(targets['Gene'])
+        assert aggregated['RRA_Rank'].tolist() == list(range(1, len(targets) + 1))
+        assert aggregated['RRA_Score'].between(0, 1).all()
+
+
+class TestCalibration:
+    """Test weight calibration against validated targets"""
+
+    def test_metrics_match_pairwise_definition(self):
+        """Vectorized AUROC counts positive-negative pairs (ties count half)"""
+        from calibration import evaluate_weights, simplex_grid
+        grid = simplex_grid(0.25)
+        assert len(grid) == 70 and np.allclose(grid.sum(axis=1), 1)
+
+        rng = np.random.default_rng(0)
+        matrix = rng.integers(0, 4, (40, 5)) / 4
+        labels = rng.random(40) < 0.3
+        metrics = evaluate_weights(matrix, labels, grid, k=5)
+        for row, weights in enumerate(grid[:10]):
+            scores = np.round(matrix @ weights, 3)
+            diff = scores[labels][:, None] - scores[~labels][None, :]
+            assert metrics[row, 0] == pytest.approx(((diff > 0) + 0.5 * (diff == 0)).mean())
+            top = np.argsort(-scores, kind='stable')[:5]
+            assert metrics[row, 1] == pytest.approx(labels[top].mean())
+
+    def test_pool_matches_serial_and_cv(self, monkeypatch):
+        """Process-pool batches give the serial result; CV reports every fold"""
+        import calibration
+        genes = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        compounds = pd.read_csv(Path(__file__).parent.parent / 'outputs' / 'tables' / 'compounds_ranked.csv')
+        validated = calibration.validated_targets(compounds)
+        assert {'IL6', 'TNF', 'PDCD1'} <= validated and 'TLR4' not in validated
+
+        from run_pipeline import DEFAULT_WEIGHTS
+        settings = {'step': 0.25, 'folds': 3, 'processes': 1}
+        serial, cv = calibration.calibrate_weights(genes, validated, DEFAULT_WEIGHTS, settings)
+        monkeypatch.setattr(calibration, 'BATCH_SIZE', 16)
+        pooled, _ = calibration.calibrate_weights(genes, validated, DEFAULT_WEIGHTS, {**settings, 'processes': 2, 'folds': 1})
+        pd.testing.assert_frame_equal(serial, pooled)
+        assert serial['AUROC'].is_monotonic_decreasing
+        assert len(cv) == 3 and cv['Test_Positives'].sum() == genes['Gene'].isin(validated).sum()
+
+
+class TestSensitivity:
+    """Test the Sobol sensitivity analysis"""
+
+    def test_ishigami_indices(self):
+        """Saltelli/Jansen estimators recover the analytic Ishigami indices"""
+        from sensitivity import saltelli_matrices, sobol_indices
+
+        def ishigami(x):
+            return (np.sin(x[:, 0]) + 7 * np.sin(x[:, 1]) ** 2 + 0.1 * x[:, 2] ** 4 * np.sin(x[:, 0]))[None, :]
+
+        A, B = saltelli_matrices(np.full(3, -np.pi), np.full(3, np.pi), base2=13)
+        first, total, _ = sobol_indices(ishigami, A, B, block_size=1000)
+        np.testing.assert_allclose(first[0], [0.3139, 0.4424, 0.0], atol=0.02)
+        np.testing.assert_allclose(total[0], [0.5576, 0.4424, 0.2437], atol=0.02)
+
+    def test_scorer_matches_pipeline_at_nominal(self):
+        """The batched scorer reproduces the pipeline scores at nominal inputs"""
+        from run_pipeline import DEFAULT_WEIGHTS, calculate_composite_scores, calculate_score_components
+        from sensitivity import VectorizedScorer, input_space
+        genes = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        _, nominal, lower, upper = input_space(DEFAULT_WEIGHTS)
+        scores = VectorizedScorer(genes).scores(np.vstack([nominal, lower, upper]))
+        expected = calculate_composite_scores(calculate_score_components(genes), DEFAULT_WEIGHTS)
+        np.testing.assert_array_equal(scores[:, 0], expected)
+        assert not np.array_equal(scores[:, 1], expected)
+
+
+class TestDocxStream:
+    """Test row-streamed DOCX tables"""
+
+    def _document_xml(self, path):
+        import zipfile
+        with zipfile.ZipFile(path) as z:
+            return z.read('word/document.xml').decode('utf-8')
+
+    def test_matches_python_docx(self, tmp_path):
+        """Streamed rows serialize exactly like cell.text assignments"""
+        from docx import Document
+        from docx_stream import StreamingDocument
+        from generate_supplementary_final import add_header_table
+
+        rows = pd.DataFrame({
+            'A': ['IL6', 'a & b <c>', ' padded', ''],
+            'B': ['0.520', 'tab\there', 'two\nlines', '\tlead \r'],
+            'C': ['', 'x', 'y', 'z'],
+        })
+        built = Document()
+        table = add_header_table(built, ['A', 'B', 'C'])
+        for values in rows.itertuples(index=False):
+            cells = table.add_row().cells
+            for cell, value in zip(cells, values):
+                cell.text = value
+        built.save(tmp_path / 'built.docx')
+
+        streamed = Document()
+        stream = StreamingDocument(streamed)
+        stream.stream_rows(add_header_table(streamed, ['A', 'B', 'C']), [rows.iloc[:1], rows.iloc[1:]], name='T')
+        stream.save(tmp_path / 'streamed.docx')
+
+        assert self._document_xml(tmp_path / 'streamed.docx') == self._document_xml(tmp_path / 'built.docx')
+        assert stream.rows_written == {'T': 4}
+
+    def test_memory_constant_in_rows(self, tmp_path):
+        """Peak allocation does not grow with the number of streamed rows"""
+        import tracemalloc
+        from docx import Document
+        from docx_stream import StreamingDocument
+
+        def peak(n_rows):
+            chunks = (pd.DataFrame({'Gene': [f'G{i}' for i in range(s, s + 2_000)], 'Score': '0.500'})
+                      for s in range(0, n_rows, 2_000))
+            doc = Document()
+            stream = StreamingDocument(doc)
+            stream.stream_rows(doc.add_table(rows=0, cols=2), chunks)
+            tracemalloc.start()
+            stream.save(tmp_path / f'{n_rows}.docx')
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak_bytes
+
+        assert peak(40_000) < 1.5 * peak(10_000)
+        assert len(Document(tmp_path / '40000.docx').tables[0].rows) == 40_000
+
+
+class TestDocumentBuild:
+    """Test building every document from one loaded dataset"""
+
+    def test_pool_matches_standalone(self, tmp_path, monkeypatch):
+        """Documents rendered in the pool equal the standalone generators' output"""
+        import shutil
+        import zipfile
+        import build_documents
+        import generate_cover_letter
+        import generate_manuscript_final
+        import generate_supplementary_final
+        import summary_stats
+
+        root = Path(__file__).parent.parent
+        shutil.copytree(root / 'outputs' / 'tables', tmp_path / 'outputs' / 'tables')
+        shutil.copytree(root / 'outputs' / 'figures', tmp_path / 'outputs' / 'figures',
+                        ignore=shutil.ignore_patterns('draft'))
+        (tmp_path / 'manuscripts').mkdir()
+        for module in [build_documents, generate_cover_letter, generate_manuscript_final,
+                       generate_supplementary_final, summary_stats]:
+            monkeypatch.setattr(module, 'BASE_DIR', tmp_path)
+
+        inputs = build_documents.DocumentInputs.load()
+        results = build_documents.render_documents(inputs, processes=2)
+        assert [name for name, _, _ in results] == ['manuscript', 'supplementary', 'cover_letter']
+        assert f'Table S1: {len(inputs.targets)} genes' in results[1][2]
+
+        def document_xml(name):
+            with zipfile.ZipFile(tmp_path / 'manuscripts' / name) as z:
+                return z.read('word/document.xml')
+
+        pooled = {name: document_xml(name) for name in
+                  ['Manuscript_Sepsis_HDT_FINAL.docx', 'Supplementary_Materials_FINAL.docx']}
+        generate_manuscript_final.create_complete_manuscript()
+        generate_supplementary_final.create_supplementary()
+        assert {name: document_xml(name) for name in pooled} == pooled
+
+    def test_tables_only_sent_to_table_documents(self, monkeypatch):
+        """The supplement streams its tables; only the manuscript gets the loaded frames"""
+        import build_documents
+        seen = {}
+        monkeypatch.setattr(build_documents, 'renderers', lambda: {
+            name: (lambda inputs, name=name: seen.update({name: inputs.targets is not None}))
+            for name in build_documents.SCRIPTS})
+        inputs = build_documents.DocumentInputs(pd.DataFrame({'Gene': ['IL6']}), pd.DataFrame(), None, {})
+        build_documents.render_documents(inputs, processes=1)
+        assert seen == {'manuscript': True, 'supplementary': False, 'cover_letter': False}
+
+
+class TestDocumentSections:
+    """Test section-level incremental manuscript builds"""
+
+    def test_only_changed_sections_rerendered(self, tmp_path, monkeypatch):
+        """Warm builds splice cached fragments into the same document; a changed input re-renders its sections"""
+        import zipfile
+        import generate_manuscript_final
+        from build_documents import DocumentInputs
+
+        (tmp_path / 'manuscripts').mkdir()
+        monkeypatch.setattr(generate_manuscript_final, 'BASE_DIR', tmp_path)
+        manuscript = tmp_path / 'manuscripts' / 'Manuscript_Sepsis_HDT_FINAL.docx'
+
+        def build(inputs):
+            status = generate_manuscript_final.create_complete_manuscript(inputs)
+            with zipfile.ZipFile(manuscript) as z:
+                return status, {name: z.read(name) for name in z.namelist()}
+
+        inputs = DocumentInputs.load()
+        cold_status, cold = build(inputs)
+        assert set(cold_status.values()) == {'rendered'}
+        warm_status, warm = build(DocumentInputs.load())
+        assert set(warm_status.values()) == {'cached'}
+        assert warm == cold
+
+        changed = DocumentInputs.load()
+        changed.summary.compounds = dict(changed.summary.compounds, total=changed.summary.compounds['total'] + 1)
+        status, _ = build(changed)
+        assert [title for title, s in status.items() if s == 'rendered'] == ['3.4 COMPOUND DISCOVERY']
+
+
+class TestSyntheticData:
+    """Test the fitted synthetic input generator"""
+
+    def test_signature_reproducible_and_fitted(self):
+        """Same seed gives the same table; category mix follows the shipped file"""
+        from synthetic_data import load_models, synthetic_signature
+        signature_model, _ = load_models()
+        a = synthetic_signature(50_000, signature_model, seed=7)
+        assert a.equals(synthetic_signature(50_000, signature_model, seed=7))
+        assert a['Gene'].is_unique and (a['PubMed_Count'] >= 1).all()
+        curated = pd.read_csv(Path(__file__).parent.parent / 'data' / 'gene_signature.csv')
+        expected = curated['Druggability'].value_counts(normalize=True)
+        observed = a['Druggability'].value_counts(normalize=True)
+        assert (observed[expected.index] - expected).abs().max() < 0.02
+
+    def test_compounds_and_csv_format(self, tmp_path):
+        """Compounds target generated genes and round-trip through the fast writer"""
+        from synthetic_data import load_models, synthetic_compounds, synthetic_signature, write_csv
+        signature_model, compound_model = load_models()
+        genes = synthetic_signature(2_000, signature_model, seed=1)
+        compounds = synthetic_compounds(genes, compound_model, seed=1)
+        assert compounds['Related_Gene'].isin(genes['Gene']).all()
+        assert compounds['pChEMBL'].between(4, 11).all() and set(compounds['Phase']) <= {1, 2, 3, 4}
+        write_csv(compounds, tmp_path / 'fast.csv')
+        compounds.to_csv(tmp_path / 'pandas.csv', index=False)
+        assert (tmp_path / 'fast.csv').read_text() == (tmp_path / 'pandas.csv').read_text()
+
+
+class TestTracing:
+    """Test stage-level tracing"""
+
+    def test_nested_spans_and_export(self, tmp_path):
+        """Spans nest, counters accumulate and the trace is valid Chrome JSON"""
+        import json
+        import tracing
+        tracer = tracing.enable(memory=True)
+        try:
+            with tracing.span('stage'):
+                with tracing.span('inner'):
+                    data = [0] * 500_000
+                tracing.count('rows', 10)
+                tracing.count('rows', 5)
+        finally:
+            tracing.disable()
+        del data
+
+        spans = {e['name']: e for e in tracer.events if e['ph'] == 'X'}
+        outer, inner = spans['stage'], spans['inner']
+        assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+        assert inner['args']['tracemalloc_peak_mb'] >= 3.5
+        assert outer['args']['tracemalloc_peak_mb'] >= inner['args']['tracemalloc_peak_mb']
+        assert tracer.counters == {'rows': 15}
+        trace = json.loads(tracer.export_chrome_trace(tmp_path / 'trace.json').read_text())
+        assert {e['ph'] for e in trace['traceEvents']} == {'X', 'C'}
+        assert tracer.summary()['Span'].tolist() == ['stage', 'inner']
+
+    def test_disabled_is_noop(self):
+        """With tracing off, spans and decorators record nothing"""
+        import tracing
+        assert tracing.get_tracer() is None
+        assert tracing.span('a') is tracing.span('b')
+
+        @tracing.traced()
+        def work(x):
+            return x + 1
+
+        assert work(1) == 2
+        tracing.count('rows')
+        tracing.sections('doc').start('intro')
+        assert tracing.get_tracer() is None
+
+
+class TestBenchmark:
+    """Test benchmark inputs and regression detection"""
+
+    def test_synthetic_signature(self):
+        """Synthetic tiers have the requested size and unique genes"""
+        from benchmark import synthetic_signature
+        signature = synthetic_signature(1000)
+        assert len(signature) == 1000 and signature['Gene'].is_unique
+        assert signature.head(60).equals(synthetic_signature(60))
+
+    def test_regression_flagged(self):
+        """Only runs slower than the recent baseline beyond the threshold are flagged"""
+        from benchmark import find_regressions
+        history = [{'results': [{'stage': 'score', 'tier': '1k', 'best': b}]} for b in [0.10, 0.11, 0.09]]
+        results = [{'stage': 'score', 'tier': '1k', 'best': 0.15}, {'stage': 'rank', 'tier': '1k', 'best': 9.0}]
+        regressions = find_regressions(results, history, threshold=0.2)
+        assert [r['stage'] for r in regressions] == ['score']
+        assert regressions[0]['baseline'] == pytest.approx(0.10)
+        assert not find_regressions([{'stage': 'score', 'tier': '1k', 'best': 0.115}], history, threshold=0.2)
+
+
+class TestArtifactStore:
+    """Test the content-addressed store of pipeline outputs"""
+
+    def test_runs_stored_restored_and_deduplicated(self, tmp_path):
+        """A config seen before is restored; unchanged outputs share objects"""
+        from artifact_store import ArtifactStore, run
+        for sub in ['config', 'data', 'scripts', 'outputs/tables', 'outputs/figures']:
+            (tmp_path / sub).mkdir(parents=True)
+        config = tmp_path / 'config' / 'sepsis_config.yaml'
+        (tmp_path / 'data' / 'gene_signature.csv').write_text('Gene\nIL6\n')
+        tables = tmp_path / 'outputs' / 'tables'
+        calls = []
+
+        def produce():
+            calls.append(config.read_text())
+            (tables / 'targets_ranked.csv').write_text(f'weight\n{config.read_text()}')
+            (tables / 'compounds_ranked.csv').write_text('Drug\nTocilizumab\n')
+            (tmp_path / 'outputs' / 'figures' / 'figure1.png').write_bytes(b'png')
+
+        store = ArtifactStore(tmp_path)
+        config.write_text('0.35')
+        first, status = run(store, produce)
+        assert status == 'computed' and not (tables / 'targets_ranked.csv').is_symlink()
+        config.write_text('0.30')
+        second, status = run(store, produce)
+        assert status == 'computed' and second != first
+        assert (tables / 'targets_ranked.csv').read_text() == 'weight\n0.30'
+
+        config.write_text('0.35')
+        assert run(store, produce) == (first, 'restored')
+        assert len(calls) == 2
+        assert (tables / 'targets_ranked.csv').read_text() == 'weight\n0.35'
+        assert store.current() == first
+        assert len(list(store.objects.rglob('*'))) - len(list(store.objects.iterdir())) == 4
+        assert store.diff(first, second) == {'added': [], 'removed': [], 'changed': ['tables/targets_ranked.csv']}
+
+        # Writing a restored file in place leaves the stored object intact
+        (tables / 'targets_ranked.csv').write_text('overwritten')
+        assert store.object_path(store.load_manifest(first)['files']['tables/targets_ranked.csv']).read_text() == \
+            'weight\n0.35'
+        (tables / 'compounds_ranked.csv').unlink()
+        store.checkout(first)
+        assert (tables / 'targets_ranked.csv').read_text() == 'weight\n0.35'
+        assert (tables / 'compounds_ranked.csv').exists()
+
+    def test_key_covers_tables_the_pipeline_reads(self, tmp_path):
+        """DE and meta-analysis tables under outputs/ change the run key; outputs do not"""
+        from artifact_store import ArtifactStore
+        for sub in ['config', 'data', 'scripts', 'outputs/tables']:
+            (tmp_path / sub).mkdir(parents=True)
+        (tmp_path / 'config' / 'sepsis_config.yaml').write_text('0.35')
+        tables = tmp_path / 'outputs' / 'tables'
+        store = ArtifactStore(tmp_path)
+        keys = [store.run_key(store.input_digests())]
+        (tables / 'targets_ranked.csv').write_text('Gene\nIL6\n')
+        keys.append(store.run_key(store.input_digests()))
+        (tables / 'meta_analysis.csv').write_text('Symbol,Pooled_Effect\nIL6,1.2\n')
+        keys.append(store.run_key(store.input_digests()))
+        (tables / 'de_GSE65682.csv').write_text('Symbol,log2FC\nIL6,1.0\n')
+        keys.append(store.run_key(store.input_digests()))
+        assert keys[0] == keys[1] and len(set(keys)) == 3
+
+        # Caches the pipeline builds under data/ do not change the key; sources do
+        for cache in ['data/reference/medline/index', 'data/reference/opentargets/store/24.09',
+                      'data/reference/medline/index.tmp', 'data/geo/store/GSE65682']:
+            (tmp_path / cache).mkdir(parents=True)
+            (tmp_path / cache / 'meta.json').write_text('{}')
+        assert store.run_key(store.input_digests()) == keys[-1]
+        (tmp_path / 'data' / 'reference' / 'medline' / 'pubmed24n0001.xml.gz').write_bytes(b'xml')
+        assert store.run_key(store.input_digests()) != keys[-1]
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])